@@ -0,0 +1,85 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Benchmark of the reordering of the particles by time bin (Beam.sort_by_bin)
+for the slicing and the interpolated kick. For each number of slices, the
+time per turn of the two kernels is measured with the particles in generation
+order and after the reordering; the break-even reorder period is the cost of
+one reordering divided by the gain per turn. A negative gain means the
+reordering does not pay off for that number of slices.
+"""
+
+from __future__ import division, print_function
+import time
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.beam.beam import Beam, Proton
+from blond.beam.profile import Profile, CutOptions
+import blond.utils.bmath as bm
+
+
+N_m = int(4e6)              # Number of macro-particles
+N_rep = 10                  # Repetitions per measurement
+n_slices_scan = [100, 1000, 10000, 100000, 1000000]
+
+ring = Ring(2*np.pi*1100.009, 1/18.**2, 25.92e9, Proton(), 1)
+beam = Beam(ring, N_m, 1e11)
+
+# Multibunch-like line density over the full frame, particles in random order
+np.random.seed(1234)
+bucket = 5e-9
+beam.dt[:] = (np.random.randint(0, 1000, N_m)*bucket
+              + np.random.normal(bucket/2, bucket/10, N_m))
+beam.dE[:] = np.random.normal(0, 1e7, N_m)
+dt_shuffled = beam.dt.copy()
+dE_shuffled = beam.dE.copy()
+id_shuffled = beam.id.copy()
+
+
+def time_kernels(profile, voltage):
+    t0 = time.perf_counter()
+    for i in range(N_rep):
+        profile.track()
+    t1 = time.perf_counter()
+    for i in range(N_rep):
+        bm.linear_interp_kick(beam.dt, beam.dE, voltage,
+                              profile.bin_centers, beam.Particle.charge, 0.)
+    t2 = time.perf_counter()
+    return (t1 - t0)/N_rep, (t2 - t1)/N_rep
+
+
+print("%10s %12s %12s %12s %12s %12s %12s" %
+      ("n_slices", "slice [ms]", "sorted", "kick [ms]", "sorted",
+       "sort [ms]", "break-even"))
+
+for n_slices in n_slices_scan:
+    beam.dt[:] = dt_shuffled
+    beam.dE[:] = dE_shuffled
+    beam.id[:] = id_shuffled
+
+    profile = Profile(beam, CutOptions(cut_left=0, cut_right=1000*bucket,
+                                       n_slices=n_slices))
+    voltage = np.ones(n_slices, dtype=bm.precision.real_t)
+
+    slice_unsorted, kick_unsorted = time_kernels(profile, voltage)
+
+    t0 = time.perf_counter()
+    beam.sort_by_bin(profile.cut_left, profile.cut_right, n_slices)
+    sort_time = time.perf_counter() - t0
+
+    slice_sorted, kick_sorted = time_kernels(profile, voltage)
+
+    gain = (slice_unsorted + kick_unsorted) - (slice_sorted + kick_sorted)
+    break_even = "%12.1f" % (sort_time/gain) if gain > 0 else "%12s" % "never"
+
+    print("%10d %12.2f %12.2f %12.2f %12.2f %12.2f %s" %
+          (n_slices, 1e3*slice_unsorted, 1e3*slice_sorted,
+           1e3*kick_unsorted, 1e3*kick_sorted, 1e3*sort_time, break_even))
@@ -17,9 +17,9 @@ statistics
 from __future__ import division
 from builtins import object
 import numpy as np
-import itertools as itl
+import tempfile
 from scipy.constants import m_p, m_e, e, c, epsilon_0, hbar
-from ..trackers.utilities import is_in_separatrix
+from ..trackers.utilities import separatrix_parameters
 from ..utils import exceptions as blExcept
 from ..utils import bmath as bm
 
@@ -127,6 +127,11 @@ class Beam(object):
         total number of macroparticles.
     intensity : float
         total intensity of the beam (in number of charge).
+    id_dtype : numpy dtype
+        type of the particle ids, numpy.int64 (default) or numpy.uint32. The
+        compact uint32 ids halve the memory of the id array and the memory
+        traffic of the loss checks and of the kernels that skip the lost
+        particles; they limit the beam to 2**32 - 1 macro-particles.
 
     Attributes
     ----------
@@ -161,9 +166,22 @@ class Beam(object):
     ratio : float
         ratio intensity per macroparticle [].
     n_macroparticles_lost : int
-        number of macro-particles marked as 'lost' [].
-    id : numpy_array, int
-        unique macro-particle ID number; zero if particle is 'lost'.
+        number of macro-particles marked as 'lost', including the ones
+        removed by eliminate_lost_particles [].
+    n_macroparticles_alive : int
+        number of macro-particles not lost [].
+    n_macroparticles_eliminated : int
+        number of lost macro-particles removed from the coordinate arrays by
+        eliminate_lost_particles [].
+    id : numpy_array, int64 or uint32
+        unique macro-particle ID number; zero if particle is 'lost'. The
+        losses_* methods keep the count of alive particles up to date; after
+        modifying id directly, call recount_alive() or statistics().
+    bunch_id : numpy_array, int32
+        optional bunch index of each macro-particle, indexed by id - 1 so
+        that it follows the particles through reorderings and losses;
+        negative for particles that belong to no bunch. Used by
+        statistics_multibunch; None by default.
 
     See Also
     ---------
@@ -188,15 +206,15 @@ class Beam(object):
     >>> my_beam = Beam(ring, n_macroparticle, intensity)
     """
 
-    def __init__(self, Ring, n_macroparticles, intensity):
+    def __init__(self, Ring, n_macroparticles, intensity, id_dtype=np.int64):
 
         self.Particle = Ring.Particle
         self.beta = Ring.beta[0][0]
         self.gamma = Ring.gamma[0][0]
         self.energy = Ring.energy[0][0]
         self.momentum = Ring.momentum[0][0]
-        self.dt = np.zeros([int(n_macroparticles)], dtype=bm.precision.real_t)
-        self.dE = np.zeros([int(n_macroparticles)], dtype=bm.precision.real_t)
+        self.dt = np.zeros([int(n_macroparticles)], dtype=bm.precision.coord_t)
+        self.dE = np.zeros([int(n_macroparticles)], dtype=bm.precision.coord_t)
         self.mean_dt = 0.
         self.mean_dE = 0.
         self.sigma_dt = 0.
@@ -204,7 +222,12 @@ class Beam(object):
         self.intensity = float(intensity)
         self.n_macroparticles = int(n_macroparticles)
         self.ratio = self.intensity/self.n_macroparticles
-        self.id = np.arange(1, self.n_macroparticles + 1, dtype=int)
+        self.id = np.arange(1, self.n_macroparticles + 1,
+                            dtype=self._check_id_dtype(id_dtype))
+        self._capacity = self.n_macroparticles
+        self._n_macroparticles_alive = self.n_macroparticles
+        self.n_macroparticles_eliminated = 0
+        self.bunch_id = None
         # For MPI
         self.n_total_macroparticles_lost = 0
         self.n_total_macroparticles = n_macroparticles
@@ -212,6 +235,22 @@ class Beam(object):
         self._sumsq_dt = 0.
         self._sumsq_dE = 0.
 
+    def _check_id_dtype(self, id_dtype):
+        '''Check that the particle ids of n_macroparticles macro-particles
+        can be stored with the given type.
+        '''
+
+        id_dtype = np.dtype(id_dtype)
+        if id_dtype not in (np.int64, np.uint32):
+            # IdTypeError
+            raise TypeError("ERROR in Beam: the particle ids must be of" +
+                            " type int64 or uint32!")
+        if self.n_macroparticles > np.iinfo(id_dtype).max:
+            # IdTypeError
+            raise OverflowError("ERROR in Beam: too many macro-particles" +
+                                " for ids of type %s!" % id_dtype.name)
+        return id_dtype
+
     @property
     def n_macroparticles_lost(self):
         '''Number of lost macro-particles, defined as @property.
@@ -223,7 +262,8 @@ class Beam(object):
 
         '''
 
-        return len(np.where(self.id == 0)[0])
+        return (self.n_macroparticles + self.n_macroparticles_eliminated
+                - self._n_macroparticles_alive)
 
     @property
     def n_macroparticles_alive(self):
@@ -236,24 +276,50 @@ class Beam(object):
 
         '''
 
-        return self.n_macroparticles - self.n_macroparticles_lost
+        return self._n_macroparticles_alive
+
+    def recount_alive(self):
+        '''Recount the alive macro-particles from the particle ids. Only
+        needed if id has been modified without the losses_* methods.
+        '''
+
+        self._n_macroparticles_alive = int(np.count_nonzero(self.id))
+
+    def eliminate_lost_particles(self, min_lost_fraction=0.):
+        """Eliminate lost particles from the beam coordinate arrays.
 
-    def eliminate_lost_particles(self):
-        """Eliminate lost particles from the beam coordinate arrays
+        The alive particles are moved, in order, to the start of dt, dE and
+        id, which are then shrunk to views of their first
+        n_macroparticles_alive elements; no array is reallocated. The check
+        against min_lost_fraction is O(1), so this method can be called every
+        turn to compact the beam periodically. Profile reads the beam arrays
+        at every slicing and needs no update; Music resizes its per-particle
+        induced voltage at its next call.
+
+        Parameters
+        ----------
+        min_lost_fraction : float
+            only eliminate if at least this fraction of the macro-particles
+            in the arrays are lost.
         """
 
-        indexalive = np.where(self.id == 0)[0]
-        if len(indexalive) < self.n_macroparticles:
-            self.dt = np.ascontiguousarray(
-                self.beam.dt[indexalive], dtype=bm.precision.real_t, order='C')
-            self.dE = np.ascontiguousarray(
-                self.beam.dE[indexalive], dtype=bm.precision.real_t, order='C')
-            self.n_macroparticles = len(self.beam.dt)
-        else:
+        if self._n_macroparticles_alive == 0:
             # AllParticlesLost
             raise RuntimeError("ERROR in Beams: all particles lost and" +
                                " eliminated!")
 
+        n_lost = self.n_macroparticles - self._n_macroparticles_alive
+        if n_lost == 0 or n_lost < min_lost_fraction * self.n_macroparticles:
+            return
+
+        n_alive = bm.compact_alive(self.dt, self.dE, self.id)
+        self.dt = self.dt[:n_alive]
+        self.dE = self.dE[:n_alive]
+        self.id = self.id[:n_alive]
+        self.n_macroparticles_eliminated += self.n_macroparticles - n_alive
+        self.n_macroparticles = n_alive
+        self._n_macroparticles_alive = n_alive
+
     def statistics(self):
         '''
         Calculation of the mean and standard deviation of beam coordinates,
@@ -264,27 +330,143 @@ class Beam(object):
         - mean_dE
         - sigma_dt
         - sigma_dE
+        - min_dt, max_dt
+        - min_dE, max_dE
         '''
 
-        # Statistics only for particles that are not flagged as lost
-        itemindex = np.where(self.id != 0)[0]
-        # itemindex = bm.where(self.id, 0)
-        self.mean_dt = bm.mean(self.dt[itemindex])
-        self.sigma_dt = bm.std(self.dt[itemindex])
-        self._sumsq_dt = np.dot(self.dt[itemindex], self.dt[itemindex])
-        # self.min_dt = np.min(self.dt[itemindex])
-        # self.max_dt = np.max(self.dt[itemindex])
+        # Statistics only for particles that are not flagged as lost,
+        # computed in a single pass; the count of alive particles is
+        # resynchronised on the way
+        stats = bm.beam_statistics(self.dt, self.dE, self.id)
+        self._n_macroparticles_alive = int(stats[0])
 
-        self.mean_dE = bm.mean(self.dE[itemindex])
-        self.sigma_dE = bm.std(self.dE[itemindex])
-        self._sumsq_dE = np.dot(self.dE[itemindex], self.dE[itemindex])
+        self.mean_dt = stats[1]
+        self.sigma_dt = stats[2]
+        self._sumsq_dt = stats[3]
+        self.min_dt = stats[4]
+        self.max_dt = stats[5]
 
-        # self.min_dE = np.min(self.dE[itemindex])
-        # self.max_dE = np.max(self.dE[itemindex])
+        self.mean_dE = stats[6]
+        self.sigma_dE = stats[7]
+        self._sumsq_dE = stats[8]
+        self.min_dE = stats[9]
+        self.max_dE = stats[10]
 
         # R.m.s. emittance in Gaussian approximation
         self.epsn_rms_l = np.pi*self.sigma_dE*self.sigma_dt  # in eVs
 
+    def statistics_multibunch(self, n_bunches, bunch_spacing_buckets=1,
+                              bucket_size_tau=None, first_bucket_start=0.):
+        '''
+        Calculation of the mean and standard deviation of the coordinates
+        and of the r.m.s. emittance of each bunch, for the particles that are
+        not flagged as lost, in a single pass over the beam. The bunch of
+        each particle is taken from bunch_id if it is set, otherwise from
+        its RF bucket: bunch k fills the bucket starting at
+        first_bucket_start + k*bunch_spacing_buckets*bucket_size_tau.
+        Statistics stored in
+
+        - bunch_n_macroparticles_alive
+        - bunch_mean_dt
+        - bunch_mean_dE
+        - bunch_sigma_dt
+        - bunch_sigma_dE
+        - bunch_epsn_rms_l
+
+        The statistics of bunches without particles are NaN.
+
+        Parameters
+        ----------
+        n_bunches : int
+            number of bunches.
+        bunch_spacing_buckets : int
+            bunch spacing in RF buckets.
+        bucket_size_tau : float
+            RF bucket length [s]; required if bunch_id is not set.
+        first_bucket_start : float
+            start of the bucket of the first bunch [s].
+
+        Examples
+        --------
+        >>> # Bunches generated one after the other in the coordinate arrays
+        >>> beam.bunch_id = np.repeat(np.arange(n_bunches, dtype=np.int32),
+        >>>                           beam.n_macroparticles // n_bunches)
+        >>> beam.statistics_multibunch(n_bunches)
+        '''
+
+        if self.bunch_id is None and bucket_size_tau is None:
+            # MultibunchStatisticsError
+            raise RuntimeError("ERROR in Beam: statistics_multibunch needs" +
+                               " either bunch_id or bucket_size_tau!")
+
+        stats = bm.bunch_statistics(
+            self.dt, self.dE, self.id, int(n_bunches), bunch_id=self.bunch_id,
+            first_bucket_start=first_bucket_start,
+            bucket_size_tau=1. if bucket_size_tau is None else bucket_size_tau,
+            bunch_spacing_buckets=int(bunch_spacing_buckets))
+
+        self.bunch_n_macroparticles_alive = stats[0].astype(int)
+        self.bunch_mean_dt = stats[1]
+        self.bunch_sigma_dt = stats[2]
+        self.bunch_mean_dE = stats[3]
+        self.bunch_sigma_dE = stats[4]
+
+        # R.m.s. emittance in Gaussian approximation
+        self.bunch_epsn_rms_l = np.pi*self.bunch_sigma_dE*self.bunch_sigma_dt
+
+    def losses_aperture(self, dt_min=-np.inf, dt_max=np.inf, dE_min=-np.inf,
+                        dE_max=np.inf, Ring=None, RFStation=None,
+                        PotentialWellSeparatrix=None):
+        '''Beam losses based on any combination of time, energy and
+        separatrix cuts, applied in a single pass of a compiled kernel.
+
+        Set to 0 all the particle's id with dt not in the interval
+        (dt_min, dt_max), with dE not in the interval (dE_min, dE_max) or,
+        if RFStation or PotentialWellSeparatrix is given, not in the
+        separatrix.
+
+        Parameters
+        ----------
+        dt_min : float
+            minimum dt.
+        dt_max : float
+            maximum dt.
+        dE_min : float
+            minimum dE.
+        dE_max : float
+            maximum dE.
+        Ring : Ring
+            Used for the separatrix (optional).
+        RFStation : RFStation
+            Used for the single-RF separatrix (optional).
+        PotentialWellSeparatrix : PotentialWellSeparatrix
+            Used for the separatrix of the total potential well, in
+            multi-harmonic RF (optional); updated if the RF program changed.
+        '''
+
+        separatrix = None
+        potential = None
+        potential_parameters = None
+        if PotentialWellSeparatrix is not None:
+            PotentialWellSeparatrix.update()
+            potential = PotentialWellSeparatrix.potential_well
+            potential_parameters = PotentialWellSeparatrix.parameters
+        elif RFStation is not None:
+            separatrix = separatrix_parameters(Ring, RFStation, self)
+
+        self._apply_aperture(dt_min, dt_max, dE_min, dE_max, separatrix,
+                             potential, potential_parameters)
+
+    def _apply_aperture(self, dt_min, dt_max, dE_min, dE_max, separatrix=None,
+                        potential=None, potential_parameters=None):
+        '''Flag the particles outside the cuts as lost and update the count
+        of alive macro-particles.
+        '''
+
+        self._n_macroparticles_alive -= bm.aperture(
+            self.dt, self.dE, self.id, dt_min, dt_max, dE_min, dE_max,
+            separatrix, potential, potential_parameters)
+
     def losses_separatrix(self, Ring, RFStation):
         '''Beam losses based on separatrix.
 
@@ -293,16 +475,12 @@ class Beam(object):
         Parameters
         ----------
         Ring : Ring
-            Used to call the function is_in_separatrix.
+            Used for the separatrix, see is_in_separatrix.
         RFStation : RFStation
-            Used to call the function is_in_separatrix.
+            Used for the separatrix, see is_in_separatrix.
         '''
 
-        itemindex = np.where(is_in_separatrix(Ring, RFStation, self,
-                                              self.dt, self.dE) == False)[0]
-
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.losses_aperture(Ring=Ring, RFStation=RFStation)
 
     def losses_longitudinal_cut(self, dt_min, dt_max):
         '''Beam losses based on longitudinal cuts.
@@ -318,10 +496,7 @@ class Beam(object):
             maximum dt.
         '''
 
-        itemindex = np.where((self.dt - dt_min)*(dt_max - self.dt) < 0)[0]
-
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.losses_aperture(dt_min=dt_min, dt_max=dt_max)
 
     def losses_energy_cut(self, dE_min, dE_max):
         '''Beam losses based on energy cuts, e.g. on collimators.
@@ -336,10 +511,7 @@ class Beam(object):
             maximum dE.
         '''
 
-        itemindex = np.where((self.dE - dE_min)*(dE_max - self.dE) < 0)[0]
-
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.losses_aperture(dE_min=dE_min, dE_max=dE_max)
 
     def losses_below_energy(self, dE_min):
         '''Beam losses based on lower energy cut.
@@ -352,10 +524,30 @@ class Beam(object):
             minimum dE.
         '''
 
-        itemindex = np.where((self.dE - dE_min) < 0)[0]
+        self.losses_aperture(dE_min=dE_min)
+
+    def sort_by_bin(self, cut_left, cut_right, n_slices):
+        '''Reorder the macro-particles by time bin.
 
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        A stable counting sort permutes dt, dE and id together so that the
+        particles of a bin are contiguous in memory and the slicing and
+        interpolation kernels access the bin arrays sequentially. Particles
+        outside the cuts are moved to the end of the arrays. The id of each
+        particle follows its coordinates, so the array position no longer
+        equals id - 1 after a reordering.
+
+        Parameters
+        ----------
+        cut_left : float
+            left edge of the first bin [s].
+        cut_right : float
+            right edge of the last bin [s].
+        n_slices : int
+            number of bins.
+        '''
+
+        bm.sort_by_bin(self.dt, self.dE, self.id, cut_left, cut_right,
+                       int(n_slices))
 
     def add_particles(self, new_particles):
         '''
@@ -380,13 +572,8 @@ class Beam(object):
 
         nNew = len(newdt)
 
-        self.id = np.concatenate((self.id, np.arange(self.n_macroparticles + 1,
-                                                     self.n_macroparticles
-                                                     + nNew + 1, dtype=int)))
-        self.n_macroparticles += nNew
-
-        self.dt = np.concatenate((self.dt, newdt))
-        self.dE = np.concatenate((self.dE, newdE))
+        self._append(newdt, newdE)
+        self._n_macroparticles_alive += nNew
 
     def add_beam(self, other_beam):
         '''
@@ -402,20 +589,167 @@ class Beam(object):
         if not isinstance(other_beam, type(self)):
             raise TypeError("add_beam method requires a beam object as input")
 
-        self.dt = np.concatenate((self.dt, other_beam.dt))
-        self.dE = np.concatenate((self.dE, other_beam.dE))
+        self._append(other_beam.dt, other_beam.dE, other_beam.id != 0)
+        self._n_macroparticles_alive += int(np.count_nonzero(other_beam.id))
+
+    def inject(self, other_beam, Profile=None, TotalInducedVoltage=None,
+               cut_left=None, cut_right=None):
+        '''Inject a batch into the beam of a running simulation.
 
-        counter = itl.count(self.n_macroparticles + 1)
-        newids = np.zeros(other_beam.n_macroparticles)
+        The particles of other_beam are added with add_beam and its
+        intensity is added to the intensity of the beam. If bunch_id is
+        set, the bunches of the batch are numbered after the bunches already
+        in the beam. The profile is sliced again, so that the induced
+        voltage of the next turn includes the batch; if new cuts are given,
+        the slicing frame is changed first and the impedance contributions
+        are reprocessed for it.
 
-        for i in range(other_beam.n_macroparticles):
-            if other_beam.id[i]:
-                newids[i] = next(counter)
-            else:
-                next(counter)
+        Parameters
+        ----------
+        other_beam : Beam
+            the batch, with the same intensity per macro-particle.
+        Profile : Profile
+            profile of the beam (optional).
+        TotalInducedVoltage : TotalInducedVoltage
+            induced voltage of the beam, reprocessed if the cuts change
+            (optional).
+        cut_left : float
+            new left edge of the profile [s] (optional).
+        cut_right : float
+            new right edge of the profile [s] (optional).
+
+        Examples
+        --------
+        >>> beam.reserve(4 * n_macroparticles_batch)
+        >>> for turn in range(n_turns):
+        >>>     if turn in injection_turns:
+        >>>         batch = Beam(ring, n_macroparticles_batch, intensity_batch)
+        >>>         bigaussian(ring, rf, batch, sigma_dt)
+        >>>         batch.dt += injection_offset
+        >>>         beam.inject(batch, profile, total_induced_voltage)
+        >>>     ...
+        '''
+
+        if not isinstance(other_beam, Beam):
+            raise TypeError("inject method requires a beam object as input")
+        if not np.isclose(other_beam.ratio, self.ratio, rtol=1e-9):
+            raise blExcept.ParticleAdditionError(
+                "the injected beam must have the same intensity per" +
+                " macro-particle")
+
+        n_ids = self.n_macroparticles + self.n_macroparticles_eliminated
+        self.add_beam(other_beam)
+        self.intensity += other_beam.intensity
+        if not self.is_splitted:
+            self.n_total_macroparticles += other_beam.n_macroparticles
+
+        if self.bunch_id is not None:
+            # Indexed by id - 1: padded up to the ids already given, then
+            # the bunches of the batch, in the order of its coordinates
+            bunch_id = np.full(n_ids + other_beam.n_macroparticles, -1,
+                               dtype=np.int32)
+            n_kept = min(len(self.bunch_id), n_ids)
+            bunch_id[:n_kept] = self.bunch_id[:n_kept]
+            if other_beam.bunch_id is not None:
+                alive = other_beam.id != 0
+                first_bunch = self.bunch_id.max(initial=-1) + 1
+                bunch_id[n_ids:][alive] = \
+                    other_beam.bunch_id[other_beam.id[alive] - 1] + first_bunch
+            self.bunch_id = bunch_id
+
+        if cut_left is not None or cut_right is not None:
+            if Profile is None:
+                # InjectionError
+                raise RuntimeError("ERROR in Beam: the cuts can only be" +
+                                   " changed with the Profile!")
+            cut_options = Profile.cut_options
+            if cut_left is not None:
+                cut_options.cut_left = cut_left
+            if cut_right is not None:
+                cut_options.cut_right = cut_right
+            cut_options.set_cuts(self)
+            Profile.set_slices_parameters()
+            if TotalInducedVoltage is not None:
+                TotalInducedVoltage.time_array = Profile.bin_centers
+                TotalInducedVoltage.reprocess()
+
+        if Profile is not None:
+            Profile.track()
+
+    def reserve(self, n_macroparticles):
+        '''Reserve the storage of the coordinate arrays for a total of
+        n_macroparticles macro-particles, so that the particles added later
+        with add_particles, add_beam or inject are copied without
+        reallocation.
+
+        Parameters
+        ----------
+        n_macroparticles : int
+            total number of macro-particles to reserve the storage for.
+        '''
 
-        self.id = np.concatenate((self.id, newids))
-        self.n_macroparticles += other_beam.n_macroparticles
+        if int(n_macroparticles) > self._storage_capacity():
+            self._reallocate(int(n_macroparticles))
+
+    def _storage_capacity(self):
+        '''Number of macro-particles that fit in the storage of dt, dE and
+        id; the arrays are views of the start of their storage after a
+        reallocation, or after eliminate_lost_particles.
+        '''
+
+        for array in (self.dt, self.dE, self.id):
+            storage = array.base
+            if not (isinstance(storage, np.ndarray) and storage.ndim == 1
+                    and len(storage) == self._capacity
+                    and storage.dtype == array.dtype
+                    and storage.ctypes.data == array.ctypes.data):
+                return self.n_macroparticles
+        return self._capacity
+
+    def _reallocate(self, capacity):
+        '''Move the coordinate arrays to a new storage of the given
+        capacity.
+        '''
+
+        n = self.n_macroparticles
+        arrays = []
+        for array in (self.dt, self.dE, self.id):
+            storage = np.empty(capacity, dtype=array.dtype)
+            storage[:n] = array[:n]
+            arrays.append(storage[:n])
+        self.dt, self.dE, self.id = arrays
+        self._capacity = capacity
+
+    def _append(self, new_dt, new_dE, alive=None):
+        '''Append particles to the coordinate arrays, with ids following
+        the last id given; the particles that are not alive get id 0. The
+        storage grows geometrically, so that repeated additions cost an
+        amortised constant time per particle.
+        '''
+
+        n = self.n_macroparticles
+        n_new = len(new_dt)
+        if n_new == 0:
+            return
+        n_ids = n + self.n_macroparticles_eliminated
+        if n_ids + n_new > np.iinfo(self.id.dtype).max:
+            # IdTypeError
+            raise OverflowError("ERROR in Beam: too many macro-particles" +
+                                " for ids of type %s!" % self.id.dtype.name)
+
+        if n + n_new > self._storage_capacity():
+            self._reallocate(max(n + n_new, 2*n))
+
+        self.dt = self.dt.base[:n + n_new]
+        self.dE = self.dE.base[:n + n_new]
+        self.id = self.id.base[:n + n_new]
+        self.dt[n:] = new_dt
+        self.dE[n:] = new_dE
+        self.id[n:] = np.arange(n_ids + 1, n_ids + n_new + 1,
+                                dtype=self.id.dtype)
+        if alive is not None:
+            self.id[n:][~alive] = 0
+        self.n_macroparticles += n_new
 
     def __iadd__(self, other):
         '''
@@ -471,6 +805,7 @@ class Beam(object):
         assert (len(self.dt) == len(self.dE) and len(self.dt) == len(self.id))
 
         self.n_macroparticles = len(self.dt)
+        self.recount_alive()
         self.is_splitted = True
 
     def gather(self, all=False):
@@ -501,6 +836,7 @@ class Beam(object):
                 self.is_splitted = False
 
         self.n_macroparticles = len(self.dt)
+        self.recount_alive()
 
     def gather_statistics(self, all=False):
         '''
@@ -610,3 +946,389 @@ class Beam(object):
         else:
             temp = worker.gather(np.array([self.n_macroparticles_lost]))
             self.n_total_macroparticles_lost = np.sum(temp)
+
+
+class EnsembleBeam(Beam):
+    """Class containing an ensemble of independent beams tracked together,
+    e.g. for parameter scans in which the simulations differ only in
+    intensity, RF voltage or phase, or seed.
+
+    The coordinates of all the members are stored in single arrays of shape
+    (n_ensemble, n_macroparticles), so that the kick, drift and slicing of
+    all the members run in a single call of the compiled routines.
+
+    Parameters
+    ----------
+    Ring : Ring
+        Used to import different quantities such as the mass and the energy.
+    n_ensemble : int
+        number of members of the ensemble.
+    n_macroparticles : int
+        number of macroparticles of each member.
+    intensity : float or float array
+        intensity of each member (in number of charge); a single value is
+        used for all the members.
+    id_dtype : numpy dtype
+        type of the particle ids, see Beam.
+
+    Attributes
+    ----------
+    n_ensemble : int
+        number of members of the ensemble [].
+    dt : numpy_array, float
+        arrival times of the members, shape (n_ensemble, n_macroparticles)
+        [s].
+    dE : numpy_array, float
+        energy offsets of the members, shape (n_ensemble, n_macroparticles)
+        [eV].
+    intensity : float array
+        intensity of each member [].
+    ratio : float array
+        intensity per macroparticle of each member [].
+    id : numpy_array, int64 or uint32
+        macro-particle ID numbers of each member; zero if particle is 'lost'.
+    mean_dt, mean_dE, sigma_dt, sigma_dE, epsn_rms_l : float array
+        statistics of each member, see statistics().
+
+    Examples
+    --------
+    >>> from blond.beam.distributions import bigaussian
+    >>>
+    >>> ensemble = EnsembleBeam(ring, 100, 1e5, np.linspace(1e10, 1e11, 100))
+    >>> for k in range(ensemble.n_ensemble):
+    >>>     beam = Beam(ring, 1e5, ensemble.intensity[k])
+    >>>     bigaussian(ring, rf, beam, 1e-9, seed=k)
+    >>>     ensemble.set_member(k, beam)
+    """
+
+    def __init__(self, Ring, n_ensemble, n_macroparticles, intensity,
+                 id_dtype=np.int64):
+
+        Beam.__init__(self, Ring, n_macroparticles, 1., id_dtype=id_dtype)
+
+        self.n_ensemble = int(n_ensemble)
+        shape = (self.n_ensemble, self.n_macroparticles)
+        self.dt = np.zeros(shape, dtype=bm.precision.coord_t)
+        self.dE = np.zeros(shape, dtype=bm.precision.coord_t)
+        self.intensity = np.ones(self.n_ensemble) * intensity
+        self.ratio = self.intensity/self.n_macroparticles
+        self.id = np.tile(self.id, (self.n_ensemble, 1))
+        self.mean_dt = np.zeros(self.n_ensemble)
+        self.mean_dE = np.zeros(self.n_ensemble)
+        self.sigma_dt = np.zeros(self.n_ensemble)
+        self.sigma_dE = np.zeros(self.n_ensemble)
+
+    @property
+    def n_macroparticles_lost(self):
+        '''Number of lost macro-particles of each member, defined as
+        @property.
+
+        Returns
+        -------
+        n_macroparticles_lost : int array
+            number of macroparticles lost in each member.
+
+        '''
+
+        return np.count_nonzero(self.id == 0, axis=1)
+
+    @property
+    def n_macroparticles_alive(self):
+        '''Number of transmitted macro-particles of each member, defined as
+        @property.
+
+        Returns
+        -------
+        n_macroparticles_alive : int array
+            number of macroparticles not lost in each member.
+
+        '''
+
+        return np.count_nonzero(self.id, axis=1)
+
+    def eliminate_lost_particles(self, min_lost_fraction=0.):
+        '''The members of an ensemble share the array shape, lost particles
+        cannot be eliminated.
+        '''
+
+        # EnsembleError
+        raise RuntimeError("ERROR in EnsembleBeam: lost particles cannot be" +
+                           " eliminated from an ensemble!")
+
+    def set_member(self, index, beam):
+        '''Copy the coordinates and the particle ids of a Beam, e.g. generated
+        with the functions of distributions, to a member of the ensemble.
+
+        Parameters
+        ----------
+        index : int
+            index of the member.
+        beam : Beam
+            beam with n_macroparticles macro-particles.
+
+        '''
+
+        if beam.n_macroparticles != self.n_macroparticles:
+            # EnsembleError
+            raise RuntimeError("ERROR in EnsembleBeam: The members of the" +
+                               " ensemble must have the same number of" +
+                               " macro-particles!")
+
+        self.dt[index] = beam.dt
+        self.dE[index] = beam.dE
+        self.id[index] = beam.id
+
+    def sort_by_bin(self, cut_left, cut_right, n_slices):
+        '''Reorder the macro-particles of each member by time bin, see
+        Beam.sort_by_bin.
+        '''
+
+        for k in range(self.n_ensemble):
+            bm.sort_by_bin(self.dt[k], self.dE[k], self.id[k], cut_left,
+                           cut_right, int(n_slices))
+
+    def statistics(self):
+        '''
+        Calculation of the mean and standard deviation of the coordinates of
+        each member, as well as the r.m.s. emittance, for the particles that
+        are not flagged as lost. Take no arguments, statistics stored in
+
+        - mean_dt
+        - mean_dE
+        - sigma_dt
+        - sigma_dE
+        - epsn_rms_l
+        '''
+
+        alive = self.id != 0
+        n_alive = np.count_nonzero(alive, axis=1)
+
+        self.mean_dt = np.sum(self.dt, axis=1, where=alive,
+                              dtype=np.float64) / n_alive
+        self.mean_dE = np.sum(self.dE, axis=1, where=alive,
+                              dtype=np.float64) / n_alive
+        self.sigma_dt = np.sqrt(np.sum(
+            (self.dt - self.mean_dt[:, np.newaxis])**2, axis=1, where=alive,
+            dtype=np.float64) / n_alive)
+        self.sigma_dE = np.sqrt(np.sum(
+            (self.dE - self.mean_dE[:, np.newaxis])**2, axis=1, where=alive,
+            dtype=np.float64) / n_alive)
+
+        # R.m.s. emittance in Gaussian approximation
+        self.epsn_rms_l = np.pi*self.sigma_dE*self.sigma_dt  # in eVs
+
+
+class ChunkedBeam(Beam):
+    """Class containing a beam whose coordinates are stored out of core, in
+    memory-mapped temporary files, for beams larger than the RAM.
+
+    dt, dE and id are numpy.memmap arrays of the full beam; the operating
+    system pages them in and out as needed. The tracking (see
+    ChunkedRingAndRFTracker), the slicing (see Profile) and the statistics
+    stream through the beam in chunks of chunk_size macro-particles, so that
+    only one chunk at a time needs to be in memory. The profile is accumulated
+    over all the chunks before the induced voltage is computed from it.
+
+    Parameters
+    ----------
+    Ring : Ring
+        Used to import different quantities such as the mass and the energy.
+    n_macroparticles : int
+        total number of macroparticles.
+    intensity : float
+        total intensity of the beam (in number of charge).
+    chunk_size : int
+        number of macroparticles per chunk.
+    directory : str
+        directory of the temporary files; default is the system temporary
+        directory. The files are deleted when the beam is deleted.
+    id_dtype : numpy dtype
+        type of the particle ids, see Beam.
+
+    Attributes
+    ----------
+    chunk_size : int
+        number of macroparticles per chunk [].
+    n_chunks : int
+        number of chunks [].
+
+    Examples
+    --------
+    >>> beam = ChunkedBeam(ring, 1e9, 1e11, chunk_size=1e7,
+    >>>                    directory='/scratch')
+    >>> for chunk in beam.chunks():
+    >>>     beam.dt[chunk] = ...
+    """
+
+    def __init__(self, Ring, n_macroparticles, intensity, chunk_size=int(1e7),
+                 directory=None, id_dtype=np.int64):
+
+        # The coordinates of the base class are replaced by the memory maps
+        Beam.__init__(self, Ring, 1, intensity)
+
+        self.n_macroparticles = int(n_macroparticles)
+        self.ratio = self.intensity/self.n_macroparticles
+        self._n_macroparticles_alive = self.n_macroparticles
+        self.n_total_macroparticles = self.n_macroparticles
+        self.chunk_size = int(chunk_size)
+
+        self.dt = self._memmap(bm.precision.coord_t, directory)
+        self.dE = self._memmap(bm.precision.coord_t, directory)
+        self.id = self._memmap(self._check_id_dtype(id_dtype), directory)
+        for chunk in self.chunks():
+            self.id[chunk] = np.arange(chunk.start + 1, chunk.stop + 1)
+
+    def _memmap(self, dtype, directory):
+
+        # Anonymous file, without a name in the file system; the memory map
+        # keeps its data alive after the file object is closed
+        with tempfile.TemporaryFile(dir=directory) as mapped_file:
+            return np.memmap(mapped_file, dtype=dtype, mode='w+',
+                             shape=(self.n_macroparticles,))
+
+    @property
+    def n_chunks(self):
+
+        return -(-self.n_macroparticles // self.chunk_size)
+
+    def chunks(self):
+        '''Iterate over the chunks of the beam.
+
+        Yields
+        ------
+        chunk : slice
+            slice of the coordinate arrays of the chunk.
+        '''
+
+        for start in range(0, self.n_macroparticles, self.chunk_size):
+            yield slice(start, min(start + self.chunk_size,
+                                   self.n_macroparticles))
+
+    def statistics(self):
+        '''
+        Calculation of the mean and standard deviation of beam coordinates
+        and of the r.m.s. emittance, see Beam.statistics; the statistics of
+        the chunks are merged with the pairwise variance update.
+        '''
+
+        n = 0
+        sumsq_dt = sumsq_dE = 0.
+        mean_dt = mean_dE = m2_dt = m2_dE = 0.
+        min_dt = min_dE = np.inf
+        max_dt = max_dE = -np.inf
+        for chunk in self.chunks():
+            stats = bm.beam_statistics(self.dt[chunk], self.dE[chunk],
+                                       self.id[chunk])
+            n_c = int(stats[0])
+            if n_c == 0:
+                continue
+            mean_dt, m2_dt = _merge_moments(n, mean_dt, m2_dt, n_c, stats[1],
+                                            n_c*stats[2]**2)
+            mean_dE, m2_dE = _merge_moments(n, mean_dE, m2_dE, n_c, stats[6],
+                                            n_c*stats[7]**2)
+            n += n_c
+            sumsq_dt += stats[3]
+            sumsq_dE += stats[8]
+            min_dt, max_dt = min(min_dt, stats[4]), max(max_dt, stats[5])
+            min_dE, max_dE = min(min_dE, stats[9]), max(max_dE, stats[10])
+
+        self._n_macroparticles_alive = n
+        self.mean_dt = mean_dt if n > 0 else np.nan
+        self.sigma_dt = np.sqrt(m2_dt/n) if n > 0 else np.nan
+        self._sumsq_dt = sumsq_dt
+        self.min_dt = min_dt
+        self.max_dt = max_dt
+
+        self.mean_dE = mean_dE if n > 0 else np.nan
+        self.sigma_dE = np.sqrt(m2_dE/n) if n > 0 else np.nan
+        self._sumsq_dE = sumsq_dE
+        self.min_dE = min_dE
+        self.max_dE = max_dE
+
+        # R.m.s. emittance in Gaussian approximation
+        self.epsn_rms_l = np.pi*self.sigma_dE*self.sigma_dt  # in eVs
+
+    def statistics_multibunch(self, n_bunches, bunch_spacing_buckets=1,
+                              bucket_size_tau=None, first_bucket_start=0.):
+        '''
+        Bunch-by-bunch statistics, see Beam.statistics_multibunch; the
+        statistics of the chunks are merged with the pairwise variance
+        update.
+        '''
+
+        if self.bunch_id is None and bucket_size_tau is None:
+            # MultibunchStatisticsError
+            raise RuntimeError("ERROR in Beam: statistics_multibunch needs" +
+                               " either bunch_id or bucket_size_tau!")
+
+        n = np.zeros(n_bunches)
+        mean_dt, m2_dt = np.zeros(n_bunches), np.zeros(n_bunches)
+        mean_dE, m2_dE = np.zeros(n_bunches), np.zeros(n_bunches)
+        for chunk in self.chunks():
+            stats = bm.bunch_statistics(
+                self.dt[chunk], self.dE[chunk], self.id[chunk],
+                int(n_bunches), bunch_id=self.bunch_id,
+                first_bucket_start=first_bucket_start,
+                bucket_size_tau=(1. if bucket_size_tau is None
+                                 else bucket_size_tau),
+                bunch_spacing_buckets=int(bunch_spacing_buckets))
+            n_c = stats[0]
+            filled = n_c > 0
+            mean_dt[filled], m2_dt[filled] = _merge_moments(
+                n[filled], mean_dt[filled], m2_dt[filled], n_c[filled],
+                stats[1][filled], n_c[filled]*stats[2][filled]**2)
+            mean_dE[filled], m2_dE[filled] = _merge_moments(
+                n[filled], mean_dE[filled], m2_dE[filled], n_c[filled],
+                stats[3][filled], n_c[filled]*stats[4][filled]**2)
+            n += n_c
+
+        empty = n == 0
+        n[empty] = np.nan
+        self.bunch_n_macroparticles_alive = np.nan_to_num(n).astype(int)
+        self.bunch_mean_dt = np.where(empty, np.nan, mean_dt)
+        self.bunch_sigma_dt = np.sqrt(m2_dt/n)
+        self.bunch_mean_dE = np.where(empty, np.nan, mean_dE)
+        self.bunch_sigma_dE = np.sqrt(m2_dE/n)
+
+        # R.m.s. emittance in Gaussian approximation
+        self.bunch_epsn_rms_l = np.pi*self.bunch_sigma_dE*self.bunch_sigma_dt
+
+    def _apply_aperture(self, dt_min, dt_max, dE_min, dE_max, separatrix=None,
+                        potential=None, potential_parameters=None):
+        '''Flag the particles outside the cuts as lost, chunk by chunk, see
+        Beam.losses_aperture.
+        '''
+
+        for chunk in self.chunks():
+            self._n_macroparticles_alive -= bm.aperture(
+                self.dt[chunk], self.dE[chunk], self.id[chunk], dt_min,
+                dt_max, dE_min, dE_max, separatrix, potential,
+                potential_parameters)
+
+    def sort_by_bin(self, cut_left, cut_right, n_slices):
+
+        # ChunkedBeamError
+        raise RuntimeError("ERROR in ChunkedBeam: the particles of a chunked" +
+                           " beam cannot be reordered!")
+
+    def add_particles(self, new_particles):
+
+        # ChunkedBeamError
+        raise RuntimeError("ERROR in ChunkedBeam: particles cannot be added" +
+                           " to a chunked beam!")
+
+    def add_beam(self, other_beam):
+
+        # ChunkedBeamError
+        raise RuntimeError("ERROR in ChunkedBeam: particles cannot be added" +
+                           " to a chunked beam!")
+
+
+def _merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    '''Pairwise update of the mean and of the sum of squared deviations of
+    two sets of n_a and n_b samples.
+    '''
+
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return mean_a + delta*n_b/n, m2_a + m2_b + delta**2*n_a*n_b/n
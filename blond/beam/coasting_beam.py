@@ -24,6 +24,7 @@ import numpy.random as rand
 
 #BLonD imports
 import blond.utils.exceptions as blExcept
+from blond.utils.parallel_random import global_offset
 
 
 
@@ -34,10 +35,13 @@ import blond.utils.exceptions as blExcept
 #according to dE/E = beta**2 * dP/P energy_offset gives an offset in dE for
 #the two standard distributions if a user_distribution is used it is taken as
 #being in dE
+#generator is an optional CounterBasedGenerator, drawing the coordinates in
+#place in parallel, independently of the number of threads and MPI ranks,
+#instead of numpy.random
 def generate_coasting_beam(Beam, t_start, t_stop, spread = 1E-3, 
                            spread_type = 'dp/p', energy_offset = 0, 
                            distribution = 'gaussian' , user_distribution = None,
-                           user_probability = None):
+                           user_probability = None, generator = None):
 
     if spread_type == 'dp/p':
         energy_spread = Beam.energy * Beam.beta**2 * spread
@@ -51,6 +55,13 @@ def generate_coasting_beam(Beam, t_start, t_stop, spread = 1E-3,
         raise blExcept.DistributionError("spread_type " + str(spread_type) + \
                                    " not recognised")
 
+    if generator is not None:
+        _coasting_beam_generator(Beam, t_start, t_stop, energy_spread,
+                                 energy_offset, distribution,
+                                 user_distribution, user_probability,
+                                 generator)
+        return
+
 
     if distribution == 'gaussian':
         Beam.dE = rand.normal(loc = energy_offset, scale = energy_spread, \
@@ -85,3 +96,35 @@ def generate_coasting_beam(Beam, t_start, t_stop, spread = 1E-3,
         raise blExcept.DistributionError("distribution type not recognised")
 
     Beam.dt = rand.rand(Beam.n_macroparticles)*(t_stop - t_start) + t_start
+
+
+def _coasting_beam_generator(Beam, t_start, t_stop, energy_spread,
+                             energy_offset, distribution, user_distribution,
+                             user_probability, generator):
+    #Coordinates drawn in place by a CounterBasedGenerator, the 'parabolic'
+    #and 'user' tables by inversion of their cumulative distribution
+
+    offset = global_offset(Beam)[0]
+
+    if distribution == 'gaussian':
+        generator.normal(Beam.dE, energy_offset, energy_spread, offset)
+
+    elif distribution == 'parabolic':
+        energyRange = np.linspace(-energy_spread, energy_spread, 10000)
+        probabilityDistribution = 1 - (energyRange/energy_spread)**2
+        generator.from_table(Beam.dE, energyRange + energy_offset,
+                             probabilityDistribution, offset)
+
+    elif distribution == 'user':
+        if user_distribution is None or user_probability is None:
+            raise blExcept.DistributionError("""Distribution 'user' requires
+                                             'user_distribution' and 
+                                             'user_probability' to be defined""")
+
+        generator.from_table(Beam.dE, user_distribution, user_probability,
+                             offset)
+
+    else:
+        raise blExcept.DistributionError("distribution type not recognised")
+
+    generator.uniform(Beam.dt, t_start, t_stop, offset)
@@ -28,6 +28,7 @@ from ..trackers.utilities import is_in_separatrix
 from ..beam.profile import Profile, CutOptions
 from ..trackers.utilities import potential_well_cut, minmax_location
 from ..utils import bmath as bm
+from ..utils.parallel_random import global_offset
 
 def matched_from_line_density(beam, full_ring_and_RF, line_density_input=None,
                               main_harmonic_option='lowest_freq',
@@ -725,9 +726,9 @@ def populate_bunch(beam, time_grid, deltaE_grid, density_grid, time_step,
     
     # Randomize particles inside each grid cell (uniform distribution)
     beam.dt = (np.ascontiguousarray(time_grid.flatten()[indexes] +
-                                    (np.random.rand(beam.n_macroparticles) - 0.5) * time_step)).astype(dtype=bm.precision.real_t, order='C', copy=False)
+                                    (np.random.rand(beam.n_macroparticles) - 0.5) * time_step)).astype(dtype=bm.precision.coord_t, order='C', copy=False)
     beam.dE = (np.ascontiguousarray(deltaE_grid.flatten()[indexes] +
-                                    (np.random.rand(beam.n_macroparticles) - 0.5) * deltaE_step)).astype(dtype=bm.precision.real_t, order='C', copy=False)
+                                    (np.random.rand(beam.n_macroparticles) - 0.5) * deltaE_step)).astype(dtype=bm.precision.coord_t, order='C', copy=False)
 
 def distribution_function(action_array, dist_type, length, exponent=None):
     '''
@@ -797,7 +798,7 @@ def line_density(coord_array, dist_type, bunch_length, bunch_position=0,
 
 
 def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
-               reinsertion = False):
+               reinsertion = False, generator = None):
     r"""Function generating a Gaussian beam both in time and energy 
     coordinates. Fills Beam.dt and Beam.dE arrays.
     
@@ -819,6 +820,10 @@ def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
     reinsertion : bool (optional)
         Re-insert particles that are generated outside the separatrix into the
         bucket; default in False
+    generator : CounterBasedGenerator (optional)
+        Parallel counter-based generator, drawing the coordinates in place,
+        independently of the number of threads and MPI ranks; default is
+        None and numpy.random is used with seed
     
     """
     
@@ -860,14 +865,20 @@ def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
     Beam.sigma_dt = sigma_dt
     Beam.sigma_dE = sigma_dE
     
+    if generator is not None:
+        _bigaussian_generator(Ring, RFStation, Beam, sigma_dt, sigma_dE,
+                              (phi_s - phi_rf)/omega_rf, reinsertion,
+                              generator)
+        return
+
     # Generate coordinates
     np.random.seed(seed)
     
-    Beam.dt = sigma_dt*np.random.randn(Beam.n_macroparticles).astype(dtype=bm.precision.real_t, order='C', copy=False) + \
+    Beam.dt = sigma_dt*np.random.randn(Beam.n_macroparticles).astype(dtype=bm.precision.coord_t, order='C', copy=False) + \
         (phi_s - phi_rf)/omega_rf
     Beam.dE = sigma_dE * \
         np.random.randn(Beam.n_macroparticles).astype(
-            dtype=bm.precision.real_t, order='C')
+            dtype=bm.precision.coord_t, order='C')
     
     # Re-insert if necessary
     if reinsertion == True:
@@ -877,11 +888,40 @@ def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
          
         while itemindex.size != 0:
 
-            Beam.dt[itemindex] = sigma_dt*np.random.randn(itemindex.size).astype(dtype=bm.precision.real_t, order='C', copy=False) \
+            Beam.dt[itemindex] = sigma_dt*np.random.randn(itemindex.size).astype(dtype=bm.precision.coord_t, order='C', copy=False) \
                 + (phi_s - phi_rf)/omega_rf
 
             Beam.dE[itemindex] = sigma_dE * \
                 np.random.randn(itemindex.size).astype(
-                    dtype=bm.precision.real_t, order='C')
+                    dtype=bm.precision.coord_t, order='C')
             itemindex = np.where(is_in_separatrix(Ring,
                                                   RFStation, Beam, Beam.dt, Beam.dE) == False)[0]
+
+
+def _bigaussian_generator(Ring, RFStation, Beam, sigma_dt, sigma_dE, dt_0,
+                          reinsertion, generator):
+    # Coordinates drawn in place by a CounterBasedGenerator, see bigaussian
+
+    offset = global_offset(Beam)[0]
+    generator.normal(Beam.dt, dt_0, sigma_dt, offset)
+    generator.normal(Beam.dE, 0., sigma_dE, offset)
+
+    if reinsertion == True:
+
+        # The re-inserted particles are numbered in the order of the ranks,
+        # for the draws to be independent of the number of ranks
+        itemindex = np.where(is_in_separatrix(Ring, RFStation, Beam,
+                                              Beam.dt, Beam.dE) == False)[0]
+        offset, n_outside = global_offset(Beam, itemindex.size)
+
+        while n_outside != 0:
+
+            coordinates = np.empty(itemindex.size,
+                                   dtype=bm.precision.coord_t)
+            Beam.dt[itemindex] = generator.normal(coordinates, dt_0,
+                                                  sigma_dt, offset)
+            Beam.dE[itemindex] = generator.normal(coordinates, 0.,
+                                                  sigma_dE, offset)
+            itemindex = np.where(is_in_separatrix(
+                Ring, RFStation, Beam, Beam.dt, Beam.dE) == False)[0]
+            offset, n_outside = global_offset(Beam, itemindex.size)
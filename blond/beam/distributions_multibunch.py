@@ -207,8 +207,8 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
                      TotalInducedVoltageIteration.induced_voltage)
             plt.show()
                 
-    beam.dt = beamIteration.dt.astype(dtype=bm.precision.real_t, order='C', copy=False)
-    beam.dE = beamIteration.dE.astype(dtype=bm.precision.real_t, order='C', copy=False)
+    beam.dt = beamIteration.dt.astype(dtype=bm.precision.coord_t, order='C', copy=False)
+    beam.dE = beamIteration.dE.astype(dtype=bm.precision.coord_t, order='C', copy=False)
     gc.collect()    
 
 
@@ -368,8 +368,8 @@ def matched_from_line_density_multibunch(beam, Ring,
         plt.plot(TotalInducedVoltageIteration.profile.bin_centers, TotalInducedVoltageIteration.induced_voltage)
         plt.show()
                 
-    beam.dt = beamIteration.dt.astype(dtype=bm.precision.real_t, order='C', copy=False)
-    beam.dE = beamIteration.dE.astype(dtype=bm.precision.real_t, order='C', copy=False)
+    beam.dt = beamIteration.dt.astype(dtype=bm.precision.coord_t, order='C', copy=False)
+    beam.dE = beamIteration.dE.astype(dtype=bm.precision.coord_t, order='C', copy=False)
     gc.collect()
 
 
@@ -540,8 +540,8 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
         beam.dE[indexBunch*length_dE:(indexBunch+1)*length_dE] = np.array(
             temporary_beam.dE)
     
-    beam.dt = beam.dt.astype(dtype=bm.precision.real_t, order='C', copy=False)
-    beam.dE = beam.dE.astype(dtype=bm.precision.real_t, order='C', copy=False)
+    beam.dt = beam.dt.astype(dtype=bm.precision.coord_t, order='C', copy=False)
+    beam.dE = beam.dE.astype(dtype=bm.precision.coord_t, order='C', copy=False)
     gc.collect()
 
 
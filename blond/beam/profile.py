@@ -21,6 +21,7 @@ import numpy as np
 from scipy import ndimage
 from ..toolbox import filters_and_fitting as ffroutines
 from ..utils import bmath as bm
+from .beam import ChunkedBeam
 
 
 class CutOptions(object):
@@ -269,22 +270,60 @@ class OtherSlicesOptions(object):
         If set True, the profile is calculated when the Profile class below
         is created. If False the user has to manually track the Profile object
         in the main file after its creation
+    reorder_period : int
+        If set, the beam particles are reordered by time bin (see
+        Beam.sort_by_bin) every reorder_period calls of Profile.track, before
+        slicing. This makes the bin accesses of the slicing and interpolation
+        kernels mostly sequential, which pays off for large numbers of slices
+    sample_fraction : float
+        If set, only a fraction of the macroparticles is sliced every turn
+        and the profile is scaled to the full beam: every k-th particle, with
+        k = round(1/sample_fraction), starting from a phase that goes through
+        a random permutation of 0 to k-1 every k turns, so that all the
+        particles are sliced once every k turns. For large beams with smooth
+        profiles, the slicing time scales with the sample size
+    sample_smoothing : float
+        If set with sample_fraction, the profile is the exponential moving
+        average over the turns of the sampled profiles, with this weight
+        (between 0 and 1) for the current turn
+    sample_seed : int
+        Seed of the random permutations of the sample phases
+    deposition_order : int
+        If set, the particles are deposited on the slices with a shape
+        function of order 0 (nearest grid point, as the standard histogram),
+        1 (cloud-in-cell), 2 (triangular-shaped cloud, quadratic spline) or 3
+        (cubic spline), and the voltages are interpolated on the particles
+        with the same shape function (see Profile.interp_kick). The higher
+        orders reduce the noise of the profile per macroparticle
 
     Attributes
     ----------
 
     smooth : boolean
     direct_slicing : boolean
+    reorder_period : int
+    sample_fraction : float
+    sample_smoothing : float
+    sample_seed : int
+    deposition_order : int
 
     """
 
-    def __init__(self, smooth=False, direct_slicing=False):
+    def __init__(self, smooth=False, direct_slicing=False,
+                 reorder_period=None, sample_fraction=None,
+                 sample_smoothing=None, sample_seed=None,
+                 deposition_order=None):
         """
         Constructor
         """
 
         self.smooth = smooth
         self.direct_slicing = direct_slicing
+        self.reorder_period = reorder_period
+        self.sample_fraction = sample_fraction
+        self.sample_smoothing = sample_smoothing
+        self.sample_seed = sample_seed
+        self.deposition_order = deposition_order
 
 
 class Profile(object):
@@ -340,6 +379,9 @@ class Profile(object):
         profile position [s]
     bunchLength : float
         profile length [s]
+    n_macroparticles_error : float array
+        estimated r.m.s. error of n_macroparticles, if a sample of the
+        particles is sliced (see OtherSlicesOptions.sample_fraction)
     filterExtraOptions : unknown (see above)
 
     Examples
@@ -392,11 +434,51 @@ class Profile(object):
         self.beam_spectrum = np.array([], dtype=bm.precision.real_t, order='C')
         self.beam_spectrum_freq = np.array([], dtype=bm.precision.real_t, order='C')
 
-        if OtherSlicesOptions.smooth:
+        # Order of the shape function of the particles
+        self.deposition_order = OtherSlicesOptions.deposition_order
+        if self.deposition_order is not None:
+            if self.deposition_order not in [0, 1, 2, 3]:
+                # DepositionError
+                raise RuntimeError("ERROR in Profile: deposition_order" +
+                                   " should be 0, 1, 2 or 3")
+            if OtherSlicesOptions.smooth or \
+                    OtherSlicesOptions.sample_fraction is not None or \
+                    isinstance(Beam, ChunkedBeam):
+                # DepositionError
+                raise RuntimeError("ERROR in Profile: deposition_order is" +
+                                   " not available with smooth or sampled" +
+                                   " slicing, or for a ChunkedBeam")
+
+        if isinstance(Beam, ChunkedBeam):
+            if OtherSlicesOptions.smooth:
+                # ChunkedBeamError
+                raise RuntimeError("ERROR in Profile: smooth slicing is not" +
+                                   " available for a ChunkedBeam")
+            if OtherSlicesOptions.sample_fraction is not None:
+                # ChunkedBeamError
+                raise RuntimeError("ERROR in Profile: sampled slicing is" +
+                                   " not available for a ChunkedBeam")
+            self.operations = [self._slice_chunked]
+        elif OtherSlicesOptions.sample_fraction is not None:
+            self._set_sampling(OtherSlicesOptions)
+            self.operations = [self._slice_sampled]
+        elif OtherSlicesOptions.smooth:
             self.operations = [self._slice_smooth]
+        elif self.deposition_order is not None:
+            self.operations = [self._slice_deposit]
         else:
             self.operations = [self._slice]
 
+        # Periodic reordering of the particles by bin, done before slicing
+        self.reorder_period = OtherSlicesOptions.reorder_period
+        self._n_tracked = 0
+        if self.reorder_period is not None:
+            if self.reorder_period < 1:
+                # ReorderError
+                raise RuntimeError("ERROR in Profile: reorder_period " +
+                                   "should be a positive integer")
+            self.operations.insert(0, self._reorder)
+
         if FitOptions.fit_option is not None:
             self.fit_option = FitOptions.fit_option
             self.bunchPosition = 0.0
@@ -430,6 +512,16 @@ class Profile(object):
         for op in self.operations:
             op()
 
+    def _reorder(self):
+        """
+        Reorder the beam particles by bin every reorder_period calls.
+        """
+
+        if self._n_tracked % self.reorder_period == 0:
+            self.Beam.sort_by_bin(self.cut_left, self.cut_right,
+                                  self.n_slices)
+        self._n_tracked += 1
+
     def _slice(self):
         """
         Constant space slicing with a constant frame.
@@ -440,6 +532,127 @@ class Profile(object):
         if bm.mpiMode():
             self.reduce_histo()
 
+    def _set_sampling(self, OtherSlicesOptions):
+        """
+        Set the parameters of the sampled slicing.
+        """
+
+        if OtherSlicesOptions.smooth:
+            # SampleError
+            raise RuntimeError("ERROR in Profile: sampled slicing is not" +
+                               " available with smooth slicing")
+        if not 0 < OtherSlicesOptions.sample_fraction <= 1:
+            # SampleError
+            raise RuntimeError("ERROR in Profile: sample_fraction should" +
+                               " be in (0, 1]")
+        if OtherSlicesOptions.sample_smoothing is not None and \
+                not 0 < OtherSlicesOptions.sample_smoothing <= 1:
+            # SampleError
+            raise RuntimeError("ERROR in Profile: sample_smoothing should" +
+                               " be in (0, 1]")
+
+        self.sample_stride = max(int(round(
+            1 / OtherSlicesOptions.sample_fraction)), 1)
+        self.sample_smoothing = OtherSlicesOptions.sample_smoothing
+        self.n_macroparticles_error = np.zeros(self.n_slices)
+        self._sample_rng = np.random.default_rng(
+            OtherSlicesOptions.sample_seed)
+        self._sample_phases = None
+        self._sample_turn = 0
+        self._sample_buffer = None
+        self._sample_variance = None
+
+    def _slice_sampled(self):
+        """
+        Constant space slicing with a constant frame of every sample_stride-th
+        particle, scaled to the full beam. The error estimate is that of the
+        fraction of the particles in each bin, sampled without replacement.
+        """
+
+        stride = self.sample_stride
+        if self._sample_turn % stride == 0:
+            self._sample_phases = self._sample_rng.permutation(stride)
+        phase = self._sample_phases[self._sample_turn % stride]
+        self._sample_turn += 1
+
+        n_total = len(self.Beam.dt)
+        n_sample = len(range(phase, n_total, stride))
+        if self._sample_buffer is None or \
+                len(self._sample_buffer) < n_sample:
+            self._sample_buffer = np.empty(n_total // stride + 1,
+                                           dtype=bm.precision.coord_t)
+        sample = self._sample_buffer[:n_sample]
+        np.copyto(sample, self.Beam.dt[phase::stride])
+
+        histogram = np.empty(self.n_slices, dtype=bm.precision.real_t)
+        bm.slice(sample, histogram, self.cut_left, self.cut_right)
+
+        fraction = histogram / max(n_sample, 1)
+        estimate = n_total * fraction
+        variance = n_total**2 * fraction * (1 - fraction) \
+            / max(n_sample, 1) * (1 - n_sample / max(n_total, 1))
+
+        if bm.mpiMode() and self.Beam.is_splitted:
+            from ..utils.mpi_config import worker
+            worker.allreduce(estimate)
+            worker.allreduce(variance)
+
+        # Exponential moving average, the turns being independent samples
+        alpha = self.sample_smoothing
+        if alpha is None or self._sample_variance is None or \
+                len(self._sample_variance) != self.n_slices:
+            self.n_macroparticles = estimate.astype(
+                dtype=bm.precision.real_t, order='C', copy=False)
+            self._sample_variance = variance
+        else:
+            self.n_macroparticles = (alpha * estimate + (1 - alpha) *
+                                     self.n_macroparticles).astype(
+                dtype=bm.precision.real_t, order='C', copy=False)
+            self._sample_variance = alpha**2 * variance + \
+                (1 - alpha)**2 * self._sample_variance
+        self.n_macroparticles_error = np.sqrt(self._sample_variance)
+
+    def _slice_deposit(self):
+        """
+        Constant space slicing with a constant frame, with the shape function
+        of order deposition_order.
+        """
+        bm.deposit(self.Beam.dt, self.n_macroparticles, self.cut_left,
+                   self.cut_right, self.deposition_order)
+
+        if bm.mpiMode():
+            self.reduce_histo(dtype=np.float64)
+
+    def interp_kick(self, dt, dE, voltage, charge, acceleration_kick):
+        """
+        Kick of the particles by the voltage given at the bin centres,
+        interpolated linearly, or with the shape function of the deposition
+        if deposition_order is set, so that the kick matches the slicing.
+        """
+        if self.deposition_order is None:
+            bm.linear_interp_kick(dt=dt, dE=dE, voltage=voltage,
+                                  bin_centers=self.bin_centers,
+                                  charge=charge,
+                                  acceleration_kick=acceleration_kick)
+        else:
+            bm.interp_kick(dt, dE, voltage, self.cut_left, self.cut_right,
+                           charge, acceleration_kick, self.deposition_order)
+
+    def _slice_chunked(self):
+        """
+        Constant space slicing with a constant frame of a ChunkedBeam, the
+        histogram is accumulated over the chunks.
+        """
+        histogram = np.empty_like(self.n_macroparticles)
+        self.n_macroparticles[:] = 0
+        for chunk in self.Beam.chunks():
+            bm.slice(self.Beam.dt[chunk], histogram, self.cut_left,
+                     self.cut_right)
+            self.n_macroparticles += histogram
+
+        if bm.mpiMode():
+            self.reduce_histo()
+
     def reduce_histo(self, dtype=np.uint32):
         if not bm.mpiMode():
             raise RuntimeError(
@@ -578,3 +791,89 @@ class Profile(object):
             raise RuntimeError('Option for derivative is not recognized.')
 
         return x, derivative
+
+
+class EnsembleProfile(Profile):
+    """
+    Contains the profiles of the members of an EnsembleBeam, sliced in a
+    single call with a frame common to all the members.
+
+    Parameters
+    ----------
+
+    Beam : EnsembleBeam
+        Ensemble of beams from which the profiles have to be calculated
+    CutOptions : object
+        Options for profile cutting (see above)
+    FitOptions : object
+        Options to get profile position and length; only 'rms' is available
+
+    Attributes
+    ----------
+
+    n_macroparticles : float array
+        contains the profiles, shape (n_ensemble, n_slices)
+    bunchPosition : float array
+        profile position of each member [s]
+    bunchLength : float array
+        profile length of each member [s]
+
+    """
+
+    def __init__(self, Beam, CutOptions=CutOptions(),
+                 FitOptions=FitOptions()):
+
+        if bm.precision.mixed:
+            # PrecisionError
+            raise RuntimeError("ERROR in EnsembleProfile: Ensemble slicing" +
+                               " is not available in mixed precision!")
+
+        # Copy of CutOptions object to be usef for reslicing
+        self.cut_options = CutOptions
+
+        # Define bins
+        CutOptions.set_cuts(Beam)
+
+        # Import (reference) Beam
+        self.Beam = Beam
+
+        # Get all computed parameters from CutOptions
+        self.set_slices_parameters()
+
+        # Initialize the profiles as zero arrays
+        self.n_macroparticles = np.zeros((Beam.n_ensemble, self.n_slices),
+                                         dtype=bm.precision.real_t, order='C')
+
+        self.operations = [self._slice]
+
+        if FitOptions.fit_option is not None:
+            if FitOptions.fit_option != 'rms':
+                # ProfileError
+                raise RuntimeError('ERROR in EnsembleProfile: Only the rms' +
+                                   ' fit is available for ensembles!')
+            self.fit_option = FitOptions.fit_option
+            self.bunchPosition = np.zeros(Beam.n_ensemble)
+            self.bunchLength = np.zeros(Beam.n_ensemble)
+            self.operations.append(self.rms)
+
+    def _slice(self):
+        """
+        Constant space slicing with a constant frame, one profile per member.
+        """
+        bm.slice_ensemble(self.Beam.dt, self.n_macroparticles, self.cut_left,
+                          self.cut_right)
+
+    def rms(self):
+        """
+        Computation of the RMS bunch length and position from the line
+        density of each member (bunch length = 4sigma).
+        """
+
+        line_density = self.n_macroparticles / \
+            np.trapz(self.n_macroparticles, dx=self.bin_size)[:, np.newaxis]
+
+        self.bunchPosition = np.trapz(self.bin_centers * line_density,
+                                      dx=self.bin_size)
+        self.bunchLength = 4 * np.sqrt(np.trapz(
+            (self.bin_centers - self.bunchPosition[:, np.newaxis])**2 *
+            line_density, dx=self.bin_size))
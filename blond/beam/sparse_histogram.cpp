@@ -8,99 +8,208 @@ submit itself to any jurisdiction.
 Project website: http://blond.web.cern.ch/
 */
 
-// Optimised C++ routine that calculates the histogram for a sparse beam
+// Optimised C++ routines that calculate the histogram for a sparse beam
+// and kick the particles with the induced voltage of each bucket
 // Author: Juan F. Esteban Mueller, Danilo Quartullo, Alexandre Lasheen
 
-#include <stdio.h>
-
-extern "C" void sparse_histogram(const double * __restrict__ input,
-		    double * __restrict__ output,
-               const double * __restrict__ cut_left_array,
-               const double * __restrict__ cut_right_array,
-               const double * __restrict__ bunch_indexes,
-               const int n_slices,
-               const int n_filled_buckets,
-               const int n_macroparticles){
-	
-    int i;
-    int j;
-    int i_bucket;
-    double a;
-    double fbin;
-    double fbunch;
-    int ffbin;
-    int ffbunch;
-    
+#include <string.h>     // memset()
+#include <stdlib.h>     // malloc()
+#include <math.h>
+#include "../cpp_routines/openmp.h"
+
+
+// The bucket of a particle is floor(dt / bucket_length), the buckets being
+// those of the filling pattern, and bunch_indexes gives the row of the
+// histogram of each bucket, -1 if empty. Each thread fills a private copy
+// of the whole 2D histogram, as in histogram
+template <typename T, typename R>
+static void sparse_histogram_impl(const T *__restrict__ input,
+                                  R *__restrict__ output,
+                                  const double *__restrict__ cut_left_array,
+                                  const double *__restrict__ cut_right_array,
+                                  const long int *__restrict__ bunch_indexes,
+                                  const int n_slices,
+                                  const int n_filled_buckets,
+                                  const int n_buckets,
+                                  const int n_macroparticles)
+{
     // Only valid for cut_edges = edges
-    const double inv_bucket_length = 1.0 / (cut_right_array[0] - cut_left_array[0]);
-    const double inv_bin_width = inv_bucket_length * (double) n_slices;
-    
-    // Initialises all slicing arrays to zero
-    for (i = 0; i < n_filled_buckets*n_slices; i++){
-        output[i] = 0.0;
-    }
-    
-    // Histogram loop
-    for (i = 0; j < n_macroparticles; j++){
-        a = input[j];   // Particle dt
-        if ((a < cut_left_array[0])||(a > cut_right_array[n_filled_buckets-1]))
-            continue;
-        // Find bucket in which the particle is and its index
-        fbunch = (a - cut_left_array[0]) * inv_bucket_length;
-        ffbunch = (int) fbunch;
-        i_bucket = (int) bunch_indexes[ffbunch];
-        if (i_bucket == -1)
-            continue;
-        // Find the bin inside the corresponding bucket
-        fbin = (a - cut_left_array[i_bucket]) * inv_bin_width;
-        ffbin = i_bucket*n_slices + (int) fbin;
-        output[ffbin] = output[ffbin] + 1.0;
+    const double inv_bucket_length = 1.0 / (cut_right_array[0]
+                                            - cut_left_array[0]);
+    const double inv_bin_width = inv_bucket_length * n_slices;
+    const int n_bins = n_filled_buckets * n_slices;
+
+    double *histo = (double *) malloc(omp_get_max_threads() * n_bins
+                                      * sizeof(double));
+
+    #pragma omp parallel
+    {
+        const int id = omp_get_thread_num();
+        const int threads = omp_get_num_threads();
+        double *__restrict__ h = histo + id * n_bins;
+        memset(h, 0, n_bins * sizeof(double));
+
+        #pragma omp for
+        for (int i = 0; i < n_macroparticles; i++) {
+            const double a = input[i];
+            // Find bucket in which the particle is and its index
+            const double fbucket = floor(a * inv_bucket_length);
+            if (!(fbucket >= 0 && fbucket < n_buckets))
+                continue;
+            const long int i_bucket = bunch_indexes[(int) fbucket];
+            if (i_bucket < 0)
+                continue;
+            // Find the bin inside the corresponding bucket
+            const double fbin = floor((a - cut_left_array[i_bucket])
+                                      * inv_bin_width);
+            if (!(fbin >= 0 && fbin < n_slices))
+                continue;
+            h[i_bucket * n_slices + (int) fbin] += 1.;
+        }
+
+        // Reduce to a single histogram
+        #pragma omp for
+        for (int i = 0; i < n_bins; i++) {
+            double sum = 0.;
+            for (int t = 0; t < threads; t++)
+                sum += histo[t * n_bins + i];
+            output[i] = sum;
+        }
     }
+
+    free(histo);
 }
 
 
+// Double, single and mixed (single precision coordinates, double precision
+// histogram) precision variants
+extern "C" void sparse_histogram(const double *__restrict__ input,
+                                 double *__restrict__ output,
+                                 const double *__restrict__ cut_left_array,
+                                 const double *__restrict__ cut_right_array,
+                                 const long int *__restrict__ bunch_indexes,
+                                 const int n_slices,
+                                 const int n_filled_buckets,
+                                 const int n_buckets,
+                                 const int n_macroparticles)
+{
+    sparse_histogram_impl(input, output, cut_left_array, cut_right_array,
+                          bunch_indexes, n_slices, n_filled_buckets,
+                          n_buckets, n_macroparticles);
+}
 
-extern "C" void sparse_histogramf(const float * __restrict__ input,
-            float * __restrict__ output,
-               const float * __restrict__ cut_left_array,
-               const float * __restrict__ cut_right_array,
-               const float * __restrict__ bunch_indexes,
-               const int n_slices,
-               const int n_filled_buckets,
-               const int n_macroparticles){
-    
-    int i;
-    int j;
-    int i_bucket;
-    float a;
-    float fbin;
-    float fbunch;
-    int ffbin;
-    int ffbunch;
-    
-    // Only valid for cut_edges = edges
-    const float inv_bucket_length = 1.0 / (cut_right_array[0] - cut_left_array[0]);
-    const float inv_bin_width = inv_bucket_length * (float) n_slices;
-    
-    // Initialises all slicing arrays to zero
-    for (i = 0; i < n_filled_buckets*n_slices; i++){
-        output[i] = 0.0;
-    }
-    
-    // Histogram loop
-    for (i = 0; j < n_macroparticles; j++){
-        a = input[j];   // Particle dt
-        if ((a < cut_left_array[0])||(a > cut_right_array[n_filled_buckets-1]))
+
+extern "C" void sparse_histogramf(const float *__restrict__ input,
+                                  float *__restrict__ output,
+                                  const double *__restrict__ cut_left_array,
+                                  const double *__restrict__ cut_right_array,
+                                  const long int *__restrict__ bunch_indexes,
+                                  const int n_slices,
+                                  const int n_filled_buckets,
+                                  const int n_buckets,
+                                  const int n_macroparticles)
+{
+    sparse_histogram_impl(input, output, cut_left_array, cut_right_array,
+                          bunch_indexes, n_slices, n_filled_buckets,
+                          n_buckets, n_macroparticles);
+}
+
+
+extern "C" void sparse_histogram_mixed(
+    const float *__restrict__ input, double *__restrict__ output,
+    const double *__restrict__ cut_left_array,
+    const double *__restrict__ cut_right_array,
+    const long int *__restrict__ bunch_indexes, const int n_slices,
+    const int n_filled_buckets, const int n_buckets,
+    const int n_macroparticles)
+{
+    sparse_histogram_impl(input, output, cut_left_array, cut_right_array,
+                          bunch_indexes, n_slices, n_filled_buckets,
+                          n_buckets, n_macroparticles);
+}
+
+
+// The voltage of each filled bucket is given at the centres of its bins and
+// linearly interpolated between them, as in linear_interp_kick. The bucket
+// of a particle is floor(dt / bucket_length), and bunch_indexes gives the
+// row of the voltage of each bucket of the filling pattern, -1 if empty
+template <typename T, typename R>
+static void sparse_interp_kick_impl(const T *__restrict__ beam_dt,
+                                    T *__restrict__ beam_dE,
+                                    const R *__restrict__ voltage,
+                                    const double *__restrict__ cut_left_array,
+                                    const long int *__restrict__ bunch_indexes,
+                                    const double bucket_length,
+                                    const double charge, const int n_slices,
+                                    const int n_buckets,
+                                    const int n_macroparticles,
+                                    const double acc_kick)
+{
+    const double inv_bucket_length = 1. / bucket_length;
+    const double inv_bin_width = n_slices * inv_bucket_length;
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++) {
+        const double t = beam_dt[i];
+        const double fbucket = floor(t * inv_bucket_length);
+        if (!(fbucket >= 0 && fbucket < n_buckets))
+            continue;
+        const long int row = bunch_indexes[(int) fbucket];
+        if (row < 0)
             continue;
-        // Find bucket in which the particle is and its index
-        fbunch = (a - cut_left_array[0]) * inv_bucket_length;
-        ffbunch = (int) fbunch;
-        i_bucket = (int) bunch_indexes[ffbunch];
-        if (i_bucket == -1)
+        const double u = (t - cut_left_array[row]) * inv_bin_width - 0.5;
+        const double fbin = floor(u);
+        if (!(fbin >= 0 && fbin < n_slices - 1))
             continue;
-        // Find the bin inside the corresponding bucket
-        fbin = (a - cut_left_array[i_bucket]) * inv_bin_width;
-        ffbin = i_bucket*n_slices + (int) fbin;
-        output[ffbin] = output[ffbin] + 1.0;
+        const R *__restrict__ v = voltage + row * n_slices + (int) fbin;
+        beam_dE[i] += charge * (v[0] + (u - fbin) * (v[1] - v[0])) + acc_kick;
     }
 }
+
+
+extern "C" void sparse_interp_kick(const double *__restrict__ beam_dt,
+                                   double *__restrict__ beam_dE,
+                                   const double *__restrict__ voltage,
+                                   const double *__restrict__ cut_left_array,
+                                   const long int *__restrict__ bunch_indexes,
+                                   const double bucket_length,
+                                   const double charge, const int n_slices,
+                                   const int n_buckets,
+                                   const int n_macroparticles,
+                                   const double acc_kick)
+{
+    sparse_interp_kick_impl(beam_dt, beam_dE, voltage, cut_left_array,
+                            bunch_indexes, bucket_length, charge, n_slices,
+                            n_buckets, n_macroparticles, acc_kick);
+}
+
+
+extern "C" void sparse_interp_kickf(const float *__restrict__ beam_dt,
+                                    float *__restrict__ beam_dE,
+                                    const float *__restrict__ voltage,
+                                    const double *__restrict__ cut_left_array,
+                                    const long int *__restrict__ bunch_indexes,
+                                    const double bucket_length,
+                                    const double charge, const int n_slices,
+                                    const int n_buckets,
+                                    const int n_macroparticles,
+                                    const double acc_kick)
+{
+    sparse_interp_kick_impl(beam_dt, beam_dE, voltage, cut_left_array,
+                            bunch_indexes, bucket_length, charge, n_slices,
+                            n_buckets, n_macroparticles, acc_kick);
+}
+
+
+extern "C" void sparse_interp_kick_mixed(
+    const float *__restrict__ beam_dt, float *__restrict__ beam_dE,
+    const double *__restrict__ voltage,
+    const double *__restrict__ cut_left_array,
+    const long int *__restrict__ bunch_indexes, const double bucket_length,
+    const double charge, const int n_slices, const int n_buckets,
+    const int n_macroparticles, const double acc_kick)
+{
+    sparse_interp_kick_impl(beam_dt, beam_dE, voltage, cut_left_array,
+                            bunch_indexes, bucket_length, charge, n_slices,
+                            n_buckets, n_macroparticles, acc_kick);
+}
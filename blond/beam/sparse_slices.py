@@ -27,10 +27,16 @@ class SparseSlices(object):
     *This class instantiates a Slice object for each filled bucket according
     to the provided filling pattern. Each slice object will be of the size of 
     an RF bucket and will have the same number of slices.*
+
+    *The profile can be passed to InducedVoltageTime and InducedVoltageFreq:
+    the coupling inside each bunch is then computed with the n_slices of each
+    bucket, and the coupling between bunches with n_coarse_slices per bucket
+    over the whole train (see coarse_profile), without slicing the empty
+    buckets with the fine resolution.*
     '''
     
     def __init__(self, RFStation, Beam, n_slices, filling_pattern, tracker='C',
-                 direct_slicing=False):
+                 direct_slicing=False, n_coarse_slices=None):
         
         #: *Import (reference) Beam*
         self.Beam = Beam
@@ -46,11 +52,29 @@ class SparseSlices(object):
         self.filling_pattern = filling_pattern
         
         # Bunch index for each filled bucket (-1 if empty). Only for C++ track
-        self.bunch_indexes = np.cumsum(filling_pattern) * filling_pattern - 1
+        # and kick
+        self.bunch_indexes = (np.cumsum(filling_pattern) * filling_pattern
+                              - 1).astype(np.int64)
         
         #: *Number of buckets to be sliced*
         self.n_filled_buckets = int(np.sum(filling_pattern))
         
+        #: *Number of slices per bucket of the coarse profile of the train*
+        if n_coarse_slices is None:
+            n_coarse_slices = n_slices
+        if n_slices % n_coarse_slices != 0:
+            # CoarseSlicesError
+            raise RuntimeError("ERROR in SparseSlices: n_slices should be" +
+                               " a multiple of n_coarse_slices")
+        self.n_coarse_slices = int(n_coarse_slices)
+        
+        #: *Index of each filled bucket in the filling pattern*
+        self.bucket_indexes = np.where(filling_pattern)[0]
+        
+        #: *Number of buckets from the first to the last filled one*
+        self.n_train_buckets = int(self.bucket_indexes[-1]
+                                   - self.bucket_indexes[0] + 1)
+        
         # Pre-processing the slicing edges
         self.set_cuts()
         
@@ -59,7 +83,8 @@ class SparseSlices(object):
         # Group n_macroparticles from all objects in a single array
         # (for C++ track).
         self.n_macroparticles_array = np.zeros((self.n_filled_buckets, 
-                                                n_slices))
+                                                n_slices),
+                                               dtype=bm.precision.real_t)
         # Group bin_centers from all objects in a single array (for impedance)
         self.bin_centers_array = np.zeros((self.n_filled_buckets, n_slices))
         for i in range(self.n_filled_buckets):
@@ -72,11 +97,17 @@ class SparseSlices(object):
                                                self.n_macroparticles_array[i,:]
             self.bin_centers_array[i,:] = self.slices_array[i].bin_centers
             self.slices_array[i].bin_centers = self.bin_centers_array[i,:]
+        # Same rows as the induced voltage of a SparseSlices profile
+        self.bin_centers = self.bin_centers_array
+        
+        #: *Bin sizes of the fine and coarse profiles in s*
+        self.bin_size = self.bucket_length / n_slices
+        self.coarse_bin_size = self.bucket_length / self.n_coarse_slices
         
         # Select the tracker
-        if tracker is 'C':
+        if tracker == 'C':
             self.track = self._histrogram_C
-        elif tracker is 'onebyone':
+        elif tracker == 'onebyone':
             self.track = self._histrogram_one_by_one
             
         # Track at initialisation
@@ -92,13 +123,10 @@ class SparseSlices(object):
         '''
         # RF period
         Trf = 2.0 * np.pi / self.RFParams.omega_rf[0,self.RFParams.counter[0]]
+        self.bucket_length = Trf
         
-        self.cut_left_array = np.zeros(self.n_filled_buckets)
-        self.cut_right_array = np.zeros(self.n_filled_buckets)
-        for i in range(self.n_filled_buckets):
-            bucket_index = np.where(self.filling_pattern)[0][i]
-            self.cut_left_array[i] = bucket_index * Trf
-            self.cut_right_array[i] = (bucket_index + 1) * Trf
+        self.cut_left_array = self.bucket_indexes * Trf
+        self.cut_right_array = (self.bucket_indexes + 1) * Trf
 
 
     def _histrogram_C(self):
@@ -109,22 +137,69 @@ class SparseSlices(object):
         bm.sparse_histogram(self.Beam.dt, self.n_macroparticles_array,
             self.cut_left_array, self.cut_right_array,
             self.bunch_indexes)
-
-        # libblond.sparse_histogram(self.Beam.dt.ctypes.data_as(ctypes.c_void_p), 
-        #          self.n_macroparticles_array.ctypes.data_as(ctypes.c_void_p),
-        #          self.cut_left_array.ctypes.data_as(ctypes.c_void_p), 
-        #          self.cut_right_array.ctypes.data_as(ctypes.c_void_p),
-        #          self.bunch_indexes.ctypes.data_as(ctypes.c_void_p),
-        #          ctypes.c_int(self.n_slices), 
-        #          ctypes.c_int(self.n_filled_buckets), 
-        #          ctypes.c_int(self.Beam.n_macroparticles))
+        
+        if bm.mpiMode():
+            self.reduce_histo()
                  
                          
     def _histrogram_one_by_one(self):
         '''
-        *Histrogram generated by calling the tack() method of each Profile 
-        object*
+        *Histrogram generated by slicing the beam in each bucket with the
+        routine of the Profile objects*
         '''
         
         for i in range(self.n_filled_buckets):
-            self.slices_array[i].track()
+            bm.slice(self.Beam.dt, self.n_macroparticles_array[i],
+                     self.cut_left_array[i], self.cut_right_array[i])
+        
+        if bm.mpiMode():
+            self.reduce_histo()
+
+
+    def reduce_histo(self, dtype=np.uint32):
+        '''
+        *Sum of the histograms of all the MPI workers, with a single
+        allreduce of the 2D histogram. The histogram is reduced in place,
+        so that the profiles of the buckets keep pointing to it.*
+        '''
+        if not bm.mpiMode():
+            raise RuntimeError(
+                'ERROR: Cannot use this routine unless in MPI Mode')
+        
+        from ..utils.mpi_config import worker
+        
+        if self.Beam.is_splitted:
+            # Convert to uint32t for better performance
+            histo = self.n_macroparticles_array.astype(dtype, order='C')
+            
+            worker.allreduce(histo)
+            
+            self.n_macroparticles_array[:] = histo
+
+
+    def coarse_profile(self):
+        '''
+        *Profile of the train, from the first to the last filled bucket with
+        the empty buckets in between, with n_coarse_slices per bucket; and
+        coarse profile of each filled bucket, as a 2D array. The coarse bins
+        are sums of n_slices / n_coarse_slices fine bins.*
+        '''
+        
+        coarse = self.n_macroparticles_array.reshape(
+            self.n_filled_buckets, self.n_coarse_slices, -1).sum(axis=2)
+        train = np.zeros((self.n_train_buckets, self.n_coarse_slices))
+        train[self.bucket_indexes - self.bucket_indexes[0]] = coarse
+        
+        return train.ravel(), coarse
+
+
+    def interp_kick(self, dt, dE, voltage, charge, acceleration_kick):
+        '''
+        *Kick of the particles of the filled buckets with the voltage of each
+        bucket, voltage[i] being given at the bin centres of the i-th filled
+        bucket and linearly interpolated in between, as Profile.interp_kick.*
+        '''
+        
+        bm.sparse_interp_kick(dt, dE, voltage, self.cut_left_array,
+                              self.bunch_indexes, self.bucket_length, charge,
+                              acceleration_kick)
@@ -83,8 +83,11 @@ cflags = ['-O3', '-ffast-math', '-std=c++11', '-shared']
 cpp_files = [
     os.path.join(basepath, 'cpp_routines/kick.cpp'),
     os.path.join(basepath, 'cpp_routines/drift.cpp'),
+    os.path.join(basepath, 'cpp_routines/kick_n_drift.cpp'),
     os.path.join(basepath, 'cpp_routines/linear_interp_kick.cpp'),
     os.path.join(basepath, 'cpp_routines/histogram.cpp'),
+    os.path.join(basepath, 'cpp_routines/deposition.cpp'),
+    os.path.join(basepath, 'cpp_routines/losses.cpp'),
     os.path.join(basepath, 'cpp_routines/music_track.cpp'),
     os.path.join(basepath, 'cpp_routines/blondmath.cpp'),
     os.path.join(basepath, 'cpp_routines/fast_resonator.cpp'),
@@ -18,6 +18,7 @@ C++ Math library
 #include "exp.h"
 #include "cos.h"
 #include <cmath>
+#include <cstdint>
 #include <algorithm>
 #include <functional>
 #include "blondmath.h"
@@ -25,6 +26,173 @@ C++ Math library
 
 using namespace std;
 
+
+// Single pass over the alive particles (id != 0) for the beam statistics,
+// accumulated in double precision. The sums are taken relative to the first
+// particle to avoid the cancellation of the variance for large offsets.
+// stats = [n_alive, mean_dt, sigma_dt, sumsq_dt, min_dt, max_dt,
+//          mean_dE, sigma_dE, sumsq_dE, min_dE, max_dE]
+template <typename T, typename I>
+static void beam_statistics_impl(const T *__restrict__ dt,
+                                 const T *__restrict__ dE,
+                                 const I *__restrict__ id,
+                                 double *__restrict__ stats, const int n)
+{
+    const double dt_0 = n > 0 ? dt[0] : 0.;
+    const double dE_0 = n > 0 ? dE[0] : 0.;
+    long count = 0;
+    double sum_dt = 0., sum2_dt = 0., sumsq_dt = 0.;
+    double sum_dE = 0., sum2_dE = 0., sumsq_dE = 0.;
+    double min_dt = INFINITY, max_dt = -INFINITY;
+    double min_dE = INFINITY, max_dE = -INFINITY;
+
+    #pragma omp parallel for reduction(+:count, sum_dt, sum2_dt, sumsq_dt, \
+                                         sum_dE, sum2_dE, sumsq_dE) \
+                             reduction(min:min_dt, min_dE) \
+                             reduction(max:max_dt, max_dE)
+    for (int i = 0; i < n; i++) {
+        if (id[i] == 0) continue;
+        const double x = dt[i];
+        const double y = dE[i];
+        count++;
+        sum_dt += x - dt_0;
+        sum2_dt += (x - dt_0) * (x - dt_0);
+        sumsq_dt += x * x;
+        sum_dE += y - dE_0;
+        sum2_dE += (y - dE_0) * (y - dE_0);
+        sumsq_dE += y * y;
+        min_dt = min(min_dt, x);
+        max_dt = max(max_dt, x);
+        min_dE = min(min_dE, y);
+        max_dE = max(max_dE, y);
+    }
+
+    const double mean_dt = sum_dt / count;
+    const double mean_dE = sum_dE / count;
+    stats[0] = count;
+    stats[1] = dt_0 + mean_dt;
+    stats[2] = sqrt(max(sum2_dt / count - mean_dt * mean_dt, 0.));
+    stats[3] = sumsq_dt;
+    stats[4] = min_dt;
+    stats[5] = max_dt;
+    stats[6] = dE_0 + mean_dE;
+    stats[7] = sqrt(max(sum2_dE / count - mean_dE * mean_dE, 0.));
+    stats[8] = sumsq_dE;
+    stats[9] = min_dE;
+    stats[10] = max_dE;
+}
+
+// Per-bunch statistics of the alive particles (id != 0) in a single pass.
+// The bunch of a particle is bunch_id[id - 1] if bunch_id is given
+// (negative: no bunch), otherwise it is taken from its RF bucket: the
+// particles in the buckets first_bucket_start + k * bunch_spacing_buckets *
+// bucket_size_tau belong to bunch k, the others to no bunch. Every thread
+// accumulates sums relative to the first particle it meets in each bunch;
+// the partial results are merged with the pairwise variance update.
+// stats = [n_alive, mean_dt, sigma_dt, mean_dE, sigma_dE], each of size
+// n_bunches.
+template <typename T, typename I>
+static void bunch_statistics_impl(const T *__restrict__ dt,
+                                  const T *__restrict__ dE,
+                                  const I *__restrict__ id,
+                                  const int *__restrict__ bunch_id,
+                                  const long n_bunch_id,
+                                  const double first_bucket_start,
+                                  const double bucket_size_tau,
+                                  const int bunch_spacing_buckets,
+                                  const int n_bunches,
+                                  double *__restrict__ stats, const int n)
+{
+    const int threads = omp_get_max_threads();
+    const int n_acc = 7;
+    // count, K_dt, S_dt, S2_dt, K_dE, S_dE, S2_dE per thread and bunch
+    double *acc = (double *) calloc((size_t) threads * n_bunches * n_acc,
+                                    sizeof(double));
+    const double inv_bucket = 1. / bucket_size_tau;
+
+    #pragma omp parallel
+    {
+        double *my = acc + (size_t) omp_get_thread_num() * n_bunches * n_acc;
+
+        #pragma omp for
+        for (int i = 0; i < n; i++) {
+            if (id[i] == 0) continue;
+            int b;
+            if (bunch_id != NULL) {
+                if ((long) id[i] > n_bunch_id) continue;
+                b = bunch_id[id[i] - 1];
+            } else {
+                const double bucket = floor((dt[i] - first_bucket_start)
+                                            * inv_bucket);
+                if (bucket < 0 || fmod(bucket, bunch_spacing_buckets) != 0)
+                    continue;
+                b = (int) (bucket / bunch_spacing_buckets);
+            }
+            if (b < 0 || b >= n_bunches) continue;
+
+            double *a = my + b * n_acc;
+            if (a[0] == 0) {
+                a[1] = dt[i];
+                a[4] = dE[i];
+            }
+            const double x = dt[i] - a[1];
+            const double y = dE[i] - a[4];
+            a[0] += 1;
+            a[2] += x;
+            a[3] += x * x;
+            a[5] += y;
+            a[6] += y * y;
+        }
+    }
+
+    for (int b = 0; b < n_bunches; b++) {
+        double count = 0, mean_dt = 0, m2_dt = 0, mean_dE = 0, m2_dE = 0;
+        for (int t = 0; t < threads; t++) {
+            const double *a = acc + ((size_t) t * n_bunches + b) * n_acc;
+            const double n_t = a[0];
+            if (n_t == 0) continue;
+            const double mean_dt_t = a[1] + a[2] / n_t;
+            const double m2_dt_t = a[3] - a[2] * a[2] / n_t;
+            const double mean_dE_t = a[4] + a[5] / n_t;
+            const double m2_dE_t = a[6] - a[5] * a[5] / n_t;
+
+            const double total = count + n_t;
+            const double delta_dt = mean_dt_t - mean_dt;
+            const double delta_dE = mean_dE_t - mean_dE;
+            mean_dt += delta_dt * n_t / total;
+            mean_dE += delta_dE * n_t / total;
+            m2_dt += m2_dt_t + delta_dt * delta_dt * count * n_t / total;
+            m2_dE += m2_dE_t + delta_dE * delta_dE * count * n_t / total;
+            count = total;
+        }
+        stats[b] = count;
+        stats[n_bunches + b] = count > 0 ? mean_dt : NAN;
+        stats[2 * n_bunches + b] = count > 0 ? sqrt(max(m2_dt, 0.) / count) : NAN;
+        stats[3 * n_bunches + b] = count > 0 ? mean_dE : NAN;
+        stats[4 * n_bunches + b] = count > 0 ? sqrt(max(m2_dE, 0.) / count) : NAN;
+    }
+
+    free(acc);
+}
+
+// Stable in-place removal of the particles with id == 0; returns the
+// number of particles kept at the start of the arrays
+template <typename T, typename I>
+static int compact_alive_impl(T *__restrict__ dt, T *__restrict__ dE,
+                              I *__restrict__ id, const int n)
+{
+    int j = 0;
+    for (int i = 0; i < n; i++) {
+        if (id[i] != 0) {
+            dt[j] = dt[i];
+            dE[j] = dE[i];
+            id[j] = id[i];
+            j++;
+        }
+    }
+    return j;
+}
+
 extern "C" {
 
     void where_more_than(const double *__restrict__ data, const int n,
@@ -335,6 +503,29 @@ extern "C" {
         return sqrt(sum_deviation / n);
     }
 
+    // Mixed precision: single precision data, double precision accumulation
+    double mean_mixed(const float * __restrict__ data, const int n)
+    {
+        double m = 0;
+        #pragma omp parallel for reduction(+:m)
+        for (int i = 0; i < n; ++i) {
+            m += data[i];
+        }
+        return m / n;
+    }
+
+    double stdev_mixed(const float * __restrict__ data,
+                       const int n)
+    {
+        const double m = mean_mixed(data, n);
+        double sum_deviation = 0.0;
+
+        #pragma omp parallel for reduction(+:sum_deviation)
+        for (int i = 0; i < n; ++i)
+            sum_deviation += (data[i] - m) * (data[i] - m);
+        return sqrt(sum_deviation / n);
+    }
+
 
     double fast_sin(double x) {return vdt::fast_sin(x);}
     double fast_cos(double x) {return vdt::fast_cos(x);}
@@ -919,5 +1110,131 @@ extern "C" {
     }
 
 
+    // The particle ids are either 64-bit signed or, for the compact
+    // representation, 32-bit unsigned integers (suffix _u32)
+    int compact_alive(double * __restrict__ dt, double * __restrict__ dE,
+                      long * __restrict__ id, const int n)
+    {
+        return compact_alive_impl<double, long>(dt, dE, id, n);
+    }
+
+    int compact_alivef(float * __restrict__ dt, float * __restrict__ dE,
+                       long * __restrict__ id, const int n)
+    {
+        return compact_alive_impl<float, long>(dt, dE, id, n);
+    }
+
+    int compact_alive_u32(double * __restrict__ dt, double * __restrict__ dE,
+                          uint32_t * __restrict__ id, const int n)
+    {
+        return compact_alive_impl<double, uint32_t>(dt, dE, id, n);
+    }
+
+    int compact_alivef_u32(float * __restrict__ dt, float * __restrict__ dE,
+                           uint32_t * __restrict__ id, const int n)
+    {
+        return compact_alive_impl<float, uint32_t>(dt, dE, id, n);
+    }
+
+    void beam_statistics(const double * __restrict__ dt,
+                         const double * __restrict__ dE,
+                         const long * __restrict__ id,
+                         double * __restrict__ stats, const int n)
+    {
+        beam_statistics_impl<double, long>(dt, dE, id, stats, n);
+    }
+
+    void beam_statistics_u32(const double * __restrict__ dt,
+                             const double * __restrict__ dE,
+                             const uint32_t * __restrict__ id,
+                             double * __restrict__ stats, const int n)
+    {
+        beam_statistics_impl<double, uint32_t>(dt, dE, id, stats, n);
+    }
+
+    void beam_statisticsf(const float * __restrict__ dt,
+                          const float * __restrict__ dE,
+                          const long * __restrict__ id,
+                          double * __restrict__ stats, const int n)
+    {
+        beam_statistics_impl<float, long>(dt, dE, id, stats, n);
+    }
+
+    void beam_statisticsf_u32(const float * __restrict__ dt,
+                              const float * __restrict__ dE,
+                              const uint32_t * __restrict__ id,
+                              double * __restrict__ stats, const int n)
+    {
+        beam_statistics_impl<float, uint32_t>(dt, dE, id, stats, n);
+    }
+
+    void bunch_statistics(const double * __restrict__ dt,
+                          const double * __restrict__ dE,
+                          const long * __restrict__ id,
+                          const int * __restrict__ bunch_id,
+                          const long n_bunch_id,
+                          const double first_bucket_start,
+                          const double bucket_size_tau,
+                          const int bunch_spacing_buckets,
+                          const int n_bunches,
+                          double * __restrict__ stats, const int n)
+    {
+        bunch_statistics_impl<double, long>(dt, dE, id, bunch_id, n_bunch_id,
+                                            first_bucket_start, bucket_size_tau,
+                                            bunch_spacing_buckets, n_bunches,
+                                            stats, n);
+    }
+
+    void bunch_statistics_u32(const double * __restrict__ dt,
+                              const double * __restrict__ dE,
+                              const uint32_t * __restrict__ id,
+                              const int * __restrict__ bunch_id,
+                              const long n_bunch_id,
+                              const double first_bucket_start,
+                              const double bucket_size_tau,
+                              const int bunch_spacing_buckets,
+                              const int n_bunches,
+                              double * __restrict__ stats, const int n)
+    {
+        bunch_statistics_impl<double, uint32_t>(dt, dE, id, bunch_id, n_bunch_id,
+                                                first_bucket_start, bucket_size_tau,
+                                                bunch_spacing_buckets, n_bunches,
+                                                stats, n);
+    }
+
+    void bunch_statisticsf(const float * __restrict__ dt,
+                           const float * __restrict__ dE,
+                           const long * __restrict__ id,
+                           const int * __restrict__ bunch_id,
+                           const long n_bunch_id,
+                           const double first_bucket_start,
+                           const double bucket_size_tau,
+                           const int bunch_spacing_buckets,
+                           const int n_bunches,
+                           double * __restrict__ stats, const int n)
+    {
+        bunch_statistics_impl<float, long>(dt, dE, id, bunch_id, n_bunch_id,
+                                           first_bucket_start, bucket_size_tau,
+                                           bunch_spacing_buckets, n_bunches,
+                                           stats, n);
+    }
+
+    void bunch_statisticsf_u32(const float * __restrict__ dt,
+                               const float * __restrict__ dE,
+                               const uint32_t * __restrict__ id,
+                               const int * __restrict__ bunch_id,
+                               const long n_bunch_id,
+                               const double first_bucket_start,
+                               const double bucket_size_tau,
+                               const int bunch_spacing_buckets,
+                               const int n_bunches,
+                               double * __restrict__ stats, const int n)
+    {
+        bunch_statistics_impl<float, uint32_t>(dt, dE, id, bunch_id, n_bunch_id,
+                                               first_bucket_start, bucket_size_tau,
+                                               bunch_spacing_buckets, n_bunches,
+                                               stats, n);
+    }
+
 }
 
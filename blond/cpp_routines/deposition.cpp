@@ -0,0 +1,278 @@
+/*
+Copyright 2016 CERN. This software is distributed under the
+terms of the GNU General Public Licence version 3 (GPL Version 3),
+copied verbatim in the file LICENCE.md.
+In applying this licence, CERN does not waive the privileges and immunities
+granted to it by virtue of its status as an Intergovernmental Organization or
+submit itself to any jurisdiction.
+Project website: http://blond.web.cern.ch/
+*/
+
+// Optimised C++ routines that deposit the particles on the slices with
+// shape functions of order 0 to 3, and kick the particles with a voltage
+// interpolated with the same shape functions
+
+#include <string.h>     // memset()
+#include <stdlib.h>     // malloc()
+#include <math.h>
+#include "openmp.h"
+
+
+// Weights of a particle at position u in units of bin size from the centre
+// of the first bin, on the bins first to first + order (included):
+// order 0: nearest grid point (NGP)
+// order 1: cloud-in-cell (CIC), linear
+// order 2: triangular-shaped cloud (TSC), quadratic spline
+// order 3: cubic spline
+template <int ORDER>
+static inline int shape_weights(const double u, double *__restrict__ w)
+{
+    if (ORDER == 0) {
+        const double first = floor(u + 0.5);
+        w[0] = 1.;
+        return (int) first;
+    } else if (ORDER == 1) {
+        const double first = floor(u);
+        const double f = u - first;
+        w[0] = 1. - f;
+        w[1] = f;
+        return (int) first;
+    } else if (ORDER == 2) {
+        const double centre = floor(u + 0.5);
+        const double d = u - centre;
+        w[0] = 0.5 * (0.5 - d) * (0.5 - d);
+        w[1] = 0.75 - d * d;
+        w[2] = 0.5 * (0.5 + d) * (0.5 + d);
+        return (int) centre - 1;
+    } else {
+        const double first = floor(u);
+        const double f = u - first;
+        const double f2 = f * f;
+        const double g = 1. - f;
+        w[0] = g * g * g / 6.;
+        w[1] = (4. - 6. * f2 + 3. * f2 * f) / 6.;
+        w[2] = (1. + 3. * f + 3. * f2 - 3. * f2 * f) / 6.;
+        w[3] = f2 * f / 6.;
+        return (int) first - 1;
+    }
+}
+
+
+// The shape function of order ORDER extends over (ORDER + 1) / 2 bins on
+// each side of the particle. The thread private histograms have ORDER + 1
+// bins of padding on each side, so that the weights of the particles partly
+// outside the frame are deposited without branches and then dropped
+template <int ORDER, typename T, typename R>
+static void deposit_impl(const T *__restrict__ input, R *__restrict__ output,
+                         const double cut_left, const double cut_right,
+                         const int n_slices, const int n_macroparticles)
+{
+    const int pad = ORDER + 1;
+    const int n_padded = n_slices + 2 * pad;
+    const double half = 0.5 * (ORDER + 1);
+    const double inv_bin_width = n_slices / (cut_right - cut_left);
+
+    double *histo = (double *) malloc(omp_get_max_threads() * n_padded
+                                      * sizeof(double));
+
+    #pragma omp parallel
+    {
+        const int id = omp_get_thread_num();
+        const int threads = omp_get_num_threads();
+        double *__restrict__ h = histo + id * n_padded + pad;
+        memset(h - pad, 0, n_padded * sizeof(double));
+        double w[ORDER + 1];
+
+        #pragma omp for
+        for (int i = 0; i < n_macroparticles; i++) {
+            const double u = (input[i] - cut_left) * inv_bin_width - 0.5;
+            if (!(u >= -half && u < n_slices - 1 + half))
+                continue;
+            const int first = shape_weights<ORDER>(u, w);
+            for (int k = 0; k <= ORDER; k++)
+                h[first + k] += w[k];
+        }
+
+        // Reduce to a single histogram
+        #pragma omp for
+        for (int i = 0; i < n_slices; i++) {
+            double sum = 0.;
+            for (int t = 0; t < threads; t++)
+                sum += histo[t * n_padded + pad + i];
+            output[i] = sum;
+        }
+    }
+
+    free(histo);
+}
+
+
+// The voltage is zero outside the frame, so that the kick matches the
+// deposition; the acceleration kick is applied to the particles in the
+// frame only, as in linear_interp_kick
+template <int ORDER, typename T, typename R>
+static void interp_kick_impl(const T *__restrict__ beam_dt,
+                             T *__restrict__ beam_dE,
+                             const R *__restrict__ voltage,
+                             const double cut_left, const double cut_right,
+                             const double charge, const int n_slices,
+                             const int n_macroparticles,
+                             const double acc_kick)
+{
+    const int pad = ORDER + 1;
+    const double half = 0.5 * (ORDER + 1);
+    const double inv_bin_width = n_slices / (cut_right - cut_left);
+
+    double *padded = (double *) malloc((n_slices + 2 * pad)
+                                       * sizeof(double));
+    double *__restrict__ v = padded + pad;
+    for (int i = -pad; i < 0; i++) {
+        v[i] = 0.;
+        v[n_slices - 1 - i] = 0.;
+    }
+    for (int i = 0; i < n_slices; i++)
+        v[i] = charge * voltage[i];
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++) {
+        const double u = (beam_dt[i] - cut_left) * inv_bin_width - 0.5;
+        if (!(u >= -half && u < n_slices - 1 + half))
+            continue;
+        double w[ORDER + 1];
+        const int first = shape_weights<ORDER>(u, w);
+        double kick = (u >= -0.5 && u < n_slices - 0.5) ? acc_kick : 0.;
+        for (int k = 0; k <= ORDER; k++)
+            kick += w[k] * v[first + k];
+        beam_dE[i] += kick;
+    }
+
+    free(padded);
+}
+
+
+template <typename T, typename R>
+static void deposit_order(const T *__restrict__ input,
+                          R *__restrict__ output, const double cut_left,
+                          const double cut_right, const int n_slices,
+                          const int n_macroparticles, const int order)
+{
+    switch (order) {
+    case 0:
+        deposit_impl<0>(input, output, cut_left, cut_right, n_slices,
+                        n_macroparticles);
+        break;
+    case 1:
+        deposit_impl<1>(input, output, cut_left, cut_right, n_slices,
+                        n_macroparticles);
+        break;
+    case 2:
+        deposit_impl<2>(input, output, cut_left, cut_right, n_slices,
+                        n_macroparticles);
+        break;
+    default:
+        deposit_impl<3>(input, output, cut_left, cut_right, n_slices,
+                        n_macroparticles);
+    }
+}
+
+
+template <typename T, typename R>
+static void interp_kick_order(const T *__restrict__ beam_dt,
+                              T *__restrict__ beam_dE,
+                              const R *__restrict__ voltage,
+                              const double cut_left, const double cut_right,
+                              const double charge, const int n_slices,
+                              const int n_macroparticles,
+                              const double acc_kick, const int order)
+{
+    switch (order) {
+    case 0:
+        interp_kick_impl<0>(beam_dt, beam_dE, voltage, cut_left, cut_right,
+                            charge, n_slices, n_macroparticles, acc_kick);
+        break;
+    case 1:
+        interp_kick_impl<1>(beam_dt, beam_dE, voltage, cut_left, cut_right,
+                            charge, n_slices, n_macroparticles, acc_kick);
+        break;
+    case 2:
+        interp_kick_impl<2>(beam_dt, beam_dE, voltage, cut_left, cut_right,
+                            charge, n_slices, n_macroparticles, acc_kick);
+        break;
+    default:
+        interp_kick_impl<3>(beam_dt, beam_dE, voltage, cut_left, cut_right,
+                            charge, n_slices, n_macroparticles, acc_kick);
+    }
+}
+
+
+// Double, single and mixed (single precision coordinates, double precision
+// profile and voltage) precision variants
+extern "C" void deposit(const double *__restrict__ input,
+                        double *__restrict__ output, const double cut_left,
+                        const double cut_right, const int n_slices,
+                        const int n_macroparticles, const int order)
+{
+    deposit_order(input, output, cut_left, cut_right, n_slices,
+                  n_macroparticles, order);
+}
+
+
+extern "C" void depositf(const float *__restrict__ input,
+                         float *__restrict__ output, const double cut_left,
+                         const double cut_right, const int n_slices,
+                         const int n_macroparticles, const int order)
+{
+    deposit_order(input, output, cut_left, cut_right, n_slices,
+                  n_macroparticles, order);
+}
+
+
+extern "C" void deposit_mixed(const float *__restrict__ input,
+                              double *__restrict__ output,
+                              const double cut_left, const double cut_right,
+                              const int n_slices, const int n_macroparticles,
+                              const int order)
+{
+    deposit_order(input, output, cut_left, cut_right, n_slices,
+                  n_macroparticles, order);
+}
+
+
+extern "C" void interp_kick(const double *__restrict__ beam_dt,
+                            double *__restrict__ beam_dE,
+                            const double *__restrict__ voltage,
+                            const double cut_left, const double cut_right,
+                            const double charge, const int n_slices,
+                            const int n_macroparticles,
+                            const double acc_kick, const int order)
+{
+    interp_kick_order(beam_dt, beam_dE, voltage, cut_left, cut_right, charge,
+                      n_slices, n_macroparticles, acc_kick, order);
+}
+
+
+extern "C" void interp_kickf(const float *__restrict__ beam_dt,
+                             float *__restrict__ beam_dE,
+                             const float *__restrict__ voltage,
+                             const double cut_left, const double cut_right,
+                             const double charge, const int n_slices,
+                             const int n_macroparticles,
+                             const double acc_kick, const int order)
+{
+    interp_kick_order(beam_dt, beam_dE, voltage, cut_left, cut_right, charge,
+                      n_slices, n_macroparticles, acc_kick, order);
+}
+
+
+extern "C" void interp_kick_mixed(const float *__restrict__ beam_dt,
+                                  float *__restrict__ beam_dE,
+                                  const double *__restrict__ voltage,
+                                  const double cut_left,
+                                  const double cut_right,
+                                  const double charge, const int n_slices,
+                                  const int n_macroparticles,
+                                  const double acc_kick, const int order)
+{
+    interp_kick_order(beam_dt, beam_dE, voltage, cut_left, cut_right, charge,
+                      n_slices, n_macroparticles, acc_kick, order);
+}
@@ -159,3 +159,70 @@ extern "C" void driftf(float * __restrict__ beam_dt,
 
 }
 
+
+
+// Mixed precision: single precision coordinates, double precision drift
+// coefficients and arithmetic
+extern "C" void drift_mixed(float * __restrict__ beam_dt,
+                            const float * __restrict__ beam_dE,
+                            const char * __restrict__ solver,
+                            const double T0, const double length_ratio,
+                            const double alpha_order, const double eta_zero,
+                            const double eta_one, const double eta_two,
+                            const double alpha_zero, const double alpha_one,
+                            const double alpha_two,
+                            const double beta, const double energy,
+                            const int n_macroparticles) {
+
+    const double T = T0 * length_ratio;
+
+    if ( strcmp (solver, "simple") == 0 )
+    {
+        const double coeff = eta_zero / (beta * beta * energy);
+        #pragma omp parallel for
+        for (int i = 0; i < n_macroparticles; i++)
+            beam_dt[i] = beam_dt[i] + T * coeff * (double) beam_dE[i];
+    }
+
+    else if ( strcmp (solver, "legacy") == 0 )
+    {
+        const double coeff = 1. / (beta * beta * energy);
+        const double eta0 = eta_zero * coeff;
+        const double eta1 = alpha_order > 0 ? eta_one * coeff * coeff : 0.;
+        const double eta2 = alpha_order > 1 ?
+                            eta_two * coeff * coeff * coeff : 0.;
+
+        #pragma omp parallel for
+        for (int i = 0; i < n_macroparticles; i++) {
+            const double dE = beam_dE[i];
+            beam_dt[i] = beam_dt[i] + T * (1. / (1. - eta0 * dE
+                                                 - eta1 * dE * dE
+                                                 - eta2 * dE * dE * dE) - 1.);
+        }
+    }
+
+    else
+    {
+
+        const double invbetasq = 1 / (beta * beta);
+        const double invenesq = 1 / (energy * energy);
+
+        #pragma omp parallel for
+        for (int i = 0; i < n_macroparticles; i++)
+
+        {
+            const double dE = beam_dE[i];
+            const double beam_delta = sqrt(1. + invbetasq *
+                                           (dE * dE * invenesq + 2.*dE / energy)) - 1.;
+
+            beam_dt[i] = beam_dt[i] + T * (
+                             (1. + alpha_zero * beam_delta +
+                              alpha_one * (beam_delta * beam_delta) +
+                              alpha_two * (beam_delta * beam_delta * beam_delta)) *
+                             (1. + dE / energy) / (1. + beam_delta) - 1.);
+
+        }
+
+    }
+
+}
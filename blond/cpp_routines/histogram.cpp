@@ -14,6 +14,7 @@
 #include <string.h>     // memset()
 #include <stdlib.h>     // mmalloc()
 #include <math.h>
+#include <stdint.h>
 #include "openmp.h"
 
 
@@ -280,4 +281,203 @@ extern "C" void histogram(const double *__restrict__ input,
 
 }
 
-*******/
\ No newline at end of file
+*******/
+
+// Mixed precision: single precision coordinates, double precision cuts and
+// histogram accumulation
+extern "C" void histogram_mixed(const float *__restrict__ input,
+                                double *__restrict__ output,
+                                const double cut_left,
+                                const double cut_right, const int n_slices,
+                                const int n_macroparticles)
+{
+    // Number of Iterations of the inner loop
+    const int STEP = 16;
+    const double inv_bin_width = n_slices / (cut_right - cut_left);
+
+    // allocate memory for the thread_private histogram
+    double **histo = (double **) malloc(omp_get_max_threads() * sizeof(double *));
+    histo[0] = (double *) malloc (omp_get_max_threads() * n_slices * sizeof(double));
+    for (int i = 0; i < omp_get_max_threads(); i++)
+        histo[i] = (*histo + n_slices * i);
+
+    #pragma omp parallel
+    {
+        const int id = omp_get_thread_num();
+        const int threads = omp_get_num_threads();
+        memset(histo[id], 0., n_slices * sizeof(double));
+        double fbin[STEP];
+        #pragma omp for
+        for (int i = 0; i < n_macroparticles; i += STEP) {
+
+            const int loop_count = n_macroparticles - i > STEP ?
+                                   STEP : n_macroparticles - i;
+
+            // First calculate the index to update
+            for (int j = 0; j < loop_count; j++) {
+                fbin[j] = floor(((double) input[i + j] - cut_left) * inv_bin_width);
+            }
+            // Then update the corresponding bins
+            for (int j = 0; j < loop_count; j++) {
+                if (fbin[j] < 0 || fbin[j] >= n_slices) continue;
+                histo[id][(int) fbin[j]] += 1.;
+            }
+        }
+
+        // Reduce to a single histogram
+        #pragma omp for
+        for (int i = 0; i < n_slices; i++) {
+            output[i] = 0.;
+            for (int t = 0; t < threads; t++)
+                output[i] += histo[t][i];
+        }
+    }
+
+    // free memory
+    free(histo[0]);
+    free(histo);
+}
+
+
+// Histograms of an ensemble of beams stored member-major; one histogram
+// (row of output) per member
+extern "C" void histogram_ensemble(const double *__restrict__ input,
+                                   double *__restrict__ output,
+                                   const double cut_left,
+                                   const double cut_right, const int n_slices,
+                                   const int n_macroparticles,
+                                   const int n_ensemble)
+{
+    const double inv_bin_width = n_slices / (cut_right - cut_left);
+
+    #pragma omp parallel for
+    for (int k = 0; k < n_ensemble; k++) {
+        const double *member = input + (size_t) k * n_macroparticles;
+        double *histo = output + (size_t) k * n_slices;
+        memset(histo, 0., n_slices * sizeof(double));
+        for (int i = 0; i < n_macroparticles; i++) {
+            const double fbin = floor((member[i] - cut_left) * inv_bin_width);
+            if (fbin < 0 || fbin >= n_slices) continue;
+            histo[(int) fbin] += 1.;
+        }
+    }
+}
+
+
+extern "C" void histogram_ensemblef(const float *__restrict__ input,
+                                    float *__restrict__ output,
+                                    const float cut_left,
+                                    const float cut_right, const int n_slices,
+                                    const int n_macroparticles,
+                                    const int n_ensemble)
+{
+    const float inv_bin_width = n_slices / (cut_right - cut_left);
+
+    #pragma omp parallel for
+    for (int k = 0; k < n_ensemble; k++) {
+        const float *member = input + (size_t) k * n_macroparticles;
+        float *histo = output + (size_t) k * n_slices;
+        memset(histo, 0., n_slices * sizeof(float));
+        for (int i = 0; i < n_macroparticles; i++) {
+            const float fbin = floor((member[i] - cut_left) * inv_bin_width);
+            if (fbin < 0 || fbin >= n_slices) continue;
+            histo[(int) fbin] += 1.;
+        }
+    }
+}
+
+
+// Stable counting sort of the particles by time bin. dt, dE and id are
+// permuted together; particles outside [cut_left, cut_right) are moved to
+// the end of the arrays, keeping their relative order.
+template <typename T, typename I>
+static void sort_by_bin_impl(T *__restrict__ dt, T *__restrict__ dE,
+                             I *__restrict__ id,
+                             const double cut_left, const double cut_right,
+                             const int n_slices, const int n_macroparticles)
+{
+    const double inv_bin_width = n_slices / (cut_right - cut_left);
+
+    int *bins = (int *) malloc(n_macroparticles * sizeof(int));
+    int *offsets = (int *) calloc(n_slices + 2, sizeof(int));
+    T *buffer = (T *) malloc(n_macroparticles * sizeof(T));
+    I *id_buffer = (I *) malloc(n_macroparticles * sizeof(I));
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++) {
+        const double fbin = floor((dt[i] - cut_left) * inv_bin_width);
+        bins[i] = (fbin < 0 || fbin >= n_slices) ? n_slices : (int) fbin;
+    }
+
+    // Bin populations, then exclusive prefix sum to get the start of each bin
+    for (int i = 0; i < n_macroparticles; i++)
+        offsets[bins[i] + 1]++;
+    for (int b = 0; b < n_slices + 1; b++)
+        offsets[b + 1] += offsets[b];
+
+    // Destination index of every particle, reusing the bins array
+    for (int i = 0; i < n_macroparticles; i++)
+        bins[i] = offsets[bins[i]]++;
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++)
+        buffer[bins[i]] = dt[i];
+    memcpy(dt, buffer, n_macroparticles * sizeof(T));
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++)
+        buffer[bins[i]] = dE[i];
+    memcpy(dE, buffer, n_macroparticles * sizeof(T));
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++)
+        id_buffer[bins[i]] = id[i];
+    memcpy(id, id_buffer, n_macroparticles * sizeof(I));
+
+    free(bins);
+    free(offsets);
+    free(buffer);
+    free(id_buffer);
+}
+
+
+extern "C" void sort_by_bin(double *__restrict__ dt, double *__restrict__ dE,
+                            long int *__restrict__ id, const double cut_left,
+                            const double cut_right, const int n_slices,
+                            const int n_macroparticles)
+{
+    sort_by_bin_impl<double, long int>(dt, dE, id, cut_left, cut_right,
+                                       n_slices, n_macroparticles);
+}
+
+
+extern "C" void sort_by_binf(float *__restrict__ dt, float *__restrict__ dE,
+                             long int *__restrict__ id, const double cut_left,
+                             const double cut_right, const int n_slices,
+                             const int n_macroparticles)
+{
+    sort_by_bin_impl<float, long int>(dt, dE, id, cut_left, cut_right,
+                                      n_slices, n_macroparticles);
+}
+
+
+extern "C" void sort_by_bin_u32(double *__restrict__ dt,
+                                double *__restrict__ dE,
+                                uint32_t *__restrict__ id,
+                                const double cut_left, const double cut_right,
+                                const int n_slices, const int n_macroparticles)
+{
+    sort_by_bin_impl<double, uint32_t>(dt, dE, id, cut_left, cut_right,
+                                       n_slices, n_macroparticles);
+}
+
+
+extern "C" void sort_by_binf_u32(float *__restrict__ dt,
+                                 float *__restrict__ dE,
+                                 uint32_t *__restrict__ id,
+                                 const double cut_left, const double cut_right,
+                                 const int n_slices, const int n_macroparticles)
+{
+    sort_by_bin_impl<float, uint32_t>(dt, dE, id, cut_left, cut_right,
+                                      n_slices, n_macroparticles);
+}
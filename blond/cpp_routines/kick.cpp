@@ -96,3 +96,25 @@ extern "C" void rf_volt_compf(const float * __restrict__ voltage,
     }
 }
 
+
+
+// Mixed precision: single precision coordinates, double precision RF
+// parameters and arithmetic
+extern "C" void kick_mixed(const float * __restrict__ beam_dt,
+                           float * __restrict__ beam_dE, const int n_rf,
+                           const double * __restrict__ voltage,
+                           const double * __restrict__ omega_RF,
+                           const double * __restrict__ phi_RF,
+                           const int n_macroparticles,
+                           const double acc_kick) {
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++) {
+        const double dt = beam_dt[i];
+        double dE = beam_dE[i];
+        for (int j = 0; j < n_rf; j++)
+            dE = dE + voltage[j] * fast_sin(omega_RF[j] * dt + phi_RF[j]);
+        beam_dE[i] = dE + acc_kick;
+    }
+
+}
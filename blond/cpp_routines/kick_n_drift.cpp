@@ -0,0 +1,736 @@
+/*
+Copyright 2016 CERN. This software is distributed under the
+terms of the GNU General Public Licence version 3 (GPL Version 3),
+copied verbatim in the file LICENCE.md.
+In applying this licence, CERN does not waive the privileges and immunities
+granted to it by virtue of its status as an Intergovernmental Organization or
+submit itself to any jurisdiction.
+Project website: http://blond.web.cern.ch/
+*/
+
+// Optimised C++ routines that apply the RF kick and the drift in a single
+// pass over the particle coordinates.
+
+#include <string.h>
+#include <stdlib.h>
+#include <math.h>
+#include <cmath>
+#include "sin.h"
+#include "openmp.h"
+
+using namespace vdt;
+
+enum drift_solver {SIMPLE, LEGACY, EXACT};
+
+
+static inline int solver_id(const char * __restrict__ solver)
+{
+    if (strcmp(solver, "simple") == 0)
+        return SIMPLE;
+    else if (strcmp(solver, "legacy") == 0)
+        return LEGACY;
+    else
+        return EXACT;
+}
+
+
+// Turn-dependent coefficients of the drift equation
+template <typename T>
+struct drift_coeffs {
+    T T0, c0, c1, c2;
+    T alpha_zero, alpha_one, alpha_two, energy;
+};
+
+
+template <typename T>
+static inline drift_coeffs<T> make_drift_coeffs(const int sol,
+        const T T0, const T length_ratio, const T alpha_order,
+        const T eta_zero, const T eta_one, const T eta_two,
+        const T alpha_zero, const T alpha_one, const T alpha_two,
+        const T beta, const T energy)
+{
+    drift_coeffs<T> d;
+    d.T0 = T0 * length_ratio;
+    d.c0 = d.c1 = d.c2 = 0.;
+    d.alpha_zero = alpha_zero;
+    d.alpha_one = alpha_one;
+    d.alpha_two = alpha_two;
+    d.energy = energy;
+
+    if (sol == SIMPLE) {
+        d.c0 = eta_zero / (beta * beta * energy);
+    } else if (sol == LEGACY) {
+        const T coeff = 1. / (beta * beta * energy);
+        d.c0 = eta_zero * coeff;
+        if (alpha_order > 0)
+            d.c1 = eta_one * coeff * coeff;
+        if (alpha_order > 1)
+            d.c2 = eta_two * coeff * coeff * coeff;
+    } else {
+        d.c0 = 1. / (beta * beta);
+        d.c1 = 1. / (energy * energy);
+    }
+    return d;
+}
+
+
+template <typename T>
+static inline T drift_particle(const int sol, const drift_coeffs<T> &d,
+                               const T dE)
+{
+    if (sol == SIMPLE) {
+        return d.T0 * d.c0 * dE;
+    } else if (sol == LEGACY) {
+        return d.T0 * (1. / (1. - d.c0 * dE - d.c1 * dE * dE
+                             - d.c2 * dE * dE * dE) - 1.);
+    } else {
+        const T delta = sqrt(1. + d.c0 *
+                             (dE * dE * d.c1 + 2. * dE / d.energy)) - 1.;
+        return d.T0 * (
+                   (1. + d.alpha_zero * delta +
+                    d.alpha_one * (delta * delta) +
+                    d.alpha_two * (delta * delta * delta)) *
+                   (1. + dE / d.energy) / (1. + delta) - 1.);
+    }
+}
+
+
+static inline double kick_particle(const double dt, double dE, const int n_rf,
+                                   const double * __restrict__ voltage,
+                                   const double * __restrict__ omega_RF,
+                                   const double * __restrict__ phi_RF,
+                                   const double acc_kick)
+{
+    for (int j = 0; j < n_rf; j++)
+        dE = dE + voltage[j] * fast_sin(omega_RF[j] * dt + phi_RF[j]);
+    return dE + acc_kick;
+}
+
+
+static inline float kick_particle(const float dt, float dE, const int n_rf,
+                                  const float * __restrict__ voltage,
+                                  const float * __restrict__ omega_RF,
+                                  const float * __restrict__ phi_RF,
+                                  const float acc_kick)
+{
+    for (int j = 0; j < n_rf; j++)
+        dE = dE + voltage[j] * fast_sinf(omega_RF[j] * dt + phi_RF[j]);
+    return dE + acc_kick;
+}
+
+
+template <typename T>
+static void kick_drift_multiturn_impl(T * __restrict__ beam_dt,
+                                      T * __restrict__ beam_dE,
+                                      const int n_rf,
+                                      const T * __restrict__ voltage,
+                                      const T * __restrict__ omega_RF,
+                                      const T * __restrict__ phi_RF,
+                                      const T * __restrict__ acc_kick,
+                                      const char * __restrict__ solver,
+                                      const T * __restrict__ T0,
+                                      const T length_ratio,
+                                      const T alpha_order,
+                                      const T * __restrict__ eta_zero,
+                                      const T * __restrict__ eta_one,
+                                      const T * __restrict__ eta_two,
+                                      const T * __restrict__ alpha_zero,
+                                      const T * __restrict__ alpha_one,
+                                      const T * __restrict__ alpha_two,
+                                      const T * __restrict__ beta,
+                                      const T * __restrict__ energy,
+                                      const int n_turns,
+                                      const int n_macroparticles)
+{
+    /*
+    The RF arrays (voltage, omega_RF, phi_RF) are stored turn-major, i.e.
+    the element [t * n_rf + j] belongs to the RF system j of the t-th turn
+    of the block; the voltage already includes the particle charge. The
+    drift arrays hold the parameters of the turn following each kick.
+    A step can equally be one RF section of the ring (batched sections),
+    in which case T0 holds the revolution period times the section length
+    ratio and unused RF systems are padded with zero voltage.
+    */
+
+    const int sol = solver_id(solver);
+
+    // Per-turn drift coefficients, computed once for all the particles
+    drift_coeffs<T> *coeffs = (drift_coeffs<T> *) malloc(
+                                  n_turns * sizeof(drift_coeffs<T>));
+    for (int t = 0; t < n_turns; t++)
+        coeffs[t] = make_drift_coeffs<T>(sol, T0[t], length_ratio,
+                                         alpha_order, eta_zero[t],
+                                         eta_one[t], eta_two[t],
+                                         alpha_zero[t], alpha_one[t],
+                                         alpha_two[t], beta[t], energy[t]);
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++) {
+        T dt = beam_dt[i];
+        T dE = beam_dE[i];
+
+        for (int t = 0; t < n_turns; t++) {
+            dE = kick_particle(dt, dE, n_rf, &voltage[t * n_rf],
+                               &omega_RF[t * n_rf], &phi_RF[t * n_rf],
+                               acc_kick[t]);
+            dt += drift_particle<T>(sol, coeffs[t], dE);
+        }
+
+        beam_dt[i] = dt;
+        beam_dE[i] = dE;
+    }
+
+    free(coeffs);
+}
+
+
+extern "C" void kick_drift_multiturn(double * __restrict__ beam_dt,
+                                     double * __restrict__ beam_dE,
+                                     const int n_rf,
+                                     const double * __restrict__ voltage,
+                                     const double * __restrict__ omega_RF,
+                                     const double * __restrict__ phi_RF,
+                                     const double * __restrict__ acc_kick,
+                                     const char * __restrict__ solver,
+                                     const double * __restrict__ T0,
+                                     const double length_ratio,
+                                     const double alpha_order,
+                                     const double * __restrict__ eta_zero,
+                                     const double * __restrict__ eta_one,
+                                     const double * __restrict__ eta_two,
+                                     const double * __restrict__ alpha_zero,
+                                     const double * __restrict__ alpha_one,
+                                     const double * __restrict__ alpha_two,
+                                     const double * __restrict__ beta,
+                                     const double * __restrict__ energy,
+                                     const int n_turns,
+                                     const int n_macroparticles)
+{
+    kick_drift_multiturn_impl<double>(beam_dt, beam_dE, n_rf, voltage,
+                                      omega_RF, phi_RF, acc_kick, solver, T0,
+                                      length_ratio, alpha_order, eta_zero,
+                                      eta_one, eta_two, alpha_zero,
+                                      alpha_one, alpha_two, beta, energy,
+                                      n_turns, n_macroparticles);
+}
+
+
+extern "C" void kick_drift_multiturnf(float * __restrict__ beam_dt,
+                                      float * __restrict__ beam_dE,
+                                      const int n_rf,
+                                      const float * __restrict__ voltage,
+                                      const float * __restrict__ omega_RF,
+                                      const float * __restrict__ phi_RF,
+                                      const float * __restrict__ acc_kick,
+                                      const char * __restrict__ solver,
+                                      const float * __restrict__ T0,
+                                      const float length_ratio,
+                                      const float alpha_order,
+                                      const float * __restrict__ eta_zero,
+                                      const float * __restrict__ eta_one,
+                                      const float * __restrict__ eta_two,
+                                      const float * __restrict__ alpha_zero,
+                                      const float * __restrict__ alpha_one,
+                                      const float * __restrict__ alpha_two,
+                                      const float * __restrict__ beta,
+                                      const float * __restrict__ energy,
+                                      const int n_turns,
+                                      const int n_macroparticles)
+{
+    kick_drift_multiturn_impl<float>(beam_dt, beam_dE, n_rf, voltage,
+                                     omega_RF, phi_RF, acc_kick, solver, T0,
+                                     length_ratio, alpha_order, eta_zero,
+                                     eta_one, eta_two, alpha_zero,
+                                     alpha_one, alpha_two, beta, energy,
+                                     n_turns, n_macroparticles);
+}
+
+
+template <typename T>
+static void kick_drift_periodic_impl(T * __restrict__ beam_dt,
+                                     T * __restrict__ beam_dE,
+                                     const int n_rf,
+                                     const T * __restrict__ voltage,
+                                     const T * __restrict__ omega_RF,
+                                     const T * __restrict__ phi_RF,
+                                     const T acc_kick,
+                                     const char * __restrict__ solver,
+                                     const T T0, const T length_ratio,
+                                     const T alpha_order, const T eta_zero,
+                                     const T eta_one, const T eta_two,
+                                     const T alpha_zero, const T alpha_one,
+                                     const T alpha_two,
+                                     const T beta, const T energy,
+                                     const int n_macroparticles)
+{
+    /*
+    Periodic tracking with a frame of length T0 (the revolution period of
+    the next turn). Particles on the right-hand side of the frame change
+    reference and skip the kick and drift of this turn; particles that end
+    up on the left-hand side of the frame after the drift change reference
+    and receive a second kick and drift.
+    */
+
+    const int sol = solver_id(solver);
+    const drift_coeffs<T> d = make_drift_coeffs<T>(sol, T0, length_ratio,
+                              alpha_order, eta_zero, eta_one, eta_two,
+                              alpha_zero, alpha_one, alpha_two, beta, energy);
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++) {
+        T dt = beam_dt[i];
+        T dE = beam_dE[i];
+
+        if (dt > T0) {
+            dt -= T0;
+        } else {
+            dE = kick_particle(dt, dE, n_rf, voltage, omega_RF, phi_RF,
+                               acc_kick);
+            dt += drift_particle<T>(sol, d, dE);
+
+            if (dt < 0) {
+                dt += T0;
+                dE = kick_particle(dt, dE, n_rf, voltage, omega_RF, phi_RF,
+                                   acc_kick);
+                dt += drift_particle<T>(sol, d, dE);
+            }
+        }
+
+        beam_dt[i] = dt;
+        beam_dE[i] = dE;
+    }
+}
+
+
+extern "C" void kick_drift_periodic(double * __restrict__ beam_dt,
+                                    double * __restrict__ beam_dE,
+                                    const int n_rf,
+                                    const double * __restrict__ voltage,
+                                    const double * __restrict__ omega_RF,
+                                    const double * __restrict__ phi_RF,
+                                    const double acc_kick,
+                                    const char * __restrict__ solver,
+                                    const double T0, const double length_ratio,
+                                    const double alpha_order,
+                                    const double eta_zero,
+                                    const double eta_one,
+                                    const double eta_two,
+                                    const double alpha_zero,
+                                    const double alpha_one,
+                                    const double alpha_two,
+                                    const double beta, const double energy,
+                                    const int n_macroparticles)
+{
+    kick_drift_periodic_impl<double>(beam_dt, beam_dE, n_rf, voltage,
+                                     omega_RF, phi_RF, acc_kick, solver, T0,
+                                     length_ratio, alpha_order, eta_zero,
+                                     eta_one, eta_two, alpha_zero, alpha_one,
+                                     alpha_two, beta, energy,
+                                     n_macroparticles);
+}
+
+
+extern "C" void kick_drift_periodicf(float * __restrict__ beam_dt,
+                                     float * __restrict__ beam_dE,
+                                     const int n_rf,
+                                     const float * __restrict__ voltage,
+                                     const float * __restrict__ omega_RF,
+                                     const float * __restrict__ phi_RF,
+                                     const float acc_kick,
+                                     const char * __restrict__ solver,
+                                     const float T0, const float length_ratio,
+                                     const float alpha_order,
+                                     const float eta_zero,
+                                     const float eta_one,
+                                     const float eta_two,
+                                     const float alpha_zero,
+                                     const float alpha_one,
+                                     const float alpha_two,
+                                     const float beta, const float energy,
+                                     const int n_macroparticles)
+{
+    kick_drift_periodic_impl<float>(beam_dt, beam_dE, n_rf, voltage,
+                                    omega_RF, phi_RF, acc_kick, solver, T0,
+                                    length_ratio, alpha_order, eta_zero,
+                                    eta_one, eta_two, alpha_zero, alpha_one,
+                                    alpha_two, beta, energy,
+                                    n_macroparticles);
+}
+
+
+template <typename T>
+static void linear_interp_kick_drift_slice_impl(T * __restrict__ beam_dt,
+        T * __restrict__ beam_dE,
+        const T * __restrict__ voltage_array,
+        const T * __restrict__ bin_centers,
+        const T charge,
+        const int n_slices,
+        const int n_macroparticles,
+        const T acc_kick,
+        const char * __restrict__ solver,
+        const T T0, const T length_ratio,
+        const T alpha_order, const T eta_zero,
+        const T eta_one, const T eta_two,
+        const T alpha_zero, const T alpha_one,
+        const T alpha_two,
+        const T beta, const T energy,
+        T * __restrict__ profile,
+        const T cut_left, const T cut_right,
+        const int n_bins)
+{
+    /*
+    Kick with the linearly interpolated voltage, drift, and deposit the
+    drifted particles in the histogram of the next turn, in a single pass
+    over the particle coordinates. Equivalent to linear_interp_kick, drift
+    and histogram called one after the other.
+    */
+
+    const int STEP = 64;
+    const int sol = solver_id(solver);
+    const drift_coeffs<T> d = make_drift_coeffs<T>(sol, T0, length_ratio,
+                              alpha_order, eta_zero, eta_one, eta_two,
+                              alpha_zero, alpha_one, alpha_two, beta, energy);
+
+    const T inv_bin_width = (n_slices - 1)
+                            / (bin_centers[n_slices - 1] - bin_centers[0]);
+    const T inv_hist_width = n_bins / (cut_right - cut_left);
+
+    T *voltageKick = (T *) malloc((n_slices - 1) * sizeof(T));
+    T *factor = (T *) malloc((n_slices - 1) * sizeof(T));
+
+    // allocate memory for the thread_private histogram
+    T **histo = (T **) malloc(omp_get_max_threads() * sizeof(T *));
+    histo[0] = (T *) malloc(omp_get_max_threads() * n_bins * sizeof(T));
+    for (int i = 0; i < omp_get_max_threads(); i++)
+        histo[i] = (*histo + n_bins * i);
+
+    #pragma omp parallel
+    {
+        const int id = omp_get_thread_num();
+        const int threads = omp_get_num_threads();
+        memset(histo[id], 0., n_bins * sizeof(T));
+        unsigned fbin[STEP];
+
+        #pragma omp for
+        for (int i = 0; i < n_slices - 1; i++) {
+            voltageKick[i] = charge * (voltage_array[i + 1] - voltage_array[i])
+                             * inv_bin_width;
+            factor[i] = (charge * voltage_array[i] - bin_centers[i]
+                         * voltageKick[i]) + acc_kick;
+        }
+
+        #pragma omp for
+        for (int i = 0; i < n_macroparticles; i += STEP) {
+
+            const int loop_count = n_macroparticles - i > STEP ?
+                                   STEP : n_macroparticles - i;
+
+            // KICK
+            for (int j = 0; j < loop_count; j++) {
+                fbin[j] = (unsigned) std::floor((beam_dt[i + j] - bin_centers[0])
+                                                * inv_bin_width);
+            }
+
+            for (int j = 0; j < loop_count; j++) {
+                if (fbin[j] < n_slices - 1) {
+                    beam_dE[i + j] += beam_dt[i + j] * voltageKick[fbin[j]]
+                                      + factor[fbin[j]];
+                }
+            }
+
+            // DRIFT
+            for (int j = 0; j < loop_count; j++) {
+                beam_dt[i + j] += drift_particle<T>(sol, d, beam_dE[i + j]);
+            }
+
+            // HISTOGRAM
+            for (int j = 0; j < loop_count; j++) {
+                const T fb = std::floor((beam_dt[i + j] - cut_left)
+                                        * inv_hist_width);
+                if (fb < 0 || fb >= n_bins) continue;
+                histo[id][(int) fb] += 1.;
+            }
+        }
+
+        // Reduce to a single histogram
+        #pragma omp for
+        for (int i = 0; i < n_bins; i++) {
+            profile[i] = 0.;
+            for (int t = 0; t < threads; t++)
+                profile[i] += histo[t][i];
+        }
+    }
+
+    free(voltageKick);
+    free(factor);
+    free(histo[0]);
+    free(histo);
+}
+
+
+extern "C" void linear_interp_kick_drift_slice(double * __restrict__ beam_dt,
+        double * __restrict__ beam_dE,
+        const double * __restrict__ voltage_array,
+        const double * __restrict__ bin_centers,
+        const double charge,
+        const int n_slices,
+        const int n_macroparticles,
+        const double acc_kick,
+        const char * __restrict__ solver,
+        const double T0, const double length_ratio,
+        const double alpha_order, const double eta_zero,
+        const double eta_one, const double eta_two,
+        const double alpha_zero, const double alpha_one,
+        const double alpha_two,
+        const double beta, const double energy,
+        double * __restrict__ profile,
+        const double cut_left, const double cut_right,
+        const int n_bins)
+{
+    linear_interp_kick_drift_slice_impl<double>(beam_dt, beam_dE,
+            voltage_array, bin_centers, charge, n_slices, n_macroparticles,
+            acc_kick, solver, T0, length_ratio, alpha_order, eta_zero,
+            eta_one, eta_two, alpha_zero, alpha_one, alpha_two, beta, energy,
+            profile, cut_left, cut_right, n_bins);
+}
+
+
+extern "C" void linear_interp_kick_drift_slicef(float * __restrict__ beam_dt,
+        float * __restrict__ beam_dE,
+        const float * __restrict__ voltage_array,
+        const float * __restrict__ bin_centers,
+        const float charge,
+        const int n_slices,
+        const int n_macroparticles,
+        const float acc_kick,
+        const char * __restrict__ solver,
+        const float T0, const float length_ratio,
+        const float alpha_order, const float eta_zero,
+        const float eta_one, const float eta_two,
+        const float alpha_zero, const float alpha_one,
+        const float alpha_two,
+        const float beta, const float energy,
+        float * __restrict__ profile,
+        const float cut_left, const float cut_right,
+        const int n_bins)
+{
+    linear_interp_kick_drift_slice_impl<float>(beam_dt, beam_dE,
+            voltage_array, bin_centers, charge, n_slices, n_macroparticles,
+            acc_kick, solver, T0, length_ratio, alpha_order, eta_zero,
+            eta_one, eta_two, alpha_zero, alpha_one, alpha_two, beta, energy,
+            profile, cut_left, cut_right, n_bins);
+}
+
+
+// Row of the per-turn table built by the RingAndRFTracker; the layout has to
+// match the turn_table_dtype of blond/trackers/tracker.py
+struct turn_params {
+    double t_rev;       // revolution period times the section length ratio
+    double eta_zero, eta_one, eta_two;
+    double alpha_zero, alpha_one, alpha_two;
+    double beta, energy;
+    double acc_kick;
+};
+
+
+// T is the type of the coordinates, R the type of the arithmetic
+template <typename T, typename R>
+static void kick_turn_impl(const T * __restrict__ beam_dt,
+                           T * __restrict__ beam_dE,
+                           const int n_rf,
+                           const double * __restrict__ voltage,
+                           const double * __restrict__ omega_RF,
+                           const double * __restrict__ phi_RF,
+                           const int stride,
+                           const int turn,
+                           const double charge,
+                           const turn_params * __restrict__ table,
+                           const int n_macroparticles)
+{
+    /*
+    The RF arrays are the (n_rf, n_turns+1) programs of the RFStation, read
+    in place at the column of the current turn (stride = n_turns+1).
+    */
+
+    R *rf = (R *) malloc(3 * n_rf * sizeof(R));
+    for (int j = 0; j < n_rf; j++) {
+        rf[j] = charge * voltage[j * stride + turn];
+        rf[n_rf + j] = omega_RF[j * stride + turn];
+        rf[2 * n_rf + j] = phi_RF[j * stride + turn];
+    }
+    const R acc_kick = table[turn].acc_kick;
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++)
+        beam_dE[i] = kick_particle((R) beam_dt[i], (R) beam_dE[i], n_rf, rf,
+                                   &rf[n_rf], &rf[2 * n_rf], acc_kick);
+
+    free(rf);
+}
+
+
+template <typename T, typename R>
+static void drift_turn_impl(T * __restrict__ beam_dt,
+                            const T * __restrict__ beam_dE,
+                            const int solver,
+                            const int alpha_order,
+                            const int turn,
+                            const turn_params * __restrict__ table,
+                            const int n_macroparticles)
+{
+    const turn_params &p = table[turn];
+    const drift_coeffs<R> d = make_drift_coeffs<R>(solver, p.t_rev, 1.,
+                              alpha_order, p.eta_zero, p.eta_one, p.eta_two,
+                              p.alpha_zero, p.alpha_one, p.alpha_two, p.beta,
+                              p.energy);
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_macroparticles; i++)
+        beam_dt[i] = beam_dt[i] + drift_particle<R>(solver, d, beam_dE[i]);
+}
+
+
+extern "C" void kick_turn(const double * __restrict__ beam_dt,
+                          double * __restrict__ beam_dE,
+                          const int n_rf,
+                          const double * __restrict__ voltage,
+                          const double * __restrict__ omega_RF,
+                          const double * __restrict__ phi_RF,
+                          const int stride, const int turn,
+                          const double charge,
+                          const turn_params * __restrict__ table,
+                          const int n_macroparticles)
+{
+    kick_turn_impl<double, double>(beam_dt, beam_dE, n_rf, voltage, omega_RF,
+                                   phi_RF, stride, turn, charge, table,
+                                   n_macroparticles);
+}
+
+
+extern "C" void kick_turnf(const float * __restrict__ beam_dt,
+                           float * __restrict__ beam_dE,
+                           const int n_rf,
+                           const double * __restrict__ voltage,
+                           const double * __restrict__ omega_RF,
+                           const double * __restrict__ phi_RF,
+                           const int stride, const int turn,
+                           const double charge,
+                           const turn_params * __restrict__ table,
+                           const int n_macroparticles)
+{
+    kick_turn_impl<float, float>(beam_dt, beam_dE, n_rf, voltage, omega_RF,
+                                 phi_RF, stride, turn, charge, table,
+                                 n_macroparticles);
+}
+
+
+extern "C" void drift_turn(double * __restrict__ beam_dt,
+                           const double * __restrict__ beam_dE,
+                           const int solver, const int alpha_order,
+                           const int turn,
+                           const turn_params * __restrict__ table,
+                           const int n_macroparticles)
+{
+    drift_turn_impl<double, double>(beam_dt, beam_dE, solver, alpha_order,
+                                    turn, table, n_macroparticles);
+}
+
+
+extern "C" void drift_turnf(float * __restrict__ beam_dt,
+                            const float * __restrict__ beam_dE,
+                            const int solver, const int alpha_order,
+                            const int turn,
+                            const turn_params * __restrict__ table,
+                            const int n_macroparticles)
+{
+    drift_turn_impl<float, float>(beam_dt, beam_dE, solver, alpha_order,
+                                  turn, table, n_macroparticles);
+}
+
+
+extern "C" void kick_turn_mixed(const float * __restrict__ beam_dt,
+                                float * __restrict__ beam_dE,
+                                const int n_rf,
+                                const double * __restrict__ voltage,
+                                const double * __restrict__ omega_RF,
+                                const double * __restrict__ phi_RF,
+                                const int stride, const int turn,
+                                const double charge,
+                                const turn_params * __restrict__ table,
+                                const int n_macroparticles)
+{
+    kick_turn_impl<float, double>(beam_dt, beam_dE, n_rf, voltage, omega_RF,
+                                  phi_RF, stride, turn, charge, table,
+                                  n_macroparticles);
+}
+
+
+extern "C" void drift_turn_mixed(float * __restrict__ beam_dt,
+                                 const float * __restrict__ beam_dE,
+                                 const int solver, const int alpha_order,
+                                 const int turn,
+                                 const turn_params * __restrict__ table,
+                                 const int n_macroparticles)
+{
+    drift_turn_impl<float, double>(beam_dt, beam_dE, solver, alpha_order,
+                                   turn, table, n_macroparticles);
+}
+
+
+template <typename T>
+static void kick_ensemble_impl(const T * __restrict__ beam_dt,
+                               T * __restrict__ beam_dE,
+                               const int n_ensemble,
+                               const int n_rf,
+                               const T * __restrict__ voltage,
+                               const T * __restrict__ omega_RF,
+                               const T * __restrict__ phi_RF,
+                               const T acc_kick,
+                               const int n_macroparticles)
+{
+    /*
+    The coordinates are stored member-major, i.e. the element
+    [k * n_macroparticles + i] is the particle i of the ensemble member k.
+    The voltages (charge included) and phases are given per member in
+    [k * n_rf + j], the RF frequencies are common to all the members.
+    */
+
+    #pragma omp parallel for collapse(2)
+    for (int k = 0; k < n_ensemble; k++) {
+        for (int i = 0; i < n_macroparticles; i++) {
+            const int index = k * n_macroparticles + i;
+            beam_dE[index] = kick_particle(beam_dt[index], beam_dE[index],
+                                           n_rf, &voltage[k * n_rf],
+                                           omega_RF, &phi_RF[k * n_rf],
+                                           acc_kick);
+        }
+    }
+}
+
+
+extern "C" void kick_ensemble(const double * __restrict__ beam_dt,
+                              double * __restrict__ beam_dE,
+                              const int n_ensemble, const int n_rf,
+                              const double * __restrict__ voltage,
+                              const double * __restrict__ omega_RF,
+                              const double * __restrict__ phi_RF,
+                              const double acc_kick,
+                              const int n_macroparticles)
+{
+    kick_ensemble_impl<double>(beam_dt, beam_dE, n_ensemble, n_rf, voltage,
+                               omega_RF, phi_RF, acc_kick, n_macroparticles);
+}
+
+
+extern "C" void kick_ensemblef(const float * __restrict__ beam_dt,
+                               float * __restrict__ beam_dE,
+                               const int n_ensemble, const int n_rf,
+                               const float * __restrict__ voltage,
+                               const float * __restrict__ omega_RF,
+                               const float * __restrict__ phi_RF,
+                               const float acc_kick,
+                               const int n_macroparticles)
+{
+    kick_ensemble_impl<float>(beam_dt, beam_dE, n_ensemble, n_rf, voltage,
+                              omega_RF, phi_RF, acc_kick, n_macroparticles);
+}
@@ -307,3 +307,59 @@ extern "C" void linear_interp_kick_n_driftf(float * __restrict__ beam_dt,
 }
 
 
+
+
+// Mixed precision: single precision coordinates, double precision voltage,
+// bins and arithmetic
+extern "C" void linear_interp_kick_mixed(float * __restrict__ beam_dt,
+        float * __restrict__ beam_dE,
+        const double * __restrict__ voltage_array,
+        const double * __restrict__ bin_centers,
+        const double charge,
+        const int n_slices,
+        const int n_macroparticles,
+        const double acc_kick)
+{
+
+
+    const int STEP = 64;
+    const double inv_bin_width = (n_slices - 1)
+                                 / (bin_centers[n_slices - 1]
+                                    - bin_centers[0]);
+
+    double *voltageKick = (double *) malloc ((n_slices - 1) * sizeof(double));
+    double *factor = (double *) malloc ((n_slices - 1) * sizeof(double));
+
+    #pragma omp parallel
+    {
+        unsigned fbin[STEP];
+
+        #pragma omp for
+        for (int i = 0; i < n_slices - 1; i++) {
+            voltageKick[i] =  charge * (voltage_array[i + 1] - voltage_array[i]) * inv_bin_width;
+            factor[i] = (charge * voltage_array[i] - bin_centers[i] * voltageKick[i]) + acc_kick;
+        }
+
+        #pragma omp for
+        for (int i = 0; i < n_macroparticles; i += STEP) {
+
+            const int loop_count = n_macroparticles - i > STEP ?
+                                   STEP : n_macroparticles - i;
+
+            for (int j = 0; j < loop_count; j++) {
+                fbin[j] = (unsigned) std::floor(((double) beam_dt[i + j] - bin_centers[0])
+                                                * inv_bin_width);
+            }
+
+            for (int j = 0; j < loop_count; j++) {
+                if (fbin[j] < n_slices - 1) {
+                    beam_dE[i + j] = beam_dE[i + j] + (double) beam_dt[i + j]
+                                     * voltageKick[fbin[j]] + factor[fbin[j]];
+                }
+            }
+
+        }
+    }
+    free(voltageKick);
+    free(factor);
+}
@@ -0,0 +1,252 @@
+/*
+Copyright 2016 CERN. This software is distributed under the
+terms of the GNU General Public Licence version 3 (GPL Version 3),
+copied verbatim in the file LICENCE.md.
+In applying this licence, CERN does not waive the privileges and immunities
+granted to it by virtue of its status as an Intergovernmental Organization or
+submit itself to any jurisdiction.
+Project website: http://blond.web.cern.ch/
+*/
+
+// Optimised C++ routine that flags the lost particles for any combination
+// of time, energy and separatrix cuts in a single pass
+
+#include <math.h>
+#include <stdint.h>
+#include <algorithm>
+#include "cos.h"
+
+using namespace vdt;
+using std::max;
+
+
+// The particles with id != 0 outside [dt_min, dt_max] x [dE_min, dE_max],
+// or outside the separatrix if separatrix is given, get id = 0; returns the
+// number of particles flagged. The separatrix is the level of the single-RF
+// Hamiltonian, with separatrix = [omega_rf, phi_rf, phi_s, sign_eta_0, c1,
+// eta_0, eta_1, eta_2, 1 / (beta^2 E), c2, |H_sep|]:
+// H = c1 eta(delta) dE^2 + c2 (cos(phi) - cos(phi_s) + (phi - phi_s)
+// sin(phi_s)), with phi = omega_rf dt + phi_rf projected on the bucket and
+// eta(delta) = eta_0 + eta_1 delta + eta_2 delta^2, delta = dE / (beta^2 E)
+template <typename T, typename I>
+static int aperture_impl(const T *__restrict__ dt, const T *__restrict__ dE,
+                         I *__restrict__ id, const double dt_min,
+                         const double dt_max, const double dE_min,
+                         const double dE_max,
+                         const double *__restrict__ separatrix, const int n)
+{
+    // Branch-free loops, vectorised by the compiler; the ids of the
+    // particles already lost stay zero
+    int n_lost = 0;
+    if (separatrix == NULL) {
+        #pragma omp parallel for reduction(+:n_lost)
+        for (int i = 0; i < n; i++) {
+            const double t = dt[i];
+            const double e = dE[i];
+            const bool lost = (t < dt_min) | (t > dt_max)
+                              | (e < dE_min) | (e > dE_max);
+            n_lost += (id[i] != 0) & lost;
+            id[i] = lost ? 0 : id[i];
+        }
+        return n_lost;
+    }
+
+    const double omega_rf = separatrix[0];
+    const double phi_rf = separatrix[1];
+    const double phi_s = separatrix[2];
+    const double sign_eta_0 = separatrix[3];
+    const double c1 = separatrix[4];
+    const double eta_0 = separatrix[5];
+    const double eta_1 = separatrix[6];
+    const double eta_2 = separatrix[7];
+    const double inv_beta2_E = separatrix[8];
+    const double c2 = separatrix[9];
+    const double H_sep = separatrix[10];
+    const double cos_phi_s = cos(phi_s);
+    const double sin_phi_s = sin(phi_s);
+    const double two_pi = 2. * M_PI;
+    // Projection of the phase on [0, 2 Pi) above transition, on [-Pi, Pi)
+    // below transition, none at transition
+    const double phase_shift = sign_eta_0 < 0 ? 0.5 : 0.;
+    const double project = sign_eta_0 != 0 ? 1. : 0.;
+
+    #pragma omp parallel for reduction(+:n_lost)
+    for (int i = 0; i < n; i++) {
+        const double t = dt[i];
+        const double e = dE[i];
+        double phi = omega_rf * t + phi_rf;
+        phi -= project * two_pi * floor(phi / two_pi + phase_shift);
+        const double delta = e * inv_beta2_E;
+        const double eta = eta_0 + (eta_1 + eta_2 * delta) * delta;
+        const double H = c1 * eta * e * e
+                         + c2 * (fast_cos(phi) - cos_phi_s
+                                 + (phi - phi_s) * sin_phi_s);
+        const bool lost = (t < dt_min) | (t > dt_max)
+                          | (e < dE_min) | (e > dE_max)
+                          | !(fabs(H) < H_sep);
+        n_lost += (id[i] != 0) & lost;
+        id[i] = lost ? 0 : id[i];
+    }
+    return n_lost;
+}
+
+
+// Same as aperture_impl, with the separatrix given by a tabulated potential
+// well U on a uniform time grid: a particle is inside if
+// eom_factor_dE dE^2 + U(dt) < U_sep, with U linearly interpolated and dt
+// projected onto the RF period starting at the first point of the table.
+// parameters = [t_0, time step, RF period, eom_factor_dE, U_sep]
+template <typename T, typename I>
+static int aperture_potential_impl(const T *__restrict__ dt,
+                                   const T *__restrict__ dE,
+                                   I *__restrict__ id, const double dt_min,
+                                   const double dt_max, const double dE_min,
+                                   const double dE_max,
+                                   const double *__restrict__ potential,
+                                   const int n_potential,
+                                   const double *__restrict__ parameters,
+                                   const int n)
+{
+    const double t_0 = parameters[0];
+    const double inv_step = 1. / parameters[1];
+    const double t_rf = parameters[2];
+    const double inv_t_rf = 1. / t_rf;
+    const double eom_factor_dE = parameters[3];
+    const double U_sep = parameters[4];
+    const double x_max = n_potential - 1;
+
+    int n_lost = 0;
+    #pragma omp parallel for reduction(+:n_lost)
+    for (int i = 0; i < n; i++) {
+        const double t = dt[i];
+        const double e = dE[i];
+        const double t_bucket = t - t_rf * floor((t - t_0) * inv_t_rf);
+        const double x = max((t_bucket - t_0) * inv_step, 0.);
+        const bool in_table = x < x_max;
+        const int k = in_table ? (int) x : 0;
+        const double U = potential[k] + (x - k) * (potential[k + 1]
+                                                   - potential[k]);
+        const bool lost = (t < dt_min) | (t > dt_max)
+                          | (e < dE_min) | (e > dE_max) | !in_table
+                          | !(eom_factor_dE * e * e + U < U_sep);
+        n_lost += (id[i] != 0) & lost;
+        id[i] = lost ? 0 : id[i];
+    }
+    return n_lost;
+}
+
+
+// The particle ids are either 64-bit signed or, for the compact
+// representation, 32-bit unsigned integers (suffix _u32)
+extern "C" int aperture(const double *__restrict__ dt,
+                        const double *__restrict__ dE,
+                        long int *__restrict__ id, const double dt_min,
+                        const double dt_max, const double dE_min,
+                        const double dE_max,
+                        const double *__restrict__ separatrix, const int n)
+{
+    return aperture_impl<double, long int>(dt, dE, id, dt_min, dt_max,
+                                           dE_min, dE_max, separatrix, n);
+}
+
+
+extern "C" int aperturef(const float *__restrict__ dt,
+                         const float *__restrict__ dE,
+                         long int *__restrict__ id, const double dt_min,
+                         const double dt_max, const double dE_min,
+                         const double dE_max,
+                         const double *__restrict__ separatrix, const int n)
+{
+    return aperture_impl<float, long int>(dt, dE, id, dt_min, dt_max,
+                                          dE_min, dE_max, separatrix, n);
+}
+
+
+extern "C" int aperture_u32(const double *__restrict__ dt,
+                            const double *__restrict__ dE,
+                            uint32_t *__restrict__ id, const double dt_min,
+                            const double dt_max, const double dE_min,
+                            const double dE_max,
+                            const double *__restrict__ separatrix,
+                            const int n)
+{
+    return aperture_impl<double, uint32_t>(dt, dE, id, dt_min, dt_max,
+                                           dE_min, dE_max, separatrix, n);
+}
+
+
+extern "C" int aperturef_u32(const float *__restrict__ dt,
+                             const float *__restrict__ dE,
+                             uint32_t *__restrict__ id, const double dt_min,
+                             const double dt_max, const double dE_min,
+                             const double dE_max,
+                             const double *__restrict__ separatrix,
+                             const int n)
+{
+    return aperture_impl<float, uint32_t>(dt, dE, id, dt_min, dt_max,
+                                          dE_min, dE_max, separatrix, n);
+}
+
+
+extern "C" int aperture_potential(const double *__restrict__ dt,
+                                  const double *__restrict__ dE,
+                                  long int *__restrict__ id,
+                                  const double dt_min, const double dt_max,
+                                  const double dE_min, const double dE_max,
+                                  const double *__restrict__ potential,
+                                  const int n_potential,
+                                  const double *__restrict__ parameters,
+                                  const int n)
+{
+    return aperture_potential_impl<double, long int>(
+        dt, dE, id, dt_min, dt_max, dE_min, dE_max, potential, n_potential,
+        parameters, n);
+}
+
+
+extern "C" int aperture_potential_u32(const double *__restrict__ dt,
+                                      const double *__restrict__ dE,
+                                      uint32_t *__restrict__ id,
+                                      const double dt_min, const double dt_max,
+                                      const double dE_min, const double dE_max,
+                                      const double *__restrict__ potential,
+                                      const int n_potential,
+                                      const double *__restrict__ parameters,
+                                      const int n)
+{
+    return aperture_potential_impl<double, uint32_t>(
+        dt, dE, id, dt_min, dt_max, dE_min, dE_max, potential, n_potential,
+        parameters, n);
+}
+
+
+extern "C" int aperture_potentialf(const float *__restrict__ dt,
+                                   const float *__restrict__ dE,
+                                   long int *__restrict__ id,
+                                   const double dt_min, const double dt_max,
+                                   const double dE_min, const double dE_max,
+                                   const double *__restrict__ potential,
+                                   const int n_potential,
+                                   const double *__restrict__ parameters,
+                                   const int n)
+{
+    return aperture_potential_impl<float, long int>(
+        dt, dE, id, dt_min, dt_max, dE_min, dE_max, potential, n_potential,
+        parameters, n);
+}
+
+
+extern "C" int aperture_potentialf_u32(const float *__restrict__ dt,
+                                       const float *__restrict__ dE,
+                                       uint32_t *__restrict__ id,
+                                       const double dt_min, const double dt_max,
+                                       const double dE_min, const double dE_max,
+                                       const double *__restrict__ potential,
+                                       const int n_potential,
+                                       const double *__restrict__ parameters,
+                                       const int n)
+{
+    return aperture_potential_impl<float, uint32_t>(
+        dt, dE, id, dt_min, dt_max, dE_min, dE_max, potential, n_potential,
+        parameters, n);
+}
@@ -21,6 +21,7 @@ from ctypes import c_uint, c_double, c_void_p
 from scipy.constants import e
 from ..toolbox.next_regular import next_regular
 from ..utils import bmath as bm
+from ..beam.sparse_slices import SparseSlices
 
 
 class TotalInducedVoltage(object):
@@ -29,7 +30,8 @@ class TotalInducedVoltage(object):
     list of objects able to compute induced voltages (InducedVoltageTime,
     InducedVoltageFreq, InductiveImpedance). All the induced voltages will
     be summed in order to reduce the computing time. All the induced
-    voltages should have the same slicing resolution.
+    voltages should have the same slicing resolution. With a SparseSlices
+    profile, the induced voltage has one row per filled bucket.
 
     Parameters
     ----------
@@ -69,18 +71,33 @@ class TotalInducedVoltage(object):
 
         # Induced voltage from the sum of the wake sources in V
         self.induced_voltage = np.zeros(
-            int(self.profile.n_slices), dtype=bm.precision.real_t, order='C')
+            np.shape(self.profile.bin_centers), dtype=bm.precision.real_t,
+            order='C')
 
         # Time array of the wake in s
         self.time_array = self.profile.bin_centers
 
-    def reprocess(self):
+    def reprocess(self, full=False):
         """
-        Reprocess the impedance contributions. To be run when profile changes
+        Reprocess the impedance contributions. To be run when profile changes.
+        If only the position of the slicing frame changed, with the same
+        number of slices and bin size, the wakes and impedances are kept and
+        only shifted with the frame, see _InducedVoltage.reprocess.
+
+        Parameters
+        ----------
+        full : boolean, optional
+            Recompute all the wakes and impedances even if only the position
+            of the frame changed
         """
 
+        self.time_array = self.profile.bin_centers
+
         for induced_voltage_object in self.induced_voltage_list:
-            induced_voltage_object.process()
+            if full:
+                induced_voltage_object.process()
+            else:
+                induced_voltage_object.reprocess()
 
     def induced_voltage_sum(self):
         """
@@ -94,7 +111,8 @@ class TotalInducedVoltage(object):
             induced_voltage_object.induced_voltage_generation(
                 beam_spectrum_dict)
             temp_induced_voltage += \
-                induced_voltage_object.induced_voltage[:self.profile.n_slices]
+                induced_voltage_object.induced_voltage[...,
+                                                       :self.profile.n_slices]
 
         self.induced_voltage = temp_induced_voltage.astype(
             dtype=bm.precision.real_t, order='C', copy=False)
@@ -129,19 +147,17 @@ class TotalInducedVoltage(object):
         """
 
         self.induced_voltage_sum()
-        bm.linear_interp_kick(dt=self.beam.dt, dE=self.beam.dE,
-                              voltage=self.induced_voltage,
-                              bin_centers=self.profile.bin_centers,
-                              charge=self.beam.Particle.charge,
-                              acceleration_kick=0.)
+        self.profile.interp_kick(dt=self.beam.dt, dE=self.beam.dE,
+                                 voltage=self.induced_voltage,
+                                 charge=self.beam.Particle.charge,
+                                 acceleration_kick=0.)
 
     def track_ghosts_particles(self, ghostBeam):
 
-        bm.linear_interp_kick(dt=ghostBeam.dt, dE=ghostBeam.dE,
-                              voltage=self.induced_voltage,
-                              bin_centers=self.profile.bin_centers,
-                              charge=self.beam.Particle.charge,
-                              acceleration_kick=0.)
+        self.profile.interp_kick(dt=ghostBeam.dt, dE=ghostBeam.dE,
+                                 voltage=self.induced_voltage,
+                                 charge=self.beam.Particle.charge,
+                                 acceleration_kick=0.)
 
 
 class _InducedVoltage(object):
@@ -232,6 +248,12 @@ class _InducedVoltage(object):
         Reprocess the impedance contributions. To be run when profile changes
         """
 
+        if isinstance(self.profile, SparseSlices):
+            # SparseSlicesError
+            raise RuntimeError("ERROR in _InducedVoltage: SparseSlices " +
+                               "profiles are only available with " +
+                               "InducedVoltageTime and InducedVoltageFreq")
+
         if (self.wake_length_input != None
                 and self.frequency_resolution_input == None):
             # Number of points of the induced voltage array
@@ -309,6 +331,130 @@ class _InducedVoltage(object):
         else:
             self.induced_voltage_generation = self.induced_voltage_1turn
 
+        # Slicing frame for which the wakes and impedances are computed
+        self._frame = (self.profile.n_slices, self.profile.bin_size,
+                       self.profile.cut_left)
+
+    def reprocess(self):
+        """
+        Reprocess the impedance contributions if the number of slices or the
+        bin size changed. The wakes and impedances only depend on the time
+        relative to the slicing frame, so that if only the position of the
+        frame changed, e.g. with CutOptions.track_cuts, they are kept as they
+        are and only the memory of the multi-turn wake is shifted with the
+        frame.
+        """
+
+        if isinstance(self.profile, SparseSlices):
+            self.process()
+            return
+
+        n_slices, bin_size, cut_left = self._frame
+        if n_slices != self.profile.n_slices or \
+                not np.isclose(bin_size, self.profile.bin_size, rtol=1e-9,
+                               atol=0):
+            self.process()
+            return
+
+        self.shift_frame(self.profile.cut_left - cut_left)
+        self._frame = (n_slices, bin_size, self.profile.cut_left)
+
+    def process_sparse(self):
+        """
+        Process the wakes for a SparseSlices profile: the wake is sampled
+        with the fine bin size over one bucket, for the coupling inside each
+        bunch, and with the coarse bin size over the whole train, for the
+        coupling between bunches (see induced_voltage_sparse). The wake
+        samples are given by the sparse_wake method of the child class.
+        """
+
+        if self.multi_turn_wake:
+            # SparseSlicesError
+            raise RuntimeError("ERROR in _InducedVoltage: the multi-turn " +
+                               "wake is not available with SparseSlices")
+
+        n_slices = self.profile.n_slices
+        n_coarse = self.profile.n_coarse_slices
+        n_train = self.profile.n_train_buckets * n_coarse
+
+        # Linear convolutions of the bucket profiles, fine and coarse, and of
+        # the coarse profile of the train
+        def n_fft(n_points):
+            if self.use_regular_fft:
+                return next_regular(2 * n_points - 1)
+            return 2 * n_points - 1
+
+        self.n_fft_fine = n_fft(n_slices)
+        self.n_fft_bucket = n_fft(n_coarse)
+        self.n_fft_coarse = n_fft(n_train)
+
+        wake_fine = self.sparse_wake(self.profile.bin_size, n_slices)
+        wake_coarse = self.sparse_wake(self.profile.coarse_bin_size, n_train)
+        self.impedance_fine = bm.rfft(wake_fine, self.n_fft_fine)
+        self.impedance_bucket = bm.rfft(wake_coarse[:n_coarse],
+                                        self.n_fft_bucket)
+        self.impedance_coarse = bm.rfft(wake_coarse, self.n_fft_coarse)
+
+        # Linear interpolation from the coarse to the fine bin centres of a
+        # bucket, extrapolated beyond the first and last coarse bin centres
+        position = (np.arange(n_slices) + 0.5) * n_coarse / n_slices - 0.5
+        self._coarse_left = np.clip(np.floor(position).astype(int), 0,
+                                    max(n_coarse - 2, 0))
+        self._coarse_right = np.minimum(self._coarse_left + 1, n_coarse - 1)
+        self._coarse_weight = position - self._coarse_left
+
+        self.n_induced_voltage = n_slices
+        self.induced_voltage_generation = self.induced_voltage_sparse
+
+    def induced_voltage_sparse(self, beam_spectrum_dict={}):
+        """
+        Method to calculate the induced voltage in each filled bucket of a
+        SparseSlices profile: the voltage of the other bunches is computed
+        on the coarse profile of the train and interpolated on the fine bins,
+        and the voltage of the bunch itself on the fine profile of its
+        bucket.
+        """
+
+        profile = self.profile
+        n_coarse = profile.n_coarse_slices
+        train, coarse = profile.coarse_profile()
+
+        def convolve_rows(signal, impedance, n_fft, n_points):
+            # Bucket by bucket through the 1D FFTs of bm, which are the FFTW
+            # ones after bm.use_fftw()
+            return np.array([bm.irfft(bm.rfft(row, n_fft) * impedance,
+                                      n_fft)[:n_points] for row in signal])
+
+        # Coupling between bunches: voltage of the whole train on the filled
+        # buckets, minus the voltage of each bunch on its own bucket
+        voltage = bm.irfft(bm.rfft(train, self.n_fft_coarse)
+                           * self.impedance_coarse,
+                           self.n_fft_coarse)[:len(train)]
+        voltage = voltage.reshape(profile.n_train_buckets, n_coarse)[
+            profile.bucket_indexes - profile.bucket_indexes[0]]
+        voltage -= convolve_rows(coarse, self.impedance_bucket,
+                                 self.n_fft_bucket, n_coarse)
+        voltage = voltage[:, self._coarse_left] \
+            + self._coarse_weight * (voltage[:, self._coarse_right]
+                                     - voltage[:, self._coarse_left])
+
+        # Coupling inside each bunch
+        voltage += convolve_rows(profile.n_macroparticles_array,
+                                 self.impedance_fine, self.n_fft_fine,
+                                 profile.n_slices)
+
+        self.induced_voltage = (- self.beam.Particle.charge * e
+                                * self.beam.ratio * voltage).astype(
+            dtype=bm.precision.real_t, order='C', copy=False)
+
+    def shift_frame(self, delta):
+        """
+        Method to follow a shift of the slicing frame by delta [s]
+        """
+
+        if self.multi_turn_wake and delta != 0:
+            self.shift_trev(delta)
+
     def induced_voltage_1turn(self, beam_spectrum_dict={}):
         """
         Method to calculate the induced voltage at the current turn. DFTs are
@@ -351,13 +497,14 @@ class _InducedVoltage(object):
 
         self.induced_voltage = self.mtw_memory[:self.n_induced_voltage]
 
-    def shift_trev_freq(self):
+    def shift_trev_freq(self, t_rev=None):
         """
-        Method to shift the induced voltage by a revolution period in the
-        frequency domain
+        Method to shift the induced voltage by a revolution period, or by
+        t_rev if given, in the frequency domain
         """
 
-        t_rev = self.RFParams.t_rev[self.RFParams.counter[0]]
+        if t_rev is None:
+            t_rev = self.RFParams.t_rev[self.RFParams.counter[0]]
         # Shift in frequency domain
         induced_voltage_f = bm.rfft(self.mtw_memory, self.n_mtw_fft)
         induced_voltage_f *= np.exp(self.omegaj_mtw * t_rev)
@@ -366,13 +513,14 @@ class _InducedVoltage(object):
         # circular convolution
         self.mtw_memory[-int(self.buffer_size):] = 0
 
-    def shift_trev_time(self):
+    def shift_trev_time(self, t_rev=None):
         """
-        Method to shift the induced voltage by a revolution period in the
-        time domain (linear interpolation)
+        Method to shift the induced voltage by a revolution period, or by
+        t_rev if given, in the time domain (linear interpolation)
         """
 
-        t_rev = self.RFParams.t_rev[self.RFParams.counter[0]]
+        if t_rev is None:
+            t_rev = self.RFParams.t_rev[self.RFParams.counter[0]]
         self.mtw_memory = bm.interp_const_space(self.time_mtw + t_rev,
                                                 self.time_mtw, self.mtw_memory,
                                                 left=0, right=0)
@@ -384,11 +532,10 @@ class _InducedVoltage(object):
 
         self.induced_voltage_generation()
 
-        bm.linear_interp_kick(dt=self.beam.dt, dE=self.beam.dE,
-                              voltage=self.induced_voltage,
-                              bin_centers=self.profile.bin_centers,
-                              charge=self.beam.Particle.charge,
-                              acceleration_kick=0.)
+        self.profile.interp_kick(dt=self.beam.dt, dE=self.beam.dE,
+                                 voltage=self.induced_voltage,
+                                 charge=self.beam.Particle.charge,
+                                 acceleration_kick=0.)
 
 
 class InducedVoltageTime(_InducedVoltage):
@@ -400,7 +547,7 @@ class InducedVoltageTime(_InducedVoltage):
     Beam : object
         Beam object
     Profile : object
-        Profile object
+        Profile object, or SparseSlices object for a train of bunches
     wake_source_list : list
         Wake sources list (e.g. list of Resonator objects)
     wake_length : float, optional
@@ -447,6 +594,10 @@ class InducedVoltageTime(_InducedVoltage):
         Reprocess the impedance contributions. To be run when profile changes
         """
 
+        if isinstance(self.profile, SparseSlices):
+            self.process_sparse()
+            return
+
         _InducedVoltage.process(self)
 
         # Number of points for the FFT, equal to the length of the induced
@@ -486,6 +637,23 @@ class InducedVoltageTime(_InducedVoltage):
         # frequency domain (padding zeros)
         self.total_impedance = bm.rfft(self.total_wake, self.n_fft)
 
+    def sparse_wake(self, bin_size, n_points):
+        """
+        Total wake at the times k * bin_size, k < n_points, for a
+        SparseSlices profile; zero beyond the wake length if given.
+        """
+
+        time = np.arange(n_points) * bin_size
+        wake = np.zeros(n_points)
+        for wake_object in self.wake_source_list:
+            wake_object.wake_calc(time)
+            wake += wake_object.wake
+
+        if self.wake_length_input is not None:
+            wake[time >= self.wake_length_input] = 0
+
+        return wake
+
 
 class InducedVoltageFreq(_InducedVoltage):
     r"""
@@ -496,7 +664,7 @@ class InducedVoltageFreq(_InducedVoltage):
     Beam : object
         Beam object
     Profile : object
-        Profile object
+        Profile object, or SparseSlices object for a train of bunches
     impedance_source_list : list
         Impedance sources list (e.g. list of Resonator objects)
     frequency_resolution : float, optional
@@ -554,6 +722,10 @@ class InducedVoltageFreq(_InducedVoltage):
         Reprocess the impedance contributions. To be run when profile change
         """
 
+        if isinstance(self.profile, SparseSlices):
+            self.process_sparse()
+            return
+
         _InducedVoltage.process(self)
 
         # Number of points for the FFT. The next regular number is used for
@@ -593,6 +765,33 @@ class InducedVoltageFreq(_InducedVoltage):
         # Factor relating Fourier transform and DFT
         self.total_impedance /= self.profile.bin_size
 
+    def sparse_wake(self, bin_size, n_points):
+        """
+        Wake at the times k * bin_size, k < n_points, for a SparseSlices
+        profile, from the total impedance sampled with the frequency
+        resolution (by default the inverse of twice the length of the train)
+        and transformed to the time domain. Only the wake behind the source
+        is kept.
+        """
+
+        if self.frequency_resolution_input is None:
+            frequency_resolution = 1 / (2 * self.profile.n_train_buckets
+                                        * self.profile.bucket_length)
+        else:
+            frequency_resolution = self.frequency_resolution_input
+        n_fft = max(int(np.ceil(1 / (bin_size * frequency_resolution))),
+                    n_points)
+        if self.use_regular_fft:
+            n_fft = next_regular(n_fft)
+
+        freq = bm.rfftfreq(n_fft, bin_size)
+        impedance = np.zeros(freq.shape, dtype=complex)
+        for impedance_source in self.impedance_source_list:
+            impedance_source.imped_calc(freq)
+            impedance += impedance_source.impedance
+
+        return bm.irfft(impedance / bin_size, n_fft)[:n_points]
+
 
 class InductiveImpedance(_InducedVoltage):
     """
@@ -768,6 +967,15 @@ class InducedVoltageResonator(_InducedVoltage):
         self._deltaT = np.zeros(
             (self.n_time, self.profile.n_slices), dtype=bm.precision.real_t, order='C')
 
+    def shift_frame(self, delta):
+        r"""
+        Method to follow a shift of the slicing frame by delta [s]
+        """
+
+        # The induced voltage is computed at the new bin centres
+        if self.atLineDensityTimes:
+            self.tArray = self.profile.bin_centers
+
     def induced_voltage_1turn(self, beam_spectrum_dict={}):
         r"""
         Method to calculate the induced voltage through linearily 
@@ -125,6 +125,18 @@ class Music(object):
         self.array_parameters = np.array([self.input_first_component,
                                           self.input_second_component, self.t_rev, self.last_dt])
 
+    def _match_beam_size(self):
+        """
+        Resize the per-particle induced voltage if the number of particles
+        changed, e.g. after Beam.eliminate_lost_particles; the first element,
+        the initial condition of the single-turn recursion, is kept.
+        """
+
+        if len(self.induced_voltage) != len(self.beam.dt):
+            first = self.induced_voltage[0]
+            self.induced_voltage = np.zeros(len(self.beam.dt))
+            self.induced_voltage[0] = first
+
     def track_cpp(self):
         r"""
         Voltage in time domain (single-turn) using MuSiC (C++ code).
@@ -141,6 +153,7 @@ class Music(object):
         >>> music_cpp.track_cpp()
 
         """
+        self._match_beam_size()
         bm.music_track(self.beam.dt, self.beam.dE, self.induced_voltage,
                        self.array_parameters, self.alpha, self.omega_bar,
                        self.const, self.coeff1, self.coeff2, self.coeff3,
@@ -164,6 +177,7 @@ class Music(object):
         >>>     music_cpp.track_cpp_multi_turn()
 
         """
+        self._match_beam_size()
         bm.music_track_multiturn(self.beam.dt, self.beam.dE, self.induced_voltage,
                                  self.array_parameters, self.alpha, self.omega_bar,
                                  self.const, self.coeff1, self.coeff2, self.coeff3,
@@ -185,6 +199,7 @@ class Music(object):
 
         """
 
+        self._match_beam_size()
         indices_sorted = np.argsort(self.beam.dt)
         self.beam.dt = self.beam.dt[indices_sorted]
         self.beam.dE = self.beam.dE[indices_sorted]
@@ -234,6 +249,7 @@ class Music(object):
 
         """
 
+        self._match_beam_size()
         indices_sorted = np.argsort(self.beam.dt)
         self.beam.dt = self.beam.dt[indices_sorted]
         self.beam.dE = self.beam.dE[indices_sorted]
@@ -283,6 +299,7 @@ class Music(object):
 
         """
 
+        self._match_beam_size()
         indices_sorted = np.argsort(self.beam.dt)
         self.beam.dt = self.beam.dt[indices_sorted]
         self.beam.dE = self.beam.dE[indices_sorted]
@@ -370,10 +370,14 @@ class SlicesMonitor(object):
 class MultiBunchMonitor(object):
 
     ''' Class able to save multi-bunch profile, i.e. the histogram derived from
-        the slicing.
+        the slicing, and the bunch-by-bunch statistics of the beam. For more
+        than one bunch, the statistics are computed every turn with
+        Beam.statistics_multibunch, using Beam.bunch_id if it is set and the
+        RF buckets otherwise.
     '''
 
-    def __init__(self, filename, n_turns, profile, rf, Nbunches, buffer_size=100):
+    def __init__(self, filename, n_turns, profile, rf, Nbunches, buffer_size=100,
+                 bunch_spacing_buckets=1):
 
         self.h5file = hp.File(filename + '.h5', 'w')
         self.n_turns = n_turns
@@ -384,6 +388,7 @@ class MultiBunchMonitor(object):
         self.h5file.create_group('default')
         self.h5group = self.h5file['default']
         self.Nbunches = Nbunches
+        self.bunch_spacing_buckets = bunch_spacing_buckets
         self.buffer_size = buffer_size
         self.last_save = 0
 
@@ -411,49 +416,15 @@ class MultiBunchMonitor(object):
         self.b_fwhm_bunch_length = np.zeros(
             (self.buffer_size, self.Nbunches), dtype=float)
 
-        if self.Nbunches == 1:
-            # All these can be calculated only when single bunch
-            self.create_data(
-                'mean_dE', self.h5file['default'], (
-                    self.n_turns, self.Nbunches),
-                dtype='float64')
-            self.create_data(
-                'dE_norm', self.h5file['default'], (
-                    self.n_turns, self.Nbunches),
-                dtype='float64')
-
-            self.create_data(
-                'mean_dt', self.h5file['default'], (
-                    self.n_turns, self.Nbunches),
-                dtype='float64')
-
-            self.create_data(
-                'dt_norm', self.h5file['default'], (
-                    self.n_turns, self.Nbunches),
-                dtype='float64')
-
-            self.create_data(
-                'std_dE', self.h5file['default'], (self.n_turns, self.Nbunches),
-                dtype='float64')
-
-            self.create_data(
-                'std_dt', self.h5file['default'], (self.n_turns, self.Nbunches),
-                dtype='float64')
-
-            self.b_mean_dE = np.zeros(
-                (self.buffer_size, self.Nbunches), dtype=float)
-            self.b_mean_dt = np.zeros(
-                (self.buffer_size, self.Nbunches), dtype=float)
-
-            self.b_dE_norm = np.zeros(
-                (self.buffer_size, self.Nbunches), dtype=float)
-            self.b_dt_norm = np.zeros(
-                (self.buffer_size, self.Nbunches), dtype=float)
-
-            self.b_std_dE = np.zeros(
-                (self.buffer_size, self.Nbunches), dtype=float)
-            self.b_std_dt = np.zeros(
-                (self.buffer_size, self.Nbunches), dtype=float)
+        # Bunch-by-bunch statistics
+        self.statistics_names = ['mean_dE', 'dE_norm', 'mean_dt',
+                                 'dt_norm', 'std_dE', 'std_dt', 'epsn_rms_l',
+                                 'n_macroparticles_alive']
+        for name in self.statistics_names:
+            self.create_data(name, self.h5file['default'],
+                             (self.n_turns, self.Nbunches), dtype='float64')
+            setattr(self, 'b_' + name,
+                    np.zeros((self.buffer_size, self.Nbunches), dtype=float))
 
     def __del__(self):
         if self.i_turn > self.last_save:
@@ -462,22 +433,11 @@ class MultiBunchMonitor(object):
 
     def write_buffer(self, turn):
 
-        # Nppb = int(self.profile.Beam.n_macroparticles // self.Nbunches)
-        # mean_dE = np.zeros(self.Nbunches, dtype=float)
-        # mean_dt = np.zeros(self.Nbunches, dtype=float)
-        # std_dE = np.zeros(self.Nbunches, dtype=float)
-        # std_dt = np.zeros(self.Nbunches, dtype=float)
-        # for i in range(self.Nbunches):
-        #     mean_dE[i] = np.mean(self.profile.Beam.dE[i*Nppb:(i+1)*Nppb])
-        #     mean_dt[i] = np.mean(self.profile.Beam.dt[i*Nppb:(i+1)*Nppb])
-        #     std_dE[i] = np.std(self.profile.Beam.dE[i*Nppb:(i+1)*Nppb])
-        #     std_dt[i] = np.std(self.profile.Beam.dt[i*Nppb:(i+1)*Nppb])
-
         idx = self.i_turn % self.buffer_size
 
         self.b_turns[idx] = turn
         self.b_profile[idx] = self.profile.n_macroparticles.astype(np.int32)
-        self.b_losses[idx] = self.beam.losses
+        self.b_losses[idx] = self.beam.n_macroparticles_lost
         self.b_fwhm_bunch_position[idx] = self.profile.bunchPosition
         self.b_fwhm_bunch_length[idx] = self.profile.bunchLength
 
@@ -486,16 +446,31 @@ class MultiBunchMonitor(object):
             self.b_mean_dt[idx] = self.beam.mean_dt
             self.b_std_dE[idx] = self.beam.sigma_dE
             self.b_std_dt[idx] = self.beam.sigma_dt
-            self.b_dE_norm[idx] = self.rf.voltage[0, turn]
-
-            if turn == 0:
-                self.b_dt_norm[idx] = self.rf.t_rev[0] * self.rf.eta_0[0] * \
-                    self.rf.voltage[0, 0] / \
-                    (self.rf.beta[0]**2 * self.rf.energy[0])
-            else:
-                self.b_dt_norm[idx] = self.rf.t_rev[turn] * self.rf.eta_0[turn] * \
-                    self.rf.voltage[0, turn-1] / \
-                    (self.rf.beta[turn]**2 * self.rf.energy[turn])
+            self.b_epsn_rms_l[idx] = np.pi*self.beam.sigma_dE * \
+                self.beam.sigma_dt
+            self.b_n_macroparticles_alive[idx] = \
+                self.beam.n_macroparticles_alive
+        else:
+            self.beam.statistics_multibunch(
+                self.Nbunches, self.bunch_spacing_buckets,
+                self.rf.t_rf[0, turn])
+            self.b_mean_dE[idx] = self.beam.bunch_mean_dE
+            self.b_mean_dt[idx] = self.beam.bunch_mean_dt
+            self.b_std_dE[idx] = self.beam.bunch_sigma_dE
+            self.b_std_dt[idx] = self.beam.bunch_sigma_dt
+            self.b_epsn_rms_l[idx] = self.beam.bunch_epsn_rms_l
+            self.b_n_macroparticles_alive[idx] = \
+                self.beam.bunch_n_macroparticles_alive
+
+        self.b_dE_norm[idx] = self.rf.voltage[0, turn]
+        if turn == 0:
+            self.b_dt_norm[idx] = self.rf.t_rev[0] * self.rf.eta_0[0] * \
+                self.rf.voltage[0, 0] / \
+                (self.rf.beta[0]**2 * self.rf.energy[0])
+        else:
+            self.b_dt_norm[idx] = self.rf.t_rev[turn] * self.rf.eta_0[turn] * \
+                self.rf.voltage[0, turn-1] / \
+                (self.rf.beta[turn]**2 * self.rf.energy[turn])
 
     def write_data(self):
         i1_h5 = self.last_save
@@ -512,13 +487,9 @@ class MultiBunchMonitor(object):
         self.h5group['fwhm_bunch_position'][i1_h5:i2_h5] = self.b_fwhm_bunch_position[i1_b:i2_b]
         self.h5group['fwhm_bunch_length'][i1_h5:i2_h5] = self.b_fwhm_bunch_length[i1_b:i2_b]
 
-        if self.Nbunches == 1:
-            self.h5group['mean_dE'][i1_h5:i2_h5] = self.b_mean_dE[i1_b:i2_b]
-            self.h5group['dE_norm'][i1_h5:i2_h5] = self.b_dE_norm[i1_b:i2_b]
-            self.h5group['dt_norm'][i1_h5:i2_h5] = self.b_dt_norm[i1_b:i2_b]
-            self.h5group['mean_dt'][i1_h5:i2_h5] = self.b_mean_dt[i1_b:i2_b]
-            self.h5group['std_dE'][i1_h5:i2_h5] = self.b_std_dE[i1_b:i2_b]
-            self.h5group['std_dt'][i1_h5:i2_h5] = self.b_std_dt[i1_b:i2_b]
+        for name in self.statistics_names:
+            self.h5group[name][i1_h5:i2_h5] = \
+                getattr(self, 'b_' + name)[i1_b:i2_b]
 
     def track(self, turn):
 
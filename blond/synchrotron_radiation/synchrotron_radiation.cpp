@@ -14,7 +14,11 @@ Project website: http://blond.web.cern.ch/
 
 #include <math.h>
 #include <stdlib.h>
+#include <string.h>
 #include <random>
+#include <sstream>
+#include <string>
+#include <vector>
 #include <thread>
 #include <chrono>
 #include "../cpp_routines/openmp.h"
@@ -31,6 +35,20 @@ using namespace std;
 
 long unsigned int seed = clock();
 
+// Random number generators and normal distributions of the OpenMP threads,
+// created at their first use; their state can be saved and restored
+static std::vector<mt19937_64> generators;
+static std::vector<normal_distribution<> > distributions;
+
+static void init_generators()
+{
+    const int threads = omp_get_max_threads();
+    for (int t = generators.size(); t < threads; t++) {
+        generators.push_back(mt19937_64(seed + t));
+        distributions.push_back(normal_distribution<>(0.0, 1.0));
+    }
+}
+
 // This function calculates and applies only the synchrotron radiation damping term
 extern "C" void synchrotron_radiation(double * __restrict__ beam_dE, const double U0,
                                       const int n_macroparticles, const double tau_z,
@@ -74,15 +92,15 @@ extern "C" void synchrotron_radiation_full(double * __restrict__ beam_dE, const
     for (int j = 0; j < n_kicks; j++) {
         // Compute synchrotron radiation damping term and
         // Applies the quantum excitation term
+        init_generators();
         #pragma omp parallel
         {
-            static __thread mt19937_64 *gen = nullptr;
-            if (!gen) gen = new mt19937_64(seed + omp_get_thread_num());
-            static thread_local normal_distribution<> dist(0.0, 1.0);
+            mt19937_64 &gen = generators[omp_get_thread_num()];
+            normal_distribution<> &dist = distributions[omp_get_thread_num()];
             #pragma omp for
             for (int i = 0; i < n_macroparticles; i++) {
                 beam_dE[i] = beam_dE[i] * const_synch_rad
-                             + const_quantum_exc * dist(*gen)
+                             + const_quantum_exc * dist(gen)
                              - U0;
             }
         }
@@ -133,15 +151,15 @@ extern "C" void synchrotron_radiation_fullf(float * __restrict__ beam_dE, const
     for (int j = 0; j < n_kicks; j++) {
         // Compute synchrotron radiation damping term and
         // Applies the quantum excitation term
+        init_generators();
         #pragma omp parallel
         {
-            static __thread mt19937_64 *gen = nullptr;
-            if (!gen) gen = new mt19937_64(seed + omp_get_thread_num());
-            static thread_local normal_distribution<> dist(0.0, 1.0);
+            mt19937_64 &gen = generators[omp_get_thread_num()];
+            normal_distribution<> &dist = distributions[omp_get_thread_num()];
             #pragma omp for
             for (int i = 0; i < n_macroparticles; i++) {
                 beam_dE[i] = beam_dE[i] * const_synch_rad
-                             + const_quantum_exc * dist(*gen)
+                             + const_quantum_exc * dist(gen)
                              - U0;
             }
         }
@@ -151,4 +169,35 @@ extern "C" void synchrotron_radiation_fullf(float * __restrict__ beam_dE, const
 
 extern "C" void set_random_seed(const int _seed) {
     seed = _seed;
+    // The generators are re-seeded at their next use
+    generators.clear();
+    distributions.clear();
+}
+
+
+// Writes the state of the random number generators as text in buffer if
+// size is large enough; returns the size needed, including the final '\0'
+extern "C" int get_random_state(char *buffer, const int size) {
+    init_generators();
+    std::ostringstream out;
+    out << generators.size();
+    for (size_t t = 0; t < generators.size(); t++)
+        out << ' ' << generators[t] << ' ' << distributions[t];
+
+    const std::string state = out.str();
+    if ((int) state.size() < size)
+        memcpy(buffer, state.c_str(), state.size() + 1);
+    return state.size() + 1;
+}
+
+
+// Restores the state of the random number generators from get_random_state
+extern "C" void set_random_state(const char *state) {
+    std::istringstream in(state);
+    size_t n;
+    in >> n;
+    generators.assign(n, mt19937_64());
+    distributions.assign(n, normal_distribution<>(0.0, 1.0));
+    for (size_t t = 0; t < n; t++)
+        in >> generators[t] >> distributions[t];
 }
@@ -24,17 +24,60 @@ import warnings
 from ..utils import bmath as bm
 
 
+#: *Layout of the per-turn table read by the compiled kick and drift kernels
+#: (struct turn_params in kick_n_drift.cpp)*
+turn_table_dtype = np.dtype([('t_rev', np.float64),
+                             ('eta_0', np.float64),
+                             ('eta_1', np.float64),
+                             ('eta_2', np.float64),
+                             ('alpha_0', np.float64),
+                             ('alpha_1', np.float64),
+                             ('alpha_2', np.float64),
+                             ('beta', np.float64),
+                             ('energy', np.float64),
+                             ('acceleration_kick', np.float64)])
+
+#: *Drift solvers as enumerated in the compiled kernels*
+solver_ids = {b'simple': 0, b'legacy': 1, b'exact': 2}
+
+
 class FullRingAndRF(object):
     """
     *Definition of the full ring and RF parameters in order to be able to have
     a full turn information (used in the hamiltonian for example).*
     """
 
-    def __init__(self, RingAndRFSection_list):
+    def __init__(self, RingAndRFSection_list, batched=False):
 
         #: *List of the total RingAndRFSection objects*
         self.RingAndRFSection_list = RingAndRFSection_list
 
+        #: *Option to track all the sections in a single compiled call*
+        self.batched = bool(batched)
+        if self.batched:
+            if bm.precision.mixed:
+                # PrecisionError
+                raise RuntimeError("ERROR in FullRingAndRF: Batched" +
+                                   " tracking is not available in mixed" +
+                                   " precision!")
+            solvers = set()
+            for RingAndRFSectionElement in self.RingAndRFSection_list:
+                if (RingAndRFSectionElement.beamFB is not None) or \
+                        (RingAndRFSectionElement.cavityFB is not None) or \
+                        RingAndRFSectionElement.periodicity or \
+                        RingAndRFSectionElement.interpolation:
+                    # TrackerError
+                    raise RuntimeError("ERROR in FullRingAndRF: Batched" +
+                                       " tracking is not available with" +
+                                       " beam or cavity feedbacks," +
+                                       " periodicity or interpolation!")
+                solvers.add(RingAndRFSectionElement.solver)
+            if len(solvers) > 1:
+                # TrackerError
+                raise RuntimeError("ERROR in FullRingAndRF: Batched" +
+                                   " tracking requires the same solver in" +
+                                   " all the sections!")
+
         #: *Total potential well in [V]*
         self.potential_well = 0
 
@@ -126,8 +169,62 @@ class FullRingAndRF(object):
         """Function to loop over all the RingAndRFSection.track methods
         """
 
-        for RingAndRFSectionElement in self.RingAndRFSection_list:
-            RingAndRFSectionElement.track()
+        if self.batched:
+            self.track_batched()
+        else:
+            for RingAndRFSectionElement in self.RingAndRFSection_list:
+                RingAndRFSectionElement.track()
+
+    def track_batched(self):
+        """Function tracking all the sections in a single compiled call. The
+        RF parameters of all the stations are gathered in 2D arrays (one row
+        per section) and the kicks and partial drifts of the stations are
+        applied one after the other to each particle, which stays in cache
+        for the whole turn.
+        """
+
+        sections = self.RingAndRFSection_list
+        n_sections = len(sections)
+        n_rf = max([section.n_rf for section in sections])
+
+        voltage = np.zeros((n_sections, n_rf))
+        omega_rf = np.zeros((n_sections, n_rf))
+        phi_rf = np.zeros((n_sections, n_rf))
+        t_rev, acceleration_kick, eta_0, eta_1, eta_2, alpha_0, alpha_1, \
+            alpha_2, beta, energy = np.zeros((10, n_sections))
+
+        for i, section in enumerate(sections):
+            turn = section.counter[0]
+            section.rf_phase_update()
+
+            # Systems missing in a section kick with zero voltage
+            if section.rf_params.empty is False:
+                voltage[i, :section.n_rf] = section.charge * \
+                    section.voltage[:, turn]
+                omega_rf[i, :section.n_rf] = section.omega_rf[:, turn]
+                phi_rf[i, :section.n_rf] = section.phi_rf[:, turn]
+                acceleration_kick[i] = section.acceleration_kick[turn]
+
+            # The section length is included in the revolution period
+            t_rev[i] = section.t_rev[turn+1] * section.length_ratio
+            eta_0[i] = section.eta_0[turn+1]
+            eta_1[i] = section.eta_1[turn+1]
+            eta_2[i] = section.eta_2[turn+1]
+            alpha_0[i] = section.alpha_0[turn+1]
+            alpha_1[i] = section.alpha_1[turn+1]
+            alpha_2[i] = section.alpha_2[turn+1]
+            beta[i] = section.rf_params.beta[turn+1]
+            energy[i] = section.rf_params.energy[turn+1]
+
+        beam = sections[0].beam
+        bm.kick_drift_multiturn(beam.dt, beam.dE, voltage, omega_rf, phi_rf,
+                                acceleration_kick, sections[0].solver, t_rev,
+                                1., sections[0].alpha_order, eta_0, eta_1,
+                                eta_2, alpha_0, alpha_1, alpha_2, beta,
+                                energy)
+
+        for section in sections:
+            section.beam_energy_update()
 
 
 class RingAndRFTracker(object):
@@ -149,6 +246,12 @@ class RingAndRFTracker(object):
     is updated. The change in RF phase, voltage, and frequency due to control
     loops is tracked as well.
 
+    The per-turn drift and kick parameters (t_rev, eta_0,1,2, alpha_0,1,2,
+    beta, energy and acceleration_kick) are read by the compiled kernels
+    from turn_table, a copy made at construction. After modifying these
+    arrays, e.g. tracker.acceleration_kick[:] = ..., call
+    rebuild_turn_table() for the tracking to take the changes into account.
+
     Parameters
     ----------
     RFStation : class
@@ -233,12 +336,18 @@ class RingAndRFTracker(object):
     interpolation : bool (optional)
         Option to use sliced and interpolated voltage for the kicker; default
         is False
+    fused_slicing : bool (optional)
+        Option to apply the interpolated kick, the drift and the slicing of
+        the Profile for the next turn in a single pass over the particles;
+        requires interpolation. The Profile is then updated by the tracker
+        and should not be tracked separately; default is False
 
     """
 
     def __init__(self, RFStation, Beam, solver='simple', BeamFeedback=None,
                  NoiseFeedback=None, CavityFeedback=None, periodicity=False,
-                 interpolation=False, Profile=None, TotalInducedVoltage=None):
+                 interpolation=False, Profile=None, TotalInducedVoltage=None,
+                 fused_slicing=False):
 
         # Set up logging
         # self.logger = logging.getLogger(__class__.__name__)
@@ -281,6 +390,8 @@ class RingAndRFTracker(object):
             self.solver = 'exact'
         self.solver = self.solver.encode(encoding='utf_8')
 
+        self.rebuild_turn_table()
+
         # Options
         self.beamFB = BeamFeedback
         self.noiseFB = NoiseFeedback
@@ -299,6 +410,7 @@ class RingAndRFTracker(object):
                                " interpolation not recognised!")
         self.profile = Profile
         self.totalInducedVoltage = TotalInducedVoltage
+        self._rf_voltage_cache = None
         if (self.interpolation is True) and (self.profile is None):
             # ProfileError
             raise RuntimeError("ERROR in RingAndRFTracker: Please specify a" +
@@ -311,10 +423,65 @@ class RingAndRFTracker(object):
             # PeriodicityError
             raise RuntimeError("ERROR in RingAndRFTracker: Empty RFStation" +
                                " with periodicity not yet implemented!")
+        if self.periodicity and bm.precision.mixed:
+            # PrecisionError
+            raise RuntimeError("ERROR in RingAndRFTracker: Periodicity is" +
+                               " not available in mixed precision!")
         if (self.cavityFB is not None) and (self.interpolation is False):
             self.interpolation = True
             warnings.warn('Setting interpolation to TRUE')
             # self.logger.warning("Setting interpolation to TRUE")
+        self.fused_slicing = bool(fused_slicing)
+        if self.fused_slicing and ((self.interpolation is False) or
+                                   self.periodicity or self.rf_params.empty):
+            # FusedSlicingError
+            raise RuntimeError("ERROR in RingAndRFTracker: The fused" +
+                               " slicing requires the interpolation option" +
+                               " and a non-empty RFStation without" +
+                               " periodicity")
+        if self.fused_slicing and \
+                (self.profile.operations[0] != self.profile._slice):
+            # FusedSlicingError
+            raise RuntimeError("ERROR in RingAndRFTracker: The fused" +
+                               " slicing is only available for the" +
+                               " standard histogram")
+        if self.fused_slicing and bm.precision.mixed:
+            # PrecisionError
+            raise RuntimeError("ERROR in RingAndRFTracker: The fused" +
+                               " slicing is not available in mixed" +
+                               " precision!")
+
+    @property
+    def solver(self):
+        """Drift solver, encoded for the compiled kernels; setting it also
+        updates the corresponding enumeration in solver_id.
+        """
+        return self._solver
+
+    @solver.setter
+    def solver(self, solver):
+        self._solver = solver
+        if not isinstance(solver, bytes):
+            solver = str(solver).encode(encoding='utf_8')
+        # Unknown names fall back to the exact solver, as in the kernels
+        self.solver_id = solver_ids.get(solver, solver_ids[b'exact'])
+
+    def rebuild_turn_table(self):
+        """Function gathering the drift and kick parameters of all the turns
+        in turn_table, the contiguous table that the compiled kernels read
+        with the turn index. To be called again after modifying these
+        parameters in place.
+        """
+
+        self.turn_table = np.zeros(len(self.t_rev), dtype=turn_table_dtype)
+        self.turn_table['t_rev'] = self.t_rev * self.length_ratio
+        for key in ['eta_0', 'eta_1', 'eta_2', 'alpha_0', 'alpha_1',
+                    'alpha_2']:
+            self.turn_table[key] = getattr(self, key)
+        self.turn_table['beta'] = self.rf_params.beta
+        self.turn_table['energy'] = self.rf_params.energy
+        self.turn_table['acceleration_kick'][:len(self.acceleration_kick)] \
+            = self.acceleration_kick
 
     def kick(self, beam_dt, beam_dE, index):
         """Function updating the particle energy due to the RF kick in a given
@@ -330,12 +497,8 @@ class RingAndRFTracker(object):
 
         """
 
-        # voltage_kick = np.ascontiguousarray(self.charge*self.voltage[:, index])
-        # omegarf_kick = np.ascontiguousarray(self.omega_rf[:, index])
-        # phirf_kick = np.ascontiguousarray(self.phi_rf[:, index])
-        bm.kick(beam_dt, beam_dE, self.voltage[:, index],
-                self.omega_rf[:, index], self.phi_rf[:, index],
-                self.charge, self.n_rf, self.acceleration_kick[index])
+        bm.kick_turn(beam_dt, beam_dE, self.voltage, self.omega_rf,
+                     self.phi_rf, self.charge, index, self.turn_table)
 
     def drift(self, beam_dt, beam_dE, index):
         """Function updating the particle arrival time to the RF station
@@ -364,16 +527,18 @@ class RingAndRFTracker(object):
             \\delta = \\frac{\\Delta E}{\\beta_s^2 E_s} \quad \\text{(simple, legacy)}
 
         """
-        bm.drift(beam_dt, beam_dE, self.solver, self.t_rev[index],
-                 self.length_ratio, self.alpha_order, self.eta_0[index],
-                 self.eta_1[index], self.eta_2[index], self.alpha_0[index],
-                 self.alpha_1[index], self.alpha_2[index],
-                 self.rf_params.beta[index], self.rf_params.energy[index])
+        bm.drift_turn(beam_dt, beam_dE, self.solver_id, self.alpha_order,
+                      index, self.turn_table)
 
     def rf_voltage_calculation(self):
         """Function calculating the total, discretised RF voltage seen by the
         beam at a given turn. Requires a Profile object.
 
+        The waveform of the previous turn is reused when the RF voltages,
+        frequencies and phases and the profile grid are unchanged; when only
+        the voltages and phases changed, it is obtained from cached sine and
+        cosine waveforms without evaluating the sine on the grid again.
+
         """
         voltages = np.ascontiguousarray(self.voltage[:, self.counter[0]])
         omega_rf = np.ascontiguousarray(self.omega_rf[:, self.counter[0]])
@@ -386,8 +551,47 @@ class RingAndRFTracker(object):
                 bm.rf_volt_comp(voltages[1:], omega_rf[1:], phi_rf[1:],
                                 self.profile.bin_centers)
         else:
-            self.rf_voltage = bm.rf_volt_comp(voltages, omega_rf, phi_rf,
-                                              self.profile.bin_centers)
+            bin_centers = self.profile.bin_centers
+            cache = self._rf_voltage_cache
+            if (cache is None) or \
+                    not np.array_equal(omega_rf, cache['omega_rf']) or \
+                    not np.array_equal(bin_centers, cache['bin_centers']):
+                self.rf_voltage = bm.rf_volt_comp(voltages, omega_rf, phi_rf,
+                                                  bin_centers)
+                self._rf_voltage_cache = {'voltages': voltages.copy(),
+                                          'omega_rf': omega_rf.copy(),
+                                          'phi_rf': phi_rf.copy(),
+                                          'bin_centers': bin_centers.copy()}
+
+            elif np.array_equal(voltages, cache['voltages']) and \
+                    np.array_equal(phi_rf, cache['phi_rf']):
+                # Unchanged RF parameters and profile grid: the waveform of
+                # the previous turn is still valid
+                pass
+
+            else:
+                # Only the voltages and phases changed: the waveform is
+                # rotated from reference sine and cosine waveforms,
+                # V sin(x + phi) = V cos(dphi) sin(x + phi_ref)
+                #                  + V sin(dphi) cos(x + phi_ref)
+                if 'sin_ref' not in cache:
+                    cache['phi_ref'] = phi_rf.copy()
+                    cache['sin_ref'] = np.empty((self.n_rf, len(bin_centers)))
+                    cache['cos_ref'] = np.empty_like(cache['sin_ref'])
+                    for i in range(self.n_rf):
+                        phase = np.ascontiguousarray(
+                            omega_rf[i]*bin_centers + phi_rf[i],
+                            dtype=np.float64)
+                        bm.sin(phase, result=cache['sin_ref'][i])
+                        bm.cos(phase, result=cache['cos_ref'][i])
+                dphi_ref = phi_rf - cache['phi_ref']
+                self.rf_voltage = \
+                    np.dot(voltages*np.cos(dphi_ref), cache['sin_ref']) + \
+                    np.dot(voltages*np.sin(dphi_ref), cache['cos_ref'])
+                self.rf_voltage = self.rf_voltage.astype(
+                    bm.precision.real_t, copy=False)
+                cache['voltages'] = voltages.copy()
+                cache['phi_rf'] = phi_rf.copy()
 
     def track(self):
         """Tracking method for the section. Applies first the kick, then the
@@ -396,6 +600,85 @@ class RingAndRFTracker(object):
         of the Beam class.
 
         """
+        self.rf_phase_update()
+
+        turn = self.counter[0]
+
+        if self.periodicity:
+
+            # Particles on the right of the frame change reference and skip
+            # one kick and drift, particles that end up on the left of the
+            # updated frame change reference and get a second kick and
+            # drift; done in place with a per-particle branch
+            bm.kick_drift_periodic(self.beam.dt, self.beam.dE,
+                                   self.voltage[:, turn],
+                                   self.omega_rf[:, turn],
+                                   self.phi_rf[:, turn], self.charge,
+                                   self.n_rf, self.acceleration_kick[turn],
+                                   self.solver, self.t_rev[turn+1],
+                                   self.length_ratio, self.alpha_order,
+                                   self.eta_0[turn+1], self.eta_1[turn+1],
+                                   self.eta_2[turn+1], self.alpha_0[turn+1],
+                                   self.alpha_1[turn+1], self.alpha_2[turn+1],
+                                   self.rf_params.beta[turn+1],
+                                   self.rf_params.energy[turn+1])
+
+        else:
+
+            if self.rf_params.empty is False:
+                if self.interpolation:
+                    self.rf_voltage_calculation()
+                    if self.totalInducedVoltage is not None:
+                        self.total_voltage = self.rf_voltage \
+                            + self.totalInducedVoltage.induced_voltage
+                    else:
+                        self.total_voltage = self.rf_voltage
+
+                    if self.fused_slicing:
+                        # Kick, drift and slice for the next turn in a
+                        # single pass over the particles
+                        bm.LIKick_drift_slice(
+                            self.beam.dt, self.beam.dE, self.total_voltage,
+                            self.profile.bin_centers,
+                            self.beam.Particle.charge,
+                            self.acceleration_kick[turn], self.solver,
+                            self.t_rev[turn+1], self.length_ratio,
+                            self.alpha_order, self.eta_0[turn+1],
+                            self.eta_1[turn+1], self.eta_2[turn+1],
+                            self.alpha_0[turn+1], self.alpha_1[turn+1],
+                            self.alpha_2[turn+1],
+                            self.rf_params.beta[turn+1],
+                            self.rf_params.energy[turn+1],
+                            self.profile.n_macroparticles,
+                            self.profile.cut_left, self.profile.cut_right)
+
+                        # Remaining operations of the Profile (reduction,
+                        # fits, filters) on the deposited histogram
+                        if bm.mpiMode():
+                            self.profile.reduce_histo()
+                        for op in self.profile.operations[1:]:
+                            op()
+                    else:
+                        self.profile.interp_kick(
+                            dt=self.beam.dt, dE=self.beam.dE,
+                            voltage=self.total_voltage,
+                            charge=self.beam.Particle.charge,
+                            acceleration_kick=self.acceleration_kick[turn])
+                else:
+                    self.kick(self.beam.dt, self.beam.dE, turn)
+
+            if not self.fused_slicing:
+                self.drift(self.beam.dt, self.beam.dE, turn + 1)
+
+        self.beam_energy_update()
+
+    def rf_phase_update(self):
+        """Function updating the RF phase and frequency of the current turn
+        (phase noise, phase modulation, beam feedback) and the accumulated
+        phase offset of the next turn.
+
+        """
+
         turn = self.counter[0]
 
         # Add phase noise directly to the cavity RF phase
@@ -428,100 +711,411 @@ class RingAndRFTracker(object):
         # Total phase offset
         self.rf_params.phi_rf[:,turn+1] += self.rf_params.dphi_rf
 
-        if self.periodicity:
+    def rf_phase_update_turns(self, n_turns):
+        """Function applying the RF phase and frequency updates of
+        rf_phase_update() (phase noise and modulation, accumulated phase
+        offset) to the next n_turns turns at once; not available with
+        feedbacks.
 
-            # Distinguish the particles inside the frame from the particles on
-            # the right-hand side of the frame.
-            self.indices_right_outside = \
-                np.where(self.beam.dt > self.t_rev[turn + 1])[0]
-            self.indices_inside_frame = \
-                np.where(self.beam.dt < self.t_rev[turn + 1])[0]
-
-            if len(self.indices_right_outside) > 0:
-                # Change reference of all the particles on the right of the
-                # current frame; these particles skip one kick and drift
-                self.beam.dt[self.indices_right_outside] -= \
-                    self.t_rev[turn + 1]
-                # Synchronize the bunch with the particles that are on the
-                # RHS of the current frame applying kick and drift to the
-                # bunch
-                # After that all the particles are in the new updated frame
-                self.insiders_dt = np.ascontiguousarray(
-                    self.beam.dt[self.indices_inside_frame])
-                self.insiders_dE = np.ascontiguousarray(
-                    self.beam.dE[self.indices_inside_frame])
-                self.kick(self.insiders_dt, self.insiders_dE, turn)
-                self.drift(self.insiders_dt, self.insiders_dE, turn+1)
-                self.beam.dt[self.indices_inside_frame] = self.insiders_dt
-                self.beam.dE[self.indices_inside_frame] = self.insiders_dE
-                # Check all the particles on the left of the just updated
-                # frame and apply a second kick and drift to them with the
-                # previous wave after having changed reference.
-                self.indices_left_outside = np.where(self.beam.dt < 0)[0]
+        Parameters
+        ----------
+        n_turns : int
+            Number of turns to be updated
 
-            else:
-                self.kick(self.beam.dt, self.beam.dE, turn)
-                self.drift(self.beam.dt, self.beam.dE, turn + 1)
-                # Check all the particles on the left of the just updated
-                # frame and apply a second kick and drift to them with the
-                # previous wave after having changed reference.
-                self.indices_left_outside = np.where(self.beam.dt < 0)[0]
-
-            if len(self.indices_left_outside) > 0:
-                left_outsiders_dt = np.ascontiguousarray(
-                    self.beam.dt[self.indices_left_outside])
-                left_outsiders_dE = np.ascontiguousarray(
-                    self.beam.dE[self.indices_left_outside])
-                left_outsiders_dt += self.t_rev[turn+1]
-                self.kick(left_outsiders_dt, left_outsiders_dE, turn)
-                self.drift(left_outsiders_dt, left_outsiders_dE, turn+1)
-                self.beam.dt[self.indices_left_outside] = left_outsiders_dt
-                self.beam.dE[self.indices_left_outside] = left_outsiders_dE
+        """
+
+        turn = self.counter[0]
+        turns = slice(turn, turn + n_turns)
+        next_turns = slice(turn + 1, turn + n_turns + 1)
+
+        # Update the RF phase of all systems for the next turns; the
+        # increments are computed before the phase modulation is applied
+        # to the frequency, as in the turn-by-turn tracking
+        dphi_rf = np.cumsum(np.column_stack(
+            (self.rf_params.dphi_rf,
+             2.*np.pi*self.rf_params.harmonic[:, next_turns] *
+             (self.rf_params.omega_rf[:, next_turns] -
+              self.rf_params.omega_rf_d[:, next_turns]) /
+             self.rf_params.omega_rf_d[:, next_turns])), axis=1)[:, 1:]
+
+        # Add phase noise and modulation directly to the cavity RF phase
+        if self.phi_noise is not None:
+            self.phi_rf[:, turns] += self.phi_noise[:, turns]
+
+        if self.phi_modulation is not None:
+            self.phi_rf[:, turns] += self.phi_modulation[0][:, turns]
+            self.omega_rf[:, turns] += self.phi_modulation[1][:, turns]
+
+        # Total phase offset
+        self.rf_params.dphi_rf[:] = dphi_rf[:, -1]
+        self.rf_params.phi_rf[:, next_turns] += dphi_rf
 
+    def beam_energy_update(self, n_turns=1):
+        """Function updating the energy-related variables of the Beam class
+        to the turn n_turns ahead and incrementing the turn counter.
+
+        Parameters
+        ----------
+        n_turns : int
+            Number of turns tracked; default is 1
+
+        """
+
+        turn = self.counter[0] + n_turns
+
+        # Updating the beam synchronous momentum etc.
+        self.beam.beta = self.rf_params.beta[turn]
+        self.beam.gamma = self.rf_params.gamma[turn]
+        self.beam.energy = self.rf_params.energy[turn]
+        self.beam.momentum = self.rf_params.momentum[turn]
+
+        # Increment the turn counter
+        self.counter[0] = turn
+
+    def track_turns(self, n_turns):
+        """Tracking method applying the kick and the drift of several
+        consecutive turns in a single compiled call, keeping the coordinates
+        of each particle in registers over the whole block of turns. The RF
+        phase and frequency updates (phase noise, phase modulation and
+        accumulated phase offset), the counter and the energy-related
+        variables of the Beam class are updated as if track() had been
+        called n_turns times.
+
+        Only valid when nothing else acts on the beam in between the turns of
+        the block (no intensity effects, monitors, etc.); for this reason it
+        is not available with feedbacks, periodicity or interpolation.
+
+        Parameters
+        ----------
+        n_turns : int
+            Number of turns to be tracked
+
+        """
+
+        if (self.beamFB is not None) or (self.cavityFB is not None) or \
+                (self.noiseFB is not None) or self.periodicity or \
+                self.interpolation:
+            # TrackerError
+            raise RuntimeError("ERROR in RingAndRFTracker: Multi-turn" +
+                               " tracking is not available with feedbacks," +
+                               " periodicity or interpolation!")
+        if bm.precision.mixed:
+            # PrecisionError
+            raise RuntimeError("ERROR in RingAndRFTracker: Multi-turn" +
+                               " tracking is not available in mixed" +
+                               " precision!")
+
+        n_turns = int(n_turns)
+        turn = self.counter[0]
+        if turn + n_turns > self.rf_params.n_turns:
+            # TrackerError
+            raise RuntimeError("ERROR in RingAndRFTracker: Cannot track" +
+                               " beyond the last turn of the RF programme!")
+        if n_turns < 1:
+            return
+
+        self.rf_phase_update_turns(n_turns)
+
+        turns = slice(turn, turn + n_turns)
+        next_turns = slice(turn + 1, turn + n_turns + 1)
+
+        if self.rf_params.empty is False:
+            n_rf = self.n_rf
+            acceleration_kick = self.acceleration_kick[turns]
         else:
+            n_rf = 0
+            acceleration_kick = np.zeros(n_turns)
+
+        bm.kick_drift_multiturn(
+            self.beam.dt, self.beam.dE,
+            self.charge*self.voltage[:n_rf, turns].T,
+            self.omega_rf[:n_rf, turns].T, self.phi_rf[:n_rf, turns].T,
+            acceleration_kick, self.solver, self.t_rev[next_turns],
+            self.length_ratio, self.alpha_order, self.eta_0[next_turns],
+            self.eta_1[next_turns], self.eta_2[next_turns],
+            self.alpha_0[next_turns], self.alpha_1[next_turns],
+            self.alpha_2[next_turns], self.rf_params.beta[next_turns],
+            self.rf_params.energy[next_turns])
+
+        self.beam_energy_update(n_turns)
+
+    def macro_step_error(self, n_turns):
+        """Function estimating the accuracy of a macro-step of n_turns turns
+        from the next turn on. The kick and drift of a macro-step form a
+        leapfrog map of step :math:`\\mu = 2\\pi \\sum Q_s`, the
+        small-amplitude synchrotron phase advance over the macro-step; its
+        relative error on the synchrotron frequency is
+        :math:`\\mu^2/24` for :math:`\\mu \\ll 1`, and the map is unstable
+        for :math:`\\mu > 2`.
+
+        Parameters
+        ----------
+        n_turns : int
+            Number of turns per macro-step
+
+        Returns
+        -------
+        float
+            Estimated relative error on the synchrotron frequency
 
-            if self.rf_params.empty is False:
-                if self.interpolation:
-                    self.rf_voltage_calculation()
-                    if self.totalInducedVoltage is not None:
-                        self.total_voltage = self.rf_voltage \
-                            + self.totalInducedVoltage.induced_voltage
-                    else:
-                        self.total_voltage = self.rf_voltage
+        """
+
+        if self.rf_params.empty:
+            return 0.
+
+        turn = self.counter[0]
+        mu = 2.*np.pi*np.sum(self.rf_params.Q_s[turn:turn + int(n_turns)])
+
+        return mu**2/24.
+
+    def track_macro_step(self, n_turns, tolerance=None):
+        """Tracking method advancing the beam by n_turns turns with a single
+        kick and drift (adiabatic macro-step), for processes in which the
+        synchrotron motion changes very little per turn (long storage, slow
+        ramps, diffusion studies). The kick uses the RF programs averaged
+        over the turns of the step and scaled by n_turns, with the energy
+        gain of all the turns; the drift uses the revolution period, slip
+        factors and energy averaged over the step, scaled by n_turns.
+
+        With the interpolation option, the induced voltage is the one of
+        the TotalInducedVoltage object at the time of the call, which can be
+        updated once every macro-step. The RF phase updates, the counter and
+        the energy-related variables of the Beam class are updated as if
+        track() had been called n_turns times. Not available with feedbacks
+        or periodicity.
+
+        Parameters
+        ----------
+        n_turns : int
+            Number of turns per macro-step
+        tolerance : float
+            Maximum relative error on the synchrotron frequency accepted for
+            the macro-step, see macro_step_error(); default is None (no
+            check)
+
+        Returns
+        -------
+        float
+            Estimated relative error on the synchrotron frequency
+
+        """
+
+        if (self.beamFB is not None) or (self.cavityFB is not None) or \
+                (self.noiseFB is not None) or self.periodicity:
+            # TrackerError
+            raise RuntimeError("ERROR in RingAndRFTracker: Macro-step" +
+                               " tracking is not available with feedbacks" +
+                               " or periodicity!")
 
-                    bm.linear_interp_kick(dt=self.beam.dt, dE=self.beam.dE,
-                                          voltage=self.total_voltage,
-                                          bin_centers=self.profile.bin_centers,
-                                          charge=self.beam.Particle.charge,
-                                          acceleration_kick=self.acceleration_kick[turn])
-
-                    # self.drift(self.beam.dt, self.beam.dE, turn + 1)
-
-                    # bm.LIKick_n_drift(self.beam.dt,
-                    #                   self.beam.dE,
-                    #                   self.total_voltage,
-                    #                   self.profile.bin_centers,
-                    #                   self.beam.Particle.charge,
-                    #                   self.acceleration_kick[turn],
-                    #                   self.solver,
-                    #                   self.t_rev[turn],
-                    #                   self.length_ratio,
-                    #                   self.alpha_order,
-                    #                   self.eta_0[turn],
-                    #                   self.eta_1[turn],
-                    #                   self.eta_2[turn],
-                    #                   self.rf_params.beta[turn],
-                    #                   self.rf_params.energy[turn])
+        n_turns = int(n_turns)
+        turn = self.counter[0]
+        if turn + n_turns > self.rf_params.n_turns:
+            # TrackerError
+            raise RuntimeError("ERROR in RingAndRFTracker: Cannot track" +
+                               " beyond the last turn of the RF programme!")
+        if n_turns < 1:
+            return 0.
+
+        error = self.macro_step_error(n_turns)
+        if (tolerance is not None) and (error > tolerance):
+            # TrackerError
+            raise RuntimeError("ERROR in RingAndRFTracker: Estimated error" +
+                               " of the macro-step %.3e above the" % error +
+                               " tolerance; reduce the number of turns per" +
+                               " step!")
+
+        self.rf_phase_update_turns(n_turns)
+
+        turns = slice(turn, turn + n_turns)
+        next_turns = slice(turn + 1, turn + n_turns + 1)
+
+        if self.rf_params.empty is False:
+            voltage = np.mean(self.voltage[:, turns], axis=1)
+            omega_rf = np.mean(self.omega_rf[:, turns], axis=1)
+            phi_rf = np.mean(self.phi_rf[:, turns], axis=1)
+            acceleration_kick = np.sum(self.acceleration_kick[turns])
+
+            if self.interpolation:
+                self.rf_voltage = bm.rf_volt_comp(voltage, omega_rf, phi_rf,
+                                                  self.profile.bin_centers)
+                # The averaged waveform is not the one of any turn
+                self._rf_voltage_cache = None
+                if self.totalInducedVoltage is not None:
+                    self.total_voltage = self.rf_voltage \
+                        + self.totalInducedVoltage.induced_voltage
                 else:
-                    self.kick(self.beam.dt, self.beam.dE, turn)
+                    self.total_voltage = self.rf_voltage
+                self.profile.interp_kick(
+                    dt=self.beam.dt, dE=self.beam.dE,
+                    voltage=(n_turns*self.total_voltage).astype(
+                        bm.precision.real_t, copy=False),
+                    charge=self.beam.Particle.charge,
+                    acceleration_kick=acceleration_kick)
+            else:
+                bm.kick(self.beam.dt, self.beam.dE, n_turns*voltage,
+                        omega_rf, phi_rf, self.charge, self.n_rf,
+                        acceleration_kick)
 
-            self.drift(self.beam.dt, self.beam.dE, turn + 1)
+        bm.drift(self.beam.dt, self.beam.dE, self.solver,
+                 n_turns*np.mean(self.t_rev[next_turns]), self.length_ratio,
+                 self.alpha_order, np.mean(self.eta_0[next_turns]),
+                 np.mean(self.eta_1[next_turns]),
+                 np.mean(self.eta_2[next_turns]),
+                 np.mean(self.alpha_0[next_turns]),
+                 np.mean(self.alpha_1[next_turns]),
+                 np.mean(self.alpha_2[next_turns]),
+                 np.mean(self.rf_params.beta[next_turns]),
+                 np.mean(self.rf_params.energy[next_turns]))
 
-        # Updating the beam synchronous momentum etc.
-        self.beam.beta = self.rf_params.beta[turn+1]
-        self.beam.gamma = self.rf_params.gamma[turn+1]
-        self.beam.energy = self.rf_params.energy[turn+1]
-        self.beam.momentum = self.rf_params.momentum[turn+1]
+        self.beam_energy_update(n_turns)
+
+        return error
+
+
+class EnsembleRingAndRFTracker(RingAndRFTracker):
+    r""" Class taking care of the longitudinal tracking of an ensemble of
+    independent beams (EnsembleBeam) in the same ring and RF station. The
+    members can differ by a scaling of the RF voltage and an offset of the
+    RF phase of each RF system; the kick, drift and turn updates of all the
+    members are done in single calls of the compiled routines.
+
+    Intensity effects, feedbacks, periodicity and interpolation are not
+    available for ensembles.
+
+    Parameters
+    ----------
+    RFStation : class
+        A RFStation type class, common to all the members
+    Beam : class
+        An EnsembleBeam type class
+    solver : str
+        Type of solver used for the drift equation; use 'simple' for 1st order
+        approximation and 'exact' for exact solver
+    voltage_factors : float array
+        Factors multiplying the RF voltage programme of each member, shape
+        (n_ensemble) or (n_ensemble, n_rf); default is 1
+    phase_offsets : float array
+        Offsets added to the RF phase programme of each member, shape
+        (n_ensemble) or (n_ensemble, n_rf) [rad]; default is 0
+
+    Attributes
+    ----------
+    voltage_factors : float matrix [n_ensemble, n_rf]
+        Voltage scaling of each member and RF system
+    phase_offsets : float matrix [n_ensemble, n_rf]
+        Phase offset of each member and RF system [rad]
+
+    """
+
+    def __init__(self, RFStation, Beam, solver='simple',
+                 voltage_factors=None, phase_offsets=None):
+
+        if bm.precision.mixed:
+            # PrecisionError
+            raise RuntimeError("ERROR in EnsembleRingAndRFTracker: Ensemble" +
+                               " tracking is not available in mixed" +
+                               " precision!")
+
+        RingAndRFTracker.__init__(self, RFStation, Beam, solver=solver)
+
+        shape = (Beam.n_ensemble, self.n_rf)
+        try:
+            self.voltage_factors = np.ones(shape)
+            self.phase_offsets = np.zeros(shape)
+            if voltage_factors is not None:
+                self.voltage_factors[:] = np.array(
+                    voltage_factors, ndmin=2).reshape(Beam.n_ensemble, -1)
+            if phase_offsets is not None:
+                self.phase_offsets[:] = np.array(
+                    phase_offsets, ndmin=2).reshape(Beam.n_ensemble, -1)
+        except ValueError:
+            # EnsembleError
+            raise RuntimeError("ERROR in EnsembleRingAndRFTracker: The" +
+                               " voltage factors and phase offsets should" +
+                               " be given for each member of the ensemble!")
+
+    def track(self):
+        """Tracking method for the ensemble. Applies the kick of each member,
+        then the drift common to all the members. Updates the counter of the
+        corresponding RFStation class and the energy-related variables of
+        the EnsembleBeam class.
+
+        """
+
+        self.rf_phase_update()
+
+        turn = self.counter[0]
+
+        if self.rf_params.empty is False:
+            bm.kick_ensemble(self.beam.dt, self.beam.dE,
+                             self.charge * self.voltage_factors *
+                             self.voltage[:, turn],
+                             self.omega_rf[:, turn],
+                             self.phi_rf[:, turn] + self.phase_offsets,
+                             self.acceleration_kick[turn])
+
+        self.drift(self.beam.dt.reshape(-1), self.beam.dE.reshape(-1),
+                   turn + 1)
+
+        self.beam_energy_update()
+
+
+class ChunkedRingAndRFTracker(RingAndRFTracker):
+    r""" Class taking care of the longitudinal tracking of a beam stored out
+    of core (ChunkedBeam). The kick and drift of each turn stream through the
+    beam chunk by chunk; the induced voltage of the turn, computed from the
+    profile accumulated over all the chunks, is applied to every chunk.
+
+    Periodicity and fused slicing are not available for chunked beams. The
+    parameters are the ones of RingAndRFTracker.
+
+    """
+
+    def __init__(self, RFStation, Beam, solver='simple', BeamFeedback=None,
+                 NoiseFeedback=None, CavityFeedback=None, interpolation=False,
+                 Profile=None, TotalInducedVoltage=None):
+
+        RingAndRFTracker.__init__(self, RFStation, Beam, solver=solver,
+                                  BeamFeedback=BeamFeedback,
+                                  NoiseFeedback=NoiseFeedback,
+                                  CavityFeedback=CavityFeedback,
+                                  interpolation=interpolation,
+                                  Profile=Profile,
+                                  TotalInducedVoltage=TotalInducedVoltage)
+
+    def track(self):
+        """Tracking method for the section. Applies first the kick, then the
+        drift, to each chunk of the beam in turn. Updates the counter of the
+        corresponding RFStation class and the energy-related variables of
+        the Beam class.
+
+        """
+
+        self.rf_phase_update()
+
+        turn = self.counter[0]
+
+        if self.rf_params.empty is False and self.interpolation:
+            self.rf_voltage_calculation()
+            if self.totalInducedVoltage is not None:
+                self.total_voltage = self.rf_voltage \
+                    + self.totalInducedVoltage.induced_voltage
+            else:
+                self.total_voltage = self.rf_voltage
+
+        for chunk in self.beam.chunks():
+            dt = self.beam.dt[chunk]
+            dE = self.beam.dE[chunk]
+
+            if self.rf_params.empty is False:
+                if self.interpolation:
+                    self.profile.interp_kick(
+                        dt=dt, dE=dE, voltage=self.total_voltage,
+                        charge=self.beam.Particle.charge,
+                        acceleration_kick=self.acceleration_kick[turn])
+                else:
+                    self.kick(dt, dE, turn)
+
+            self.drift(dt, dE, turn + 1)
 
-        # Increment by one the turn counter
-        self.counter[0] += 1
+        self.beam_energy_update()
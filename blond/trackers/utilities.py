@@ -575,6 +575,174 @@ def is_in_separatrix(Ring, RFStation, Beam, dt, dE,
         
 
 
+def separatrix_parameters(Ring, RFStation, Beam):
+    r"""Function returning the parameters of the single-RF sinusoidal
+    Hamiltonian and its value on the separatrix, at the current turn, for
+    the compiled loss detection (see Beam.losses_aperture). The particles
+    inside the separatrix are the ones found by is_in_separatrix.
+    
+    Parameters
+    ---------- 
+    Ring : class
+        A Ring type class
+    RFStation : class
+        An RFStation type class
+    Beam : class
+        A Beam type class
+        
+    Returns
+    -------
+    float array
+        [omega_rf, phi_rf, phi_s, sign(eta_0), c1, eta_0, eta_1, eta_2,
+        1/(beta^2 E), c2, abs(H_sep)]
+        
+    """
+    
+    warnings.filterwarnings("once")
+    
+    if Ring.n_sections > 1:
+        warnings.warn("WARNING: in separatrix_parameters(): the usage of" +
+                      " several sections is not yet implemented!")
+    if RFStation.n_rf > 1:
+        warnings.warn("WARNING in separatrix_parameters(): taking into" +
+                      " account the first harmonic only!")
+    
+    counter = RFStation.counter[0]
+    dt_sep = (np.pi - RFStation.phi_s[counter] 
+              - RFStation.phi_rf_d[0,counter])/ \
+              RFStation.omega_rf[0,counter]
+    Hsep = hamiltonian(Ring, RFStation, Beam, dt_sep, 0)
+    
+    eta = np.zeros(3)
+    for i in range(RFStation.alpha_order+1):
+        eta[i] = getattr(RFStation, 'eta_' + str(i))[counter]
+    
+    V0 = RFStation.voltage[0,counter]*RFStation.Particle.charge
+    c1 = c*np.pi/(Ring.ring_circumference*Beam.beta*Beam.energy)
+    c2 = c*Beam.beta*V0/(RFStation.harmonic[0,counter]*
+                         Ring.ring_circumference)
+    
+    return np.array([RFStation.omega_rf[0,counter],
+                     RFStation.phi_rf_d[0,counter],
+                     RFStation.phi_s[counter],
+                     np.sign(RFStation.eta_0[counter]), c1,
+                     eta[0], eta[1], eta[2],
+                     1/(Beam.beta**2*Beam.energy), c2, np.fabs(Hsep)])
+
+
+
+class PotentialWellSeparatrix(object):
+    r"""Separatrix built from the total potential well of all the RF
+    systems and sections, for the compiled loss detection of
+    Beam.losses_aperture in multi-harmonic RF.
+
+    The potential well of FullRingAndRF.potential_well_generation is cut
+    around the bucket with potential_well_cut and tabulated on a fine time
+    grid; a particle is inside the separatrix if
+    :math:`\frac{|\eta_0|}{2 \beta^2 E} \Delta E^2 + U(\Delta t)` is
+    below the maximum of the cut potential well, with :math:`\Delta t`
+    projected onto the bucket of the main harmonic. The table is only
+    recomputed when the RF program (voltages, frequencies, phases, energy
+    gain, revolution period, slippage factor and energy) changes.
+
+    Parameters
+    ----------
+    FullRingAndRF : class
+        A FullRingAndRF type class
+    n_points : int
+        number of points of the potential well over one RF period of the
+        main harmonic
+    main_harmonic_option : str or float
+        main harmonic, see FullRingAndRF.potential_well_generation
+    dt_margin_percent : float
+        margin of the potential well, see
+        FullRingAndRF.potential_well_generation
+
+    Attributes
+    ----------
+    potential_well : float array
+        potential well inside the separatrix, on a uniform time grid [eV]
+    parameters : float array
+        [time of the first point of potential_well, time step, RF period of
+        the main harmonic, abs(eta_0)/(2 beta^2 E), potential well at the
+        separatrix]
+    """
+
+    def __init__(self, FullRingAndRF, n_points=int(1e4),
+                 main_harmonic_option='lowest_freq', dt_margin_percent=0.40):
+
+        self.full_ring_and_RF = FullRingAndRF
+        self.n_points = int(n_points)
+        self.main_harmonic_option = main_harmonic_option
+        self.dt_margin_percent = float(dt_margin_percent)
+        self.potential_well = None
+        self.parameters = None
+        self._rf_program = None
+
+    def _current_rf_program(self, turn):
+
+        rf_program = []
+        for section in self.full_ring_and_RF.RingAndRFSection_list:
+            rf_params = section.rf_params
+            rf_program += [section.voltage[:, turn], section.omega_rf[:, turn],
+                           section.phi_rf[:, turn],
+                           [section.acceleration_kick[turn],
+                            section.t_rev[turn], section.eta_0[turn],
+                            rf_params.beta[turn], rf_params.energy[turn]]]
+        return np.concatenate(rf_program)
+
+    def update(self, turn=None):
+        """Tabulate the potential well for the RF program of the given turn,
+        by default the current turn of the first RF station, if it changed.
+
+        Returns
+        -------
+        bool
+            True if the table was recomputed
+        """
+
+        sections = self.full_ring_and_RF.RingAndRFSection_list
+        if turn is None:
+            turn = sections[0].counter[0]
+
+        rf_program = self._current_rf_program(turn)
+        if self._rf_program is not None and \
+                np.array_equal(rf_program, self._rf_program):
+            return False
+
+        self.full_ring_and_RF.potential_well_generation(
+            turn=turn, n_points=self.n_points,
+            main_harmonic_option=self.main_harmonic_option,
+            dt_margin_percent=self.dt_margin_percent)
+        time_potential = self.full_ring_and_RF.potential_well_coordinates
+        time_potential_sep, potential_well_sep = potential_well_cut(
+            time_potential, self.full_ring_and_RF.potential_well)
+
+        # The potential well covers one RF period of the main harmonic and
+        # the margin
+        t_rf = (time_potential[-1] - time_potential[0]) / \
+            (1 + self.dt_margin_percent)
+        time_step = time_potential[1] - time_potential[0]
+
+        rf_params = sections[0].rf_params
+        eom_factor_dE = abs(sections[0].eta_0[turn]) / \
+            (2*rf_params.beta[turn]**2*rf_params.energy[turn])
+
+        potential_well_sep = potential_well_sep - np.min(potential_well_sep)
+        n_table = int(round((time_potential_sep[-1] - time_potential_sep[0])
+                            / time_step)) + 1
+        time_table = time_potential_sep[0] + time_step*np.arange(n_table)
+        self.potential_well = np.interp(time_table, time_potential_sep,
+                                        potential_well_sep)
+        self.parameters = np.array([time_table[0], time_step, t_rf,
+                                    eom_factor_dE,
+                                    np.max(potential_well_sep)])
+        self._rf_program = rf_program
+
+        return True
+
+
+
 def minmax_location(x,f):
     '''
     *Function to locate the minima and maxima of the f(x) numerical function.*
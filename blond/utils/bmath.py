@@ -43,15 +43,32 @@ _CPU_func_dict = {
     'kick': butils_wrap.kick,
     'rf_volt_comp': butils_wrap.rf_volt_comp,
     'drift': butils_wrap.drift,
+    'kick_turn': butils_wrap.kick_turn,
+    'drift_turn': butils_wrap.drift_turn,
+    'kick_ensemble': butils_wrap.kick_ensemble,
+    'kick_drift_multiturn': butils_wrap.kick_drift_multiturn,
+    'kick_drift_periodic': butils_wrap.kick_drift_periodic,
     'linear_interp_kick': butils_wrap.linear_interp_kick,
+    'interp_kick': butils_wrap.interp_kick,
     'LIKick_n_drift': butils_wrap.linear_interp_kick_n_drift,
+    'LIKick_drift_slice': butils_wrap.linear_interp_kick_drift_slice,
     'synchrotron_radiation': butils_wrap.synchrotron_radiation,
     'synchrotron_radiation_full': butils_wrap.synchrotron_radiation_full,
     'set_random_seed': butils_wrap.set_random_seed,
+    'get_random_state': butils_wrap.get_random_state,
+    'set_random_state': butils_wrap.set_random_state,
     'sparse_histogram': butils_wrap.sparse_histogram,
+    'sparse_interp_kick': butils_wrap.sparse_interp_kick,
     # 'linear_interp_time_translation': butils_wrap.linear_interp_time_translation,
     'slice': butils_wrap.slice,
     'slice_smooth': butils_wrap.slice_smooth,
+    'deposit': butils_wrap.deposit,
+    'slice_ensemble': butils_wrap.slice_ensemble,
+    'sort_by_bin': butils_wrap.sort_by_bin,
+    'compact_alive': butils_wrap.compact_alive,
+    'beam_statistics': butils_wrap.beam_statistics,
+    'bunch_statistics': butils_wrap.bunch_statistics,
+    'aperture': butils_wrap.aperture,
     'music_track': butils_wrap.music_track,
     'music_track_multiturn': butils_wrap.music_track_multiturn,
     'diff': np.diff,
@@ -95,7 +112,8 @@ def use_fftw():
     globals().update(_FFTW_func_dict)
 
 
-# precision can be single or double
+# precision can be single, double or mixed (single precision particle
+# coordinates, double precision for everything else)
 def use_precision(_precision='double'):
     global precision
     butils_wrap.precision = butils_wrap.Precision(_precision)
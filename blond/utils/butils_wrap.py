@@ -14,6 +14,7 @@ from .. import libblond as __lib
 class Precision:
     def __init__(self, precision='double'):
         self.str = precision
+        self.mixed = False
         if precision in ['single', 's', '32', 'float32', 'float', 'f']:
             self.real_t = np.float32
             self.c_real_t = ct.c_float
@@ -24,6 +25,16 @@ class Precision:
             self.c_real_t = ct.c_double
             self.complex_t = np.complex128
             self.num = 2
+        elif precision in ['mixed', 'm']:
+            # Single precision particle coordinates, double precision for
+            # everything else and for the arithmetic on the coordinates
+            self.real_t = np.float64
+            self.c_real_t = ct.c_double
+            self.complex_t = np.complex128
+            self.num = 2
+            self.mixed = True
+        # Type of the particle coordinates
+        self.coord_t = np.float32 if self.mixed else self.real_t
 
 
 precision = Precision('double')
@@ -37,6 +48,22 @@ def __getLen(x):
     return ct.c_int(len(x))
 
 
+def __refuse_mixed(name):
+    # The kernels without a _mixed variant would read the single precision
+    # coordinates as double precision ones
+    if precision.mixed:
+        raise RuntimeError('ERROR: %s is not available in mixed precision'
+                           % name)
+
+
+def __id_func(name, id):
+    # The particle ids are int64, or uint32 for the compact representation
+    if id.dtype == np.int64:
+        return getattr(__lib, name)
+    assert id.dtype == np.uint32
+    return getattr(__lib, name + '_u32')
+
+
 def __c_real(x):
     if precision.num == 1:
         return ct.c_float(x)
@@ -288,7 +315,10 @@ def convolve(signal, kernel, mode='full', result=None):
 
 
 def mean(x):
-    if isinstance(x[0], np.float32):
+    if isinstance(x[0], np.float32) and precision.mixed:
+        __lib.mean_mixed.restype = ct.c_double
+        return __lib.mean_mixed(__getPointer(x), __getLen(x))
+    elif isinstance(x[0], np.float32):
         __lib.meanf.restype = ct.c_float
         return __lib.meanf(__getPointer(x), __getLen(x))
     elif isinstance(x[0], np.float64):
@@ -297,7 +327,10 @@ def mean(x):
 
 
 def std(x):
-    if isinstance(x[0], np.float32):
+    if isinstance(x[0], np.float32) and precision.mixed:
+        __lib.stdev_mixed.restype = ct.c_double
+        return __lib.stdev_mixed(__getPointer(x), __getLen(x))
+    elif isinstance(x[0], np.float32):
         __lib.stdevf.restype = ct.c_float
         return __lib.stdevf(__getPointer(x), __getLen(x))
     elif isinstance(x[0], np.float64):
@@ -397,9 +430,9 @@ def interp_const_space(x, xp, yp, left=None, right=None, result=None):
     xp = xp.astype(dtype=precision.real_t, order='C', copy=False)
     yp = yp.astype(dtype=precision.real_t, order='C', copy=False)
 
-    if not left:
+    if left is None:
         left = yp[0]
-    if not right:
+    if right is None:
         right = yp[-1]
     if result is None:
         result = np.empty(len(x), dtype=precision.real_t, order='C')
@@ -614,8 +647,8 @@ def rf_volt_comp(voltages, omega_rf, phi_rf, bin_centers):
 
 
 def kick(dt, dE, voltage, omega_rf, phi_rf, charge, n_rf, acceleration_kick):
-    assert isinstance(dt[0], precision.real_t)
-    assert isinstance(dE[0], precision.real_t)
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
 
     # dt = dt.astype(dtype=precision.real_t, order='C', copy=False)
     # dE = dE.astype(dtype=precision.real_t, order='C', copy=False)
@@ -625,7 +658,16 @@ def kick(dt, dE, voltage, omega_rf, phi_rf, charge, n_rf, acceleration_kick):
         dtype=precision.real_t, order='C', copy=False)
     phirf_kick = phi_rf.astype(dtype=precision.real_t, order='C', copy=False)
 
-    if precision.num == 1:
+    if precision.mixed:
+        __lib.kick_mixed(__getPointer(dt),
+                         __getPointer(dE),
+                         ct.c_int(n_rf),
+                         __getPointer(voltage_kick),
+                         __getPointer(omegarf_kick),
+                         __getPointer(phirf_kick),
+                         __getLen(dt),
+                         __c_real(acceleration_kick))
+    elif precision.num == 1:
         __lib.kickf(__getPointer(dt),
                     __getPointer(dE),
                     ct.c_int(n_rf),
@@ -647,12 +689,28 @@ def kick(dt, dE, voltage, omega_rf, phi_rf, charge, n_rf, acceleration_kick):
 
 def drift(dt, dE, solver, t_rev, length_ratio, alpha_order, eta_0,
           eta_1, eta_2, alpha_0, alpha_1, alpha_2, beta, energy):
-    assert isinstance(dt[0], precision.real_t)
-    assert isinstance(dE[0], precision.real_t)
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
 
     # dt = dt.astype(dtype=precision.real_t, order='C', copy=False)
     # dE = dE.astype(dtype=precision.real_t, order='C', copy=False)
-    if precision.num == 1:
+    if precision.mixed:
+        __lib.drift_mixed(__getPointer(dt),
+                          __getPointer(dE),
+                          ct.c_char_p(solver),
+                          __c_real(t_rev),
+                          __c_real(length_ratio),
+                          __c_real(alpha_order),
+                          __c_real(eta_0),
+                          __c_real(eta_1),
+                          __c_real(eta_2),
+                          __c_real(alpha_0),
+                          __c_real(alpha_1),
+                          __c_real(alpha_2),
+                          __c_real(beta),
+                          __c_real(energy),
+                          __getLen(dt))
+    elif precision.num == 1:
         __lib.driftf(__getPointer(dt),
                      __getPointer(dE),
                      ct.c_char_p(solver),
@@ -686,12 +744,178 @@ def drift(dt, dE, solver, t_rev, length_ratio, alpha_order, eta_0,
                     __getLen(dt))
 
 
+def kick_turn(dt, dE, voltage, omega_rf, phi_rf, charge, turn, turn_table):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+
+    # The RF programs (n_rf, n_turns+1) are read in place at the given turn
+    voltage = np.ascontiguousarray(voltage, dtype=np.float64)
+    omega_rf = np.ascontiguousarray(omega_rf, dtype=np.float64)
+    phi_rf = np.ascontiguousarray(phi_rf, dtype=np.float64)
+
+    if precision.mixed:
+        func = __lib.kick_turn_mixed
+    elif precision.num == 1:
+        func = __lib.kick_turnf
+    else:
+        func = __lib.kick_turn
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         ct.c_int(voltage.shape[0]),
+         __getPointer(voltage),
+         __getPointer(omega_rf),
+         __getPointer(phi_rf),
+         ct.c_int(voltage.shape[1]),
+         ct.c_int(turn),
+         ct.c_double(charge),
+         __getPointer(turn_table),
+         __getLen(dt))
+
+
+def drift_turn(dt, dE, solver_id, alpha_order, turn, turn_table):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+
+    if precision.mixed:
+        func = __lib.drift_turn_mixed
+    elif precision.num == 1:
+        func = __lib.drift_turnf
+    else:
+        func = __lib.drift_turn
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         ct.c_int(solver_id),
+         ct.c_int(int(alpha_order)),
+         ct.c_int(turn),
+         __getPointer(turn_table),
+         __getLen(dt))
+
+
+def kick_ensemble(dt, dE, voltage, omega_rf, phi_rf, acceleration_kick):
+    __refuse_mixed('kick_ensemble')
+    assert isinstance(dt[0, 0], precision.real_t)
+    assert isinstance(dE[0, 0], precision.real_t)
+
+    # The coordinates have shape (n_ensemble, n_macroparticles), voltage
+    # (charge included) and phi_rf shape (n_ensemble, n_rf)
+    voltage = np.ascontiguousarray(voltage, dtype=precision.real_t)
+    omega_rf = np.ascontiguousarray(omega_rf, dtype=precision.real_t)
+    phi_rf = np.ascontiguousarray(phi_rf, dtype=precision.real_t)
+
+    if precision.num == 1:
+        func = __lib.kick_ensemblef
+    else:
+        func = __lib.kick_ensemble
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         ct.c_int(dt.shape[0]),
+         ct.c_int(voltage.shape[1]),
+         __getPointer(voltage),
+         __getPointer(omega_rf),
+         __getPointer(phi_rf),
+         __c_real(acceleration_kick),
+         ct.c_int(dt.shape[1]))
+
+
+def kick_drift_multiturn(dt, dE, voltage, omega_rf, phi_rf, acceleration_kick,
+                         solver, t_rev, length_ratio, alpha_order, eta_0,
+                         eta_1, eta_2, alpha_0, alpha_1, alpha_2, beta,
+                         energy):
+    __refuse_mixed('kick_drift_multiturn')
+    assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dE[0], precision.real_t)
+
+    # The RF arrays are expected with shape (n_turns, n_rf), the drift
+    # arrays with shape (n_turns)
+    n_turns = len(acceleration_kick)
+    voltage = np.ascontiguousarray(voltage, dtype=precision.real_t)
+    omega_rf = np.ascontiguousarray(omega_rf, dtype=precision.real_t)
+    phi_rf = np.ascontiguousarray(phi_rf, dtype=precision.real_t)
+    acceleration_kick = np.ascontiguousarray(acceleration_kick,
+                                             dtype=precision.real_t)
+    t_rev, eta_0, eta_1, eta_2, alpha_0, alpha_1, alpha_2, beta, energy = \
+        [np.ascontiguousarray(x, dtype=precision.real_t) for x in
+         (t_rev, eta_0, eta_1, eta_2, alpha_0, alpha_1, alpha_2, beta,
+          energy)]
+
+    if precision.num == 1:
+        func = __lib.kick_drift_multiturnf
+    else:
+        func = __lib.kick_drift_multiturn
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         ct.c_int(voltage.shape[1]),
+         __getPointer(voltage),
+         __getPointer(omega_rf),
+         __getPointer(phi_rf),
+         __getPointer(acceleration_kick),
+         ct.c_char_p(solver),
+         __getPointer(t_rev),
+         __c_real(length_ratio),
+         __c_real(alpha_order),
+         __getPointer(eta_0),
+         __getPointer(eta_1),
+         __getPointer(eta_2),
+         __getPointer(alpha_0),
+         __getPointer(alpha_1),
+         __getPointer(alpha_2),
+         __getPointer(beta),
+         __getPointer(energy),
+         ct.c_int(n_turns),
+         __getLen(dt))
+
+
+def kick_drift_periodic(dt, dE, voltage, omega_rf, phi_rf, charge, n_rf,
+                        acceleration_kick, solver, t_rev, length_ratio,
+                        alpha_order, eta_0, eta_1, eta_2, alpha_0, alpha_1,
+                        alpha_2, beta, energy):
+    __refuse_mixed('kick_drift_periodic')
+    assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dE[0], precision.real_t)
+
+    voltage_kick = charge * \
+        voltage.astype(dtype=precision.real_t, order='C', copy=False)
+    omegarf_kick = omega_rf.astype(
+        dtype=precision.real_t, order='C', copy=False)
+    phirf_kick = phi_rf.astype(dtype=precision.real_t, order='C', copy=False)
+
+    if precision.num == 1:
+        func = __lib.kick_drift_periodicf
+    else:
+        func = __lib.kick_drift_periodic
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         ct.c_int(n_rf),
+         __getPointer(voltage_kick),
+         __getPointer(omegarf_kick),
+         __getPointer(phirf_kick),
+         __c_real(acceleration_kick),
+         ct.c_char_p(solver),
+         __c_real(t_rev),
+         __c_real(length_ratio),
+         __c_real(alpha_order),
+         __c_real(eta_0),
+         __c_real(eta_1),
+         __c_real(eta_2),
+         __c_real(alpha_0),
+         __c_real(alpha_1),
+         __c_real(alpha_2),
+         __c_real(beta),
+         __c_real(energy),
+         __getLen(dt))
+
+
 def linear_interp_kick(dt, dE, voltage,
                        bin_centers, charge,
                        acceleration_kick):
 
-    assert isinstance(dt[0], precision.real_t)
-    assert isinstance(dE[0], precision.real_t)
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
     assert isinstance(voltage[0], precision.real_t)
     assert isinstance(bin_centers[0], precision.real_t)
 
@@ -701,7 +925,16 @@ def linear_interp_kick(dt, dE, voltage,
     # bin_centers = bin_centers.astype(
     # dtype=precision.real_t, order='C', copy=False)
 
-    if precision.num == 1:
+    if precision.mixed:
+        __lib.linear_interp_kick_mixed(__getPointer(dt),
+                                       __getPointer(dE),
+                                       __getPointer(voltage),
+                                       __getPointer(bin_centers),
+                                       __c_real(charge),
+                                       __getLen(bin_centers),
+                                       __getLen(dt),
+                                       __c_real(acceleration_kick))
+    elif precision.num == 1:
         __lib.linear_interp_kickf(__getPointer(dt),
                                   __getPointer(dE),
                                   __getPointer(voltage),
@@ -721,12 +954,33 @@ def linear_interp_kick(dt, dE, voltage,
                                  __c_real(acceleration_kick))
 
 
+def interp_kick(dt, dE, voltage, cut_left, cut_right, charge,
+                acceleration_kick, order=1):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+    assert isinstance(voltage[0], precision.real_t)
+
+    # Kick of the voltage given at the bin centres, interpolated with the
+    # shape function of the given order (see deposit)
+    if precision.mixed:
+        func = __lib.interp_kick_mixed
+    elif precision.num == 1:
+        func = __lib.interp_kickf
+    else:
+        func = __lib.interp_kick
+
+    func(__getPointer(dt), __getPointer(dE), __getPointer(voltage),
+         ct.c_double(cut_left), ct.c_double(cut_right), ct.c_double(charge),
+         __getLen(voltage), __getLen(dt), ct.c_double(acceleration_kick),
+         ct.c_int(order))
+
+
 def linear_interp_kick_n_drift(dt, dE, total_voltage, bin_centers, charge, acc_kick,
                                solver, t_rev, length_ratio, alpha_order, eta_0, eta_1,
                                eta_2, beta, energy):
     assert isinstance(dt[0], precision.real_t)
     assert isinstance(dE[0], precision.real_t)
-    assert isinstance(voltage[0], precision.real_t)
+    assert isinstance(total_voltage[0], precision.real_t)
     assert isinstance(bin_centers[0], precision.real_t)
 
     # dt = dt.astype(dtype=precision.real_t, order='C', copy=False)
@@ -773,14 +1027,64 @@ def linear_interp_kick_n_drift(dt, dE, total_voltage, bin_centers, charge, acc_k
                                          __c_real(charge))
 
 
-def slice(dt, profile, cut_left, cut_right):
+def linear_interp_kick_drift_slice(dt, dE, total_voltage, bin_centers, charge,
+                                   acc_kick, solver, t_rev, length_ratio,
+                                   alpha_order, eta_0, eta_1, eta_2, alpha_0,
+                                   alpha_1, alpha_2, beta, energy, profile,
+                                   cut_left, cut_right):
+    __refuse_mixed('linear_interp_kick_drift_slice')
     assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dE[0], precision.real_t)
+    assert isinstance(total_voltage[0], precision.real_t)
+    assert isinstance(bin_centers[0], precision.real_t)
+    assert isinstance(profile[0], precision.real_t)
+
+    if precision.num == 1:
+        func = __lib.linear_interp_kick_drift_slicef
+    else:
+        func = __lib.linear_interp_kick_drift_slice
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         __getPointer(total_voltage),
+         __getPointer(bin_centers),
+         __c_real(charge),
+         __getLen(bin_centers),
+         __getLen(dt),
+         __c_real(acc_kick),
+         ct.c_char_p(solver),
+         __c_real(t_rev),
+         __c_real(length_ratio),
+         __c_real(alpha_order),
+         __c_real(eta_0),
+         __c_real(eta_1),
+         __c_real(eta_2),
+         __c_real(alpha_0),
+         __c_real(alpha_1),
+         __c_real(alpha_2),
+         __c_real(beta),
+         __c_real(energy),
+         __getPointer(profile),
+         __c_real(cut_left),
+         __c_real(cut_right),
+         __getLen(profile))
+
+
+def slice(dt, profile, cut_left, cut_right):
+    assert isinstance(dt[0], precision.coord_t)
     assert isinstance(profile[0], precision.real_t)
 
     # dt = dt.astype(dtype=precision.real_t, order='C', copy=False)
     # profile = profile.astype(dtype=precision.real_t, order='C', copy=False)
 
-    if precision.num == 1:
+    if precision.mixed:
+        __lib.histogram_mixed(__getPointer(dt),
+                              __getPointer(profile),
+                              __c_real(cut_left),
+                              __c_real(cut_right),
+                              __getLen(profile),
+                              __getLen(dt))
+    elif precision.num == 1:
         __lib.histogramf(__getPointer(dt),
                          __getPointer(profile),
                          __c_real(cut_left),
@@ -796,6 +1100,173 @@ def slice(dt, profile, cut_left, cut_right):
                         __getLen(dt))
 
 
+def slice_ensemble(dt, profile, cut_left, cut_right):
+    __refuse_mixed('slice_ensemble')
+    assert isinstance(dt[0, 0], precision.real_t)
+    assert isinstance(profile[0, 0], precision.real_t)
+
+    # One histogram per row of dt (n_ensemble, n_macroparticles) in the
+    # rows of profile (n_ensemble, n_slices)
+    if precision.num == 1:
+        func = __lib.histogram_ensemblef
+    else:
+        func = __lib.histogram_ensemble
+
+    func(__getPointer(dt),
+         __getPointer(profile),
+         __c_real(cut_left),
+         __c_real(cut_right),
+         ct.c_int(profile.shape[1]),
+         ct.c_int(dt.shape[1]),
+         ct.c_int(dt.shape[0]))
+
+
+def sort_by_bin(dt, dE, id, cut_left, cut_right, n_slices):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+
+    # Stable counting sort of the particles by time bin, in place; the
+    # particles outside the cuts are moved to the end of the arrays
+    if precision.num == 1 or precision.mixed:
+        func = __id_func('sort_by_binf', id)
+    else:
+        func = __id_func('sort_by_bin', id)
+
+    func(__getPointer(dt),
+         __getPointer(dE),
+         __getPointer(id),
+         ct.c_double(cut_left),
+         ct.c_double(cut_right),
+         ct.c_int(n_slices),
+         __getLen(dt))
+
+
+def compact_alive(dt, dE, id):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+
+    # Moves the particles with id != 0 to the start of the arrays, in place
+    # and keeping their order; returns their number
+    if precision.num == 1 or precision.mixed:
+        func = __id_func('compact_alivef', id)
+    else:
+        func = __id_func('compact_alive', id)
+
+    func.restype = ct.c_int
+    return func(__getPointer(dt), __getPointer(dE), __getPointer(id),
+                __getLen(dt))
+
+
+def beam_statistics(dt, dE, id):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+
+    # Single pass over the particles with id != 0, returns
+    # [n_alive, mean_dt, sigma_dt, sumsq_dt, min_dt, max_dt,
+    #  mean_dE, sigma_dE, sumsq_dE, min_dE, max_dE]
+    stats = np.empty(11, dtype=np.float64)
+    if precision.num == 1 or precision.mixed:
+        func = __id_func('beam_statisticsf', id)
+    else:
+        func = __id_func('beam_statistics', id)
+
+    func(__getPointer(dt), __getPointer(dE), __getPointer(id),
+         __getPointer(stats), __getLen(dt))
+    return stats
+
+
+def bunch_statistics(dt, dE, id, n_bunches, bunch_id=None,
+                     first_bucket_start=0., bucket_size_tau=1.,
+                     bunch_spacing_buckets=1):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+
+    # Single pass over the particles with id != 0, returns the array
+    # [n_alive, mean_dt, sigma_dt, mean_dE, sigma_dE] of shape (5, n_bunches).
+    # The bunch of a particle is bunch_id[id-1] if given, otherwise its RF
+    # bucket divided by bunch_spacing_buckets.
+    stats = np.empty((5, n_bunches), dtype=np.float64)
+    if bunch_id is not None:
+        assert bunch_id.dtype == np.int32
+        bunch_id_ptr = __getPointer(bunch_id)
+        n_bunch_id = len(bunch_id)
+    else:
+        bunch_id_ptr = None
+        n_bunch_id = 0
+
+    if precision.num == 1 or precision.mixed:
+        func = __id_func('bunch_statisticsf', id)
+    else:
+        func = __id_func('bunch_statistics', id)
+
+    func(__getPointer(dt), __getPointer(dE), __getPointer(id),
+         bunch_id_ptr, ct.c_long(n_bunch_id),
+         ct.c_double(first_bucket_start), ct.c_double(bucket_size_tau),
+         ct.c_int(bunch_spacing_buckets), ct.c_int(n_bunches),
+         __getPointer(stats), __getLen(dt))
+    return stats
+
+
+def aperture(dt, dE, id, dt_min=-np.inf, dt_max=np.inf, dE_min=-np.inf,
+             dE_max=np.inf, separatrix=None, potential=None,
+             potential_parameters=None):
+    assert isinstance(dt.flat[0], precision.coord_t)
+    assert isinstance(dE.flat[0], precision.coord_t)
+    assert dt.flags.c_contiguous and id.flags.c_contiguous
+
+    # Single pass over the particles with id != 0: the ones outside the
+    # time and energy cuts, or outside the separatrix if its Hamiltonian
+    # parameters or a tabulated potential well are given, get id = 0;
+    # returns their number
+    if precision.num == 1 or precision.mixed:
+        name = 'aperturef'
+    else:
+        name = 'aperture'
+
+    if potential is not None:
+        potential = np.ascontiguousarray(potential, dtype=np.float64)
+        potential_parameters = np.ascontiguousarray(potential_parameters,
+                                                    dtype=np.float64)
+        func = __id_func(name.replace('aperture', 'aperture_potential'), id)
+        func.restype = ct.c_int
+        return func(__getPointer(dt), __getPointer(dE), __getPointer(id),
+                    ct.c_double(dt_min), ct.c_double(dt_max),
+                    ct.c_double(dE_min), ct.c_double(dE_max),
+                    __getPointer(potential), __getLen(potential),
+                    __getPointer(potential_parameters), ct.c_int(dt.size))
+
+    if separatrix is not None:
+        separatrix = np.ascontiguousarray(separatrix, dtype=np.float64)
+        separatrix_ptr = __getPointer(separatrix)
+    else:
+        separatrix_ptr = None
+
+    func = __id_func(name, id)
+    func.restype = ct.c_int
+    return func(__getPointer(dt), __getPointer(dE), __getPointer(id),
+                ct.c_double(dt_min), ct.c_double(dt_max),
+                ct.c_double(dE_min), ct.c_double(dE_max),
+                separatrix_ptr, ct.c_int(dt.size))
+
+
+def deposit(dt, profile, cut_left, cut_right, order=1):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(profile[0], precision.real_t)
+
+    # Deposition with the shape function of order 0 (nearest grid point),
+    # 1 (cloud-in-cell), 2 (triangular-shaped cloud) or 3 (cubic spline)
+    if precision.mixed:
+        func = __lib.deposit_mixed
+    elif precision.num == 1:
+        func = __lib.depositf
+    else:
+        func = __lib.deposit
+
+    func(__getPointer(dt), __getPointer(profile), ct.c_double(cut_left),
+         ct.c_double(cut_right), __getLen(profile), __getLen(dt),
+         ct.c_int(order))
+
+
 def slice_smooth(dt, profile, cut_left, cut_right):
     assert isinstance(dt[0], precision.real_t)
     assert isinstance(profile[0], precision.real_t)
@@ -820,27 +1291,44 @@ def slice_smooth(dt, profile, cut_left, cut_right):
 
 
 def sparse_histogram(dt, profile, cut_left, cut_right, bunch_indexes):
-    assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dt[0], precision.coord_t)
     assert isinstance(profile[0][0], precision.real_t)
 
-    if precision.num == 1:
-        __lib.sparse_histogramf(__getPointer(dt),
-                                __getPointer(profile),
-                                __getPointer(cut_left),
-                                __getPointer(cut_right),
-                                __getPointer(bunch_indexes),
-                                __getLen(profile),
-                                __getLen(cut_left),
-                                __getLen(dt))
+    # 2D histogram, profile[i] being the histogram of the bucket from
+    # cut_left[i] to cut_right[i]
+    if precision.mixed:
+        func = __lib.sparse_histogram_mixed
+    elif precision.num == 1:
+        func = __lib.sparse_histogramf
     else:
-        __lib.sparse_histogram(__getPointer(dt),
-                               __getPointer(profile),
-                               __getPointer(cut_left),
-                               __getPointer(cut_right),
-                               __getPointer(bunch_indexes),
-                               __getLen(profile),
-                               __getLen(cut_left),
-                               __getLen(dt))
+        func = __lib.sparse_histogram
+
+    func(__getPointer(dt), __getPointer(profile), __getPointer(cut_left),
+         __getPointer(cut_right), __getPointer(bunch_indexes),
+         ct.c_int(profile.shape[1]), __getLen(cut_left),
+         __getLen(bunch_indexes), __getLen(dt))
+
+
+def sparse_interp_kick(dt, dE, voltage, cut_left, bunch_indexes,
+                       bucket_length, charge, acceleration_kick):
+    assert isinstance(dt[0], precision.coord_t)
+    assert isinstance(dE[0], precision.coord_t)
+    assert isinstance(voltage[0][0], precision.real_t)
+
+    # Kick of the voltage of each filled bucket, voltage[i] being given at
+    # the bin centres of the bucket starting at cut_left[i]
+    if precision.mixed:
+        func = __lib.sparse_interp_kick_mixed
+    elif precision.num == 1:
+        func = __lib.sparse_interp_kickf
+    else:
+        func = __lib.sparse_interp_kick
+
+    func(__getPointer(dt), __getPointer(dE), __getPointer(voltage),
+         __getPointer(cut_left), __getPointer(bunch_indexes),
+         ct.c_double(bucket_length), ct.c_double(charge),
+         ct.c_int(voltage.shape[1]), __getLen(bunch_indexes), __getLen(dt),
+         ct.c_double(acceleration_kick))
 
 
 def music_track(dt, dE, induced_voltage, array_parameters,
@@ -982,6 +1470,19 @@ def set_random_seed(seed):
     __lib.set_random_seed(ct.c_int(seed))
 
 
+def get_random_state():
+    # State of the random number generators of the compiled routines, as
+    # text; the first call gets the size needed
+    size = __lib.get_random_state(None, ct.c_int(0))
+    buffer = ct.create_string_buffer(size)
+    __lib.get_random_state(buffer, ct.c_int(size))
+    return buffer.value
+
+
+def set_random_state(state):
+    __lib.set_random_state(ct.c_char_p(state))
+
+
 def fast_resonator(R_S, Q, frequency_array, frequency_R, impedance=None):
     R_S = R_S.astype(dtype=precision.real_t, order='C', copy=False)
     Q = Q.astype(dtype=precision.real_t, order='C', copy=False)
@@ -0,0 +1,274 @@
+# Copyright 2016 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+**Module to save the full state of a simulation to an HDF5 file and to
+restore it, to resume long simulations**
+
+The state of every object given, and of the BLonD objects they refer to, is
+made of all its numpy arrays, scalars, strings, numpy random generators,
+dictionaries and lists of these; it is written to one HDF5 group per object,
+the arrays as uncompressed datasets written directly from and read directly
+into their memory, without pickling. Turn counters, accumulated RF phases,
+feedback and impedance memories, beam coordinates and the states of the
+random number generators of numpy and of the compiled routines are all
+restored. The functions, methods and loggers held as attributes are set up
+again by the simulation and are not saved; any other attribute that cannot be
+saved is reported with a warning.
+
+The objects are restored in place: the simulation is first set up exactly as
+for a new run, e.g. with the same script but without generating the matched
+distribution, and the checkpoint is then loaded into the same objects.
+'''
+
+from __future__ import division
+import inspect
+import logging
+import warnings
+import numpy as np
+import h5py as hp
+
+from . import bmath as bm
+
+
+def save_checkpoint(filename, objects):
+    '''
+    Save the state of the simulation.
+
+    Parameters
+    ----------
+    filename : str
+        name of the HDF5 file, overwritten if it exists.
+    objects : dict
+        the objects to save, e.g. {'ring': ring, 'rf': rf, 'beam': beam,
+        'tracker': tracker}; the BLonD objects they refer to are saved with
+        them.
+
+    Examples
+    --------
+    >>> save_checkpoint('checkpoint.h5', {'beam': beam, 'tracker': tracker,
+    >>>                                   'induced_voltage': total_voltage})
+    >>> # In a new run, after setting up the same objects
+    >>> load_checkpoint('checkpoint.h5', {'beam': beam, 'tracker': tracker,
+    >>>                                   'induced_voltage': total_voltage})
+    '''
+
+    visited = set()
+    with hp.File(filename, 'w') as h5file:
+        for name, obj in objects.items():
+            _save_object(h5file.create_group(name), obj, visited)
+
+        # Random number generators
+        h5group = h5file.create_group('_random')
+        state = np.random.get_state()
+        h5group.create_dataset('numpy_keys', data=state[1])
+        h5group.attrs['numpy_pos'] = state[2]
+        h5group.attrs['numpy_has_gauss'] = state[3]
+        h5group.attrs['numpy_cached_gaussian'] = state[4]
+        h5group.create_dataset(
+            'blond_state', data=np.frombuffer(bm.get_random_state(),
+                                              dtype=np.uint8))
+
+
+def load_checkpoint(filename, objects):
+    '''
+    Restore the state of the simulation saved with save_checkpoint, in place.
+
+    Parameters
+    ----------
+    filename : str
+        name of the HDF5 file.
+    objects : dict
+        the objects to restore, with the same names and set up in the same
+        way as the ones saved.
+    '''
+
+    visited = set()
+    with hp.File(filename, 'r') as h5file:
+        for name, obj in objects.items():
+            if name not in h5file:
+                # CheckpointError
+                raise RuntimeError("ERROR in load_checkpoint: no object '%s'"
+                                   % name + " in the checkpoint!")
+            _load_object(h5file[name], obj, visited)
+
+        h5group = h5file['_random']
+        np.random.set_state(('MT19937', h5group['numpy_keys'][()],
+                             int(h5group.attrs['numpy_pos']),
+                             int(h5group.attrs['numpy_has_gauss']),
+                             float(h5group.attrs['numpy_cached_gaussian'])))
+        bm.set_random_state(h5group['blond_state'][()].tobytes())
+
+
+def _is_blond_object(value):
+
+    return type(value).__module__.startswith('blond.') \
+        and hasattr(value, '__dict__')
+
+
+def _save_value(h5group, key, value, visited):
+    '''Save one attribute, with a warning if its type cannot be saved.
+    '''
+
+    # The metadata of the groups is stored in attributes starting with '@',
+    # which cannot clash with Python attribute names
+    if value is None:
+        h5group.attrs['@none'] = h5group.attrs.get('@none', '') + key + ' '
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        h5group.create_dataset(key, data=value)
+    elif isinstance(value, int) and not isinstance(value, bool) and \
+            not np.iinfo(np.int64).min <= value <= np.iinfo(np.int64).max:
+        # Beyond the integers of HDF5, e.g. the states of the generators
+        h5group.attrs['@bigint'] = h5group.attrs.get('@bigint', '') \
+            + key + ' '
+        h5group.attrs[key] = str(value)
+    elif isinstance(value, (bool, int, float, complex, str, bytes,
+                            np.generic)):
+        h5group.attrs[key] = value
+    elif isinstance(value, np.random.Generator):
+        subgroup = h5group.create_group(key)
+        subgroup.attrs['@type'] = 'generator'
+        for k, v in value.bit_generator.state.items():
+            _save_value(subgroup, k, v, visited)
+    elif isinstance(value, dict):
+        subgroup = h5group.create_group(key)
+        subgroup.attrs['@type'] = 'dict'
+        for k, v in value.items():
+            if isinstance(k, str):
+                _save_value(subgroup, k, v, visited)
+            else:
+                _unsaved(subgroup, repr(k), v)
+    elif isinstance(value, (list, tuple)):
+        subgroup = h5group.create_group(key)
+        subgroup.attrs['@type'] = 'list'
+        subgroup.attrs['@length'] = len(value)
+        for i, v in enumerate(value):
+            _save_value(subgroup, str(i), v, visited)
+    elif _is_blond_object(value):
+        if id(value) in visited:
+            return
+        _save_object(h5group.create_group(key), value, visited)
+    elif not (inspect.isroutine(value) or inspect.isclass(value) or
+              isinstance(value, logging.Logger)):
+        _unsaved(h5group, key, value)
+
+
+def _unsaved(h5group, key, value):
+
+    warnings.warn("WARNING in save_checkpoint: %s/%s of type %s is not"
+                  % (h5group.name, key, type(value).__name__) +
+                  " saved, the restarted simulation may differ!")
+
+
+def _save_object(h5group, obj, visited):
+
+    visited.add(id(obj))
+    h5group.attrs['@type'] = 'object'
+    for key, value in vars(obj).items():
+        _save_value(h5group, key, value, visited)
+
+
+def _load_array(dataset, current):
+    '''Read a dataset in place into the current array if possible, otherwise
+    into a new array.
+    '''
+
+    if isinstance(current, np.ndarray) and current.shape == dataset.shape \
+            and current.dtype == dataset.dtype and current.flags.writeable \
+            and current.flags.c_contiguous and current.size > 0:
+        dataset.read_direct(current)
+        return current
+    return dataset[()]
+
+
+def _load_value(h5item, current, visited):
+    '''Restore one value from a dataset or group, in place where possible;
+    returns the restored value.
+    '''
+
+    if isinstance(h5item, hp.Dataset):
+        return _load_array(h5item, current)
+
+    item_type = h5item.attrs['@type']
+    if item_type == 'object':
+        if current is not None and _is_blond_object(current) \
+                and id(current) not in visited:
+            _load_object(h5item, current, visited)
+        return current
+    elif item_type == 'generator':
+        state = {}
+        _load_members(h5item, state, visited, state.get)
+        if not isinstance(current, np.random.Generator):
+            current = np.random.Generator(
+                getattr(np.random, state['bit_generator'])())
+        current.bit_generator.state = state
+        return current
+    elif item_type == 'dict':
+        if not isinstance(current, dict):
+            current = {}
+        _load_members(h5item, current, visited,
+                      lambda key: current.get(key))
+        return current
+    else:
+        length = int(h5item.attrs['@length'])
+        restored = list(current) if isinstance(current, (list, tuple)) \
+            and len(current) == length else [None]*length
+        _load_members(h5item, restored, visited,
+                      lambda key: restored[int(key)], index=int)
+        if isinstance(current, tuple):
+            return tuple(restored)
+        if isinstance(current, list) and len(current) == length:
+            current[:] = restored
+            return current
+        return restored
+
+
+def _load_members(h5group, container, visited, get, index=str):
+    '''Restore the members of a dict or list, or the attributes of an
+    object, with get(key) giving the current value of a member.
+    '''
+
+    for key in h5group.attrs.get('@none', '').split():
+        container[index(key)] = None
+    bigints = h5group.attrs.get('@bigint', '').split()
+    for key, value in h5group.attrs.items():
+        if key.startswith('@'):
+            continue
+        if key in bigints:
+            container[index(key)] = int(value)
+            continue
+        # Back to the Python type of the current value, e.g. for the
+        # identity checks of booleans
+        current = get(key)
+        if isinstance(value, np.bool_) or (
+                isinstance(current, (bool, int, float, complex)) and
+                not isinstance(current, np.generic)):
+            value = type(current)(value) if current is not None \
+                else bool(value)
+        container[index(key)] = value
+    for key, h5item in h5group.items():
+        container[index(key)] = _load_value(h5item, get(key), visited)
+
+
+class _Attributes(object):
+    '''Item access to the attributes of an object.
+    '''
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __setitem__(self, key, value):
+        setattr(self.obj, key, value)
+
+
+def _load_object(h5group, obj, visited):
+
+    visited.add(id(obj))
+    attributes = vars(obj)
+    _load_members(h5group, _Attributes(obj), visited,
+                  lambda key: attributes.get(key))
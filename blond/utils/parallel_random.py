@@ -0,0 +1,188 @@
+# Copyright 2016 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+**Module to draw reproducible random numbers in parallel with a
+counter-based generator**
+
+The particles are divided in blocks of fixed size; the draws of a block come
+from its own Philox stream, whose key is the seed and whose counter starts at
+the index of the block. The draws of each particle therefore only depend on
+the seed and on the global index of the particle, not on the number of
+threads or MPI ranks, and the blocks can be filled in any order, directly
+in the output arrays.
+'''
+
+from __future__ import division
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from . import bmath as bm
+
+
+class CounterBasedGenerator(object):
+    '''
+    Parallel and reproducible random number generator, filling the
+    coordinate arrays in place block by block with a pool of threads.
+
+    Parameters
+    ----------
+    seed : int
+        Key of the Philox streams; drawn from the operating system if None,
+        see the seed attribute to reproduce the draws.
+    n_threads : int
+        Number of threads filling the blocks; default is the environment
+        variable OMP_NUM_THREADS, as for the compiled routines.
+    block_size : int
+        Number of particles in a block; the draws depend on it.
+
+    Attributes
+    ----------
+    seed : int
+        Key of the Philox streams.
+    stream : int
+        Index of the next stream; every call draws from a new stream, so that
+        successive calls with the same generator are independent.
+    '''
+
+    def __init__(self, seed=None, n_threads=None, block_size=2**16):
+
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = int(seed) % 2**128
+        if n_threads is None:
+            n_threads = int(os.environ.get('OMP_NUM_THREADS', 1))
+        self.n_threads = max(int(n_threads), 1)
+        self.block_size = int(block_size)
+        self.stream = 0
+
+    def _generator(self, stream, block):
+        # Counter of 256 bits: 2^64 draws per block, then the index of the
+        # block on 128 bits and the stream on the highest 64 bits
+        counter = (stream << 192) + (block << 64)
+        return np.random.Generator(np.random.Philox(key=self.seed,
+                                                    counter=counter))
+
+    def _fill(self, out, draw, offset):
+        # Fill out with the draws of the particles of global indices
+        # offset to offset + len(out) of a new stream
+
+        stream = self.stream
+        self.stream += 1
+        n = len(out)
+        if n == 0:
+            return out
+        first = offset // self.block_size
+        last = (offset + n - 1) // self.block_size
+
+        def fill_block(block):
+            start = block*self.block_size
+            generator = self._generator(stream, block)
+            lo = max(start, offset)
+            hi = min(start + self.block_size, offset + n)
+            if lo == start and hi == start + self.block_size:
+                draw(generator, out[lo - offset:hi - offset])
+            else:
+                # Block partly outside out, e.g. shared with another rank:
+                # draw it all and keep the particles of out
+                buffer = np.empty(self.block_size, dtype=out.dtype)
+                draw(generator, buffer)
+                out[lo - offset:hi - offset] = buffer[lo - start:hi - start]
+
+        blocks = range(first, last + 1)
+        if self.n_threads == 1 or len(blocks) == 1:
+            for block in blocks:
+                fill_block(block)
+        else:
+            with ThreadPoolExecutor(self.n_threads) as pool:
+                list(pool.map(fill_block, blocks))
+        return out
+
+    def normal(self, out, loc=0., scale=1., offset=0):
+        '''
+        Fill out with Gaussian draws of mean loc and r.m.s. scale.
+
+        Parameters
+        ----------
+        out : float array
+            Output array, float64 or float32, filled in place.
+        loc : float
+            Mean.
+        scale : float
+            Standard deviation.
+        offset : int
+            Global index of the first element of out, e.g. for the part of
+            the beam of an MPI rank.
+        '''
+
+        def draw(generator, block):
+            generator.standard_normal(out=block, dtype=block.dtype)
+            block *= scale
+            block += loc
+
+        return self._fill(out, draw, offset)
+
+    def uniform(self, out, low=0., high=1., offset=0):
+        '''
+        Fill out with uniform draws in [low, high), see normal.
+        '''
+
+        def draw(generator, block):
+            generator.random(out=block, dtype=block.dtype)
+            block *= high - low
+            block += low
+
+        return self._fill(out, draw, offset)
+
+    def from_table(self, out, values, probability, offset=0):
+        '''
+        Fill out with draws of the piecewise constant distribution of
+        probability given on the uniformly spaced values, each value being
+        the centre of a bin; same distribution as a choice of the values
+        followed by a uniform jitter over the bin, drawn by inversion of the
+        cumulative distribution, see normal.
+
+        Parameters
+        ----------
+        values : float array
+            Uniformly spaced centres of the bins.
+        probability : float array
+            Probability of each bin, normalised here.
+        '''
+
+        values = np.asarray(values, dtype=float)
+        probability = np.asarray(probability, dtype=float)
+        step = values[1] - values[0]
+        edges = np.append(values - step/2, values[-1] + step/2)
+        cumulative = np.append(0., np.cumsum(probability))
+        cumulative /= cumulative[-1]
+
+        def draw(generator, block):
+            generator.random(out=block, dtype=block.dtype)
+            block[:] = np.interp(block, cumulative, edges)
+
+        return self._fill(out, draw, offset)
+
+
+def global_offset(Beam, n_local=None):
+    '''
+    Global index of the first of the n_local particles of this rank, the
+    particles being numbered in the order of the ranks, and total number of
+    particles of all the ranks; 0 and n_local if the beam is not split among
+    MPI workers.
+    '''
+
+    if n_local is None:
+        n_local = Beam.n_macroparticles
+    if not (bm.mpiMode() and Beam.is_splitted):
+        return 0, n_local
+
+    from .mpi_config import worker
+    counts = worker.allgather(np.array([n_local], dtype=np.int64))
+    return int(np.sum(counts[:worker.rank])), int(np.sum(counts))
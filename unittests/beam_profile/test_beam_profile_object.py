@@ -278,6 +278,177 @@ class testProfileClass(unittest.TestCase):
             rtol=rtol, atol=atol,
             err_msg='Bunch length values not correct')
 
+    def test_reorder(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        my_beam = Beam(self.ring, 100000, 1e10)
+        my_beam.dt = np.load(dir_path+'/dt_coordinates.npz')['arr_0']
+        my_beam.dE = np.linspace(-1e6, 1e6, my_beam.n_macroparticles)
+        coordinates = dict(zip(my_beam.id, zip(my_beam.dt, my_beam.dE)))
+
+        CutOptions = profileModule.CutOptions(cut_left=0,
+                                              cut_right=self.ring.t_rev[0],
+                                              n_slices=1000)
+        reference = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                direct_slicing=True))
+        profile = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                reorder_period=2))
+
+        def bin_indices():
+            return np.floor((my_beam.dt - profile.cut_left)
+                            / profile.bin_size).astype(int)
+
+        profile.track()
+
+        # Sorted by bin, with the out-of-cut particles at the end
+        bins = bin_indices()
+        inside = (bins >= 0) & (bins < profile.n_slices)
+        n_inside = np.count_nonzero(inside)
+        self.assertTrue(np.all(inside[:n_inside]))
+        self.assertTrue(np.all(np.diff(bins[:n_inside]) >= 0))
+
+        # The particle ids follow their coordinates
+        for i in range(0, my_beam.n_macroparticles, 997):
+            self.assertEqual(coordinates[my_beam.id[i]],
+                             (my_beam.dt[i], my_beam.dE[i]))
+
+        np.testing.assert_array_equal(profile.n_macroparticles,
+                                      reference.n_macroparticles)
+
+        # Only every reorder_period calls
+        my_beam.dt[:] = my_beam.dt[::-1]
+        profile.track()
+        self.assertTrue(np.any(np.diff(bin_indices()[:n_inside]) < 0))
+        profile.track()
+        self.assertTrue(np.all(np.diff(bin_indices()[:n_inside]) >= 0))
+
+        with self.assertRaises(RuntimeError):
+            profileModule.Profile(
+                my_beam, OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                    reorder_period=0))
+
+
+    def test_sampled(self):
+        my_beam = Beam(self.ring, 100000, 1e10)
+        my_beam.dt[:] = 5e-9 + 1e-9*np.random.randn(my_beam.n_macroparticles)
+
+        CutOptions = profileModule.CutOptions(cut_left=0, cut_right=1e-8,
+                                              n_slices=50)
+        reference = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                direct_slicing=True))
+        profile = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                sample_fraction=0.25, sample_seed=1))
+        self.assertEqual(profile.sample_stride, 4)
+
+        # Every particle is sliced once every 4 turns
+        average = np.zeros(profile.n_slices)
+        for turn in range(4):
+            profile.track()
+            self.assertAlmostEqual(np.sum(profile.n_macroparticles),
+                                   np.sum(reference.n_macroparticles),
+                                   delta=1)
+            # Within the error estimate in the populated bins
+            populated = reference.n_macroparticles > 100
+            self.assertTrue(np.all(
+                np.abs(profile.n_macroparticles -
+                       reference.n_macroparticles)[populated] <=
+                6*profile.n_macroparticles_error[populated]))
+            average += profile.n_macroparticles / 4
+        np.testing.assert_allclose(average, reference.n_macroparticles)
+
+        # The smoothing reduces the error
+        smoothed = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                sample_fraction=0.25, sample_smoothing=0.5))
+        smoothed.track()
+        error = smoothed.n_macroparticles_error.copy()
+        for turn in range(5):
+            smoothed.track()
+        # Towards sqrt(1/3) for a weight of 0.5
+        self.assertLess(np.sum(smoothed.n_macroparticles_error),
+                        0.65*np.sum(error))
+
+        with self.assertRaises(RuntimeError):
+            profileModule.Profile(
+                my_beam, OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                    sample_fraction=0))
+
+    def test_deposition_orders(self):
+        np.random.seed(1)
+        my_beam = Beam(self.ring, 100000, 1e10)
+        my_beam.dt[:] = 5e-9 + 1e-9*np.random.randn(my_beam.n_macroparticles)
+        CutOptions = profileModule.CutOptions(cut_left=0, cut_right=1e-8,
+                                              n_slices=64)
+        reference = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                direct_slicing=True))
+        bin_size = reference.bin_size
+
+        # Density of the Gaussian bunch integrated over the bins
+        x = np.linspace(0, 1e-8, 64*100 + 1)
+        density = np.exp(-0.5*((x - 5e-9)/1e-9)**2)
+        expected = np.add.reduceat(density[:-1], np.arange(0, 6400, 100))
+        expected *= my_beam.n_macroparticles / np.sum(expected)
+
+        errors = []
+        for order in range(4):
+            profile = profileModule.Profile(
+                my_beam, CutOptions=CutOptions,
+                OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                    direct_slicing=True, deposition_order=order))
+            # All the particles are inside the frame
+            self.assertAlmostEqual(np.sum(profile.n_macroparticles),
+                                   my_beam.n_macroparticles, delta=1e-6)
+            if order == 0:
+                np.testing.assert_array_equal(profile.n_macroparticles,
+                                              reference.n_macroparticles)
+            errors.append(np.std(profile.n_macroparticles - expected))
+        # Less noise than the standard histogram; the smoothing of the
+        # shape function is small compared to the noise here
+        self.assertLess(errors[2], errors[0])
+        self.assertLess(errors[3], errors[0])
+
+        # A particle at a bin centre is deposited symmetrically
+        single = Beam(self.ring, 1, 0)
+        single.dt[:] = 10.5*bin_size
+        for order, weights in [(1, [1]), (2, [1/8, 3/4, 1/8]),
+                               (3, [1/6, 2/3, 1/6])]:
+            profile = profileModule.Profile(
+                single, CutOptions=CutOptions,
+                OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                    direct_slicing=True, deposition_order=order))
+            half = len(weights) // 2
+            np.testing.assert_allclose(
+                profile.n_macroparticles[10 - half:11 + half], weights)
+
+        # Linear interpolation of the kick inside the bin centres
+        voltage = np.sin(reference.bin_centers*1e9)
+        profile = profileModule.Profile(
+            my_beam, CutOptions=CutOptions,
+            OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                deposition_order=1))
+        inside = (my_beam.dt > reference.bin_centers[0]) & \
+            (my_beam.dt < reference.bin_centers[-1])
+        dE_linear = np.zeros(my_beam.n_macroparticles)
+        dE_shape = np.zeros(my_beam.n_macroparticles)
+        reference.interp_kick(my_beam.dt, dE_linear, voltage, 1., 3.)
+        profile.interp_kick(my_beam.dt, dE_shape, voltage, 1., 3.)
+        np.testing.assert_allclose(dE_shape[inside], dE_linear[inside],
+                                   atol=1e-12)
+
+        with self.assertRaises(RuntimeError):
+            profileModule.Profile(
+                my_beam, OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                    deposition_order=4))
 
 if __name__ == '__main__':
 
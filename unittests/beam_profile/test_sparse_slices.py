@@ -0,0 +1,80 @@
+# coding: utf-8
+# Copyright 2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+**Unit-tests for the SparseSlices class.**
+
+:Authors: **BLonD developers**
+'''
+
+from __future__ import division, print_function
+import unittest
+import numpy as np
+
+from blond.beam.beam import Beam, Proton
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.sparse_slices import SparseSlices
+
+
+class testSparseSlicesClass(unittest.TestCase):
+
+    def setUp(self):
+        ring = Ring(6911.5038, 1/17.95142852**2, 450e9, Proton(), 10)
+        self.rf = RFStation(ring, [4620], [7e6], [0.])
+        self.t_rf = 2*np.pi / self.rf.omega_rf[0, 0]
+        self.filling_pattern = np.zeros(20)
+        self.filling_pattern[[2, 3, 7, 12]] = 1
+
+        # Particles in all the buckets, the empty ones included, and outside
+        # the filling pattern
+        np.random.seed(2)
+        self.beam = Beam(ring, 50000, 1e11)
+        self.beam.dt[:] = np.random.uniform(-2*self.t_rf, 22*self.t_rf,
+                                            50000)
+
+    def test_cuts(self):
+        sparse = SparseSlices(self.rf, self.beam, 32, self.filling_pattern)
+        np.testing.assert_allclose(sparse.cut_left_array,
+                                   np.array([2, 3, 7, 12]) * self.t_rf)
+        np.testing.assert_allclose(sparse.cut_right_array,
+                                   np.array([3, 4, 8, 13]) * self.t_rf)
+        np.testing.assert_array_equal(sparse.bunch_indexes[:8],
+                                      [-1, -1, 0, 1, -1, -1, -1, 2])
+
+    def test_histogram(self):
+        reference = SparseSlices(self.rf, self.beam, 32, self.filling_pattern,
+                                 tracker='onebyone', direct_slicing=True)
+        sparse = SparseSlices(self.rf, self.beam, 32, self.filling_pattern,
+                              direct_slicing=True)
+
+        np.testing.assert_array_equal(sparse.n_macroparticles_array,
+                                      reference.n_macroparticles_array)
+        self.assertEqual(np.sum(sparse.n_macroparticles_array),
+                         np.sum((self.beam.dt >= 2*self.t_rf)
+                                & (self.beam.dt < 4*self.t_rf)
+                                | (self.beam.dt >= 7*self.t_rf)
+                                & (self.beam.dt < 8*self.t_rf)
+                                | (self.beam.dt >= 12*self.t_rf)
+                                & (self.beam.dt < 13*self.t_rf)))
+
+        # The profiles of the buckets are rows of the 2D histogram
+        for profile in sparse.slices_array:
+            self.assertIs(profile.n_macroparticles.base,
+                          sparse.n_macroparticles_array)
+
+        # Slicing again gives the same histogram
+        sparse.track()
+        np.testing.assert_array_equal(sparse.n_macroparticles_array,
+                                      reference.n_macroparticles_array)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -26,9 +26,12 @@ from scipy.constants import physical_constants
 from blond.beam.beam import Particle, Proton, Electron
 from blond.input_parameters.ring import Ring
 from blond.input_parameters.rf_parameters import RFStation
-from blond.beam.beam import Beam
+from blond.beam.beam import Beam, EnsembleBeam
 from blond.beam.distributions import matched_from_distribution_function
+from blond.beam.profile import Profile, CutOptions
 from blond.trackers.tracker import FullRingAndRF, RingAndRFTracker
+from blond.trackers.utilities import is_in_separatrix, \
+    PotentialWellSeparatrix
 import blond.utils.exceptions as blExcept
 
 
@@ -189,6 +192,81 @@ class testBeamClass(unittest.TestCase):
         self.assertAlmostEqual(self.beam.mean_dE, 0., delta=1e-2,
                                msg='Beam: Failed statistic mean_dE')
 
+    def test_beam_statistic_lost(self):
+
+        self.beam.dt[:] = 2e-6 + 1e-9*numpy.random.randn(
+            self.beam.n_macroparticles)
+        self.beam.dE[:] = 1e6*numpy.random.randn(self.beam.n_macroparticles)
+        self.beam.id[::3] = 0
+        alive = self.beam.id != 0
+        dt = self.beam.dt[alive]
+        dE = self.beam.dE[alive]
+
+        self.beam.statistics()
+
+        self.assertEqual(self.beam.n_macroparticles_alive, len(dt))
+        self.assertAlmostEqual(self.beam.mean_dt, numpy.mean(dt),
+                               delta=1e-20)
+        self.assertAlmostEqual(self.beam.sigma_dt, numpy.std(dt),
+                               delta=1e-9*numpy.std(dt))
+        self.assertAlmostEqual(self.beam.mean_dE, numpy.mean(dE), delta=1e-6)
+        self.assertAlmostEqual(self.beam.sigma_dE, numpy.std(dE),
+                               delta=1e-9*numpy.std(dE))
+        self.assertAlmostEqual(self.beam._sumsq_dE, numpy.dot(dE, dE),
+                               delta=1e-12*numpy.dot(dE, dE))
+        self.assertEqual(self.beam.min_dt, numpy.min(dt))
+        self.assertEqual(self.beam.max_dt, numpy.max(dt))
+        self.assertEqual(self.beam.min_dE, numpy.min(dE))
+        self.assertEqual(self.beam.max_dE, numpy.max(dE))
+
+    def test_statistics_multibunch(self):
+
+        n_bunches = 4
+        n_per_bunch = self.beam.n_macroparticles // n_bunches
+        bucket = 2.5e-9
+        spacing = 10
+        for k in range(n_bunches):
+            block = slice(k*n_per_bunch, (k+1)*n_per_bunch)
+            self.beam.dt[block] = (k*spacing + 0.5)*bucket + \
+                (k+1)*4e-11*numpy.random.randn(n_per_bunch)
+            self.beam.dE[block] = k*1e6 + 1e6*numpy.random.randn(n_per_bunch)
+        self.beam.id[::7] = 0
+
+        with self.assertRaises(RuntimeError):
+            self.beam.statistics_multibunch(n_bunches)
+
+        # From the RF buckets
+        self.beam.statistics_multibunch(n_bunches, spacing, bucket)
+        for k in range(n_bunches):
+            block = slice(k*n_per_bunch, (k+1)*n_per_bunch)
+            dt = self.beam.dt[block][self.beam.id[block] != 0]
+            dE = self.beam.dE[block][self.beam.id[block] != 0]
+            self.assertEqual(self.beam.bunch_n_macroparticles_alive[k],
+                             len(dt))
+            self.assertAlmostEqual(self.beam.bunch_mean_dt[k],
+                                   numpy.mean(dt), delta=1e-20)
+            self.assertAlmostEqual(self.beam.bunch_sigma_dt[k],
+                                   numpy.std(dt), delta=1e-9*numpy.std(dt))
+            self.assertAlmostEqual(self.beam.bunch_mean_dE[k],
+                                   numpy.mean(dE), delta=1e-6)
+            self.assertAlmostEqual(self.beam.bunch_sigma_dE[k],
+                                   numpy.std(dE), delta=1e-9*numpy.std(dE))
+        numpy.testing.assert_allclose(
+            self.beam.bunch_epsn_rms_l,
+            numpy.pi*self.beam.bunch_sigma_dt*self.beam.bunch_sigma_dE)
+
+        # From the stored bunch ids, after shuffling the particles
+        self.beam.bunch_id = numpy.repeat(
+            numpy.arange(n_bunches, dtype=numpy.int32), n_per_bunch)
+        reference = numpy.copy(self.beam.bunch_mean_dE)
+        order = numpy.random.permutation(self.beam.n_macroparticles)
+        self.beam.dt = self.beam.dt[order]
+        self.beam.dE = self.beam.dE[order]
+        self.beam.id = self.beam.id[order]
+        self.beam.statistics_multibunch(n_bunches)
+        numpy.testing.assert_allclose(self.beam.bunch_mean_dE, reference,
+                                      rtol=1e-9)
+
     def test_losses_separatrix(self):
 
         longitudinal_tracker = RingAndRFTracker(self.rf_params, self.beam)
@@ -266,6 +344,108 @@ class testBeamClass(unittest.TestCase):
                          self.beam.n_macroparticles,
                          msg='Beam: Failed losses_energy_cut, second')
 
+    def test_losses_aperture(self):
+
+        self.beam.dt[:] = 2.5e-9*numpy.random.rand(self.beam.n_macroparticles)
+        self.beam.dE[:] = 1e9*numpy.random.randn(self.beam.n_macroparticles)
+        self.beam.id[::5] = 0
+        self.beam.recount_alive()
+
+        dt, dE = self.beam.dt, self.beam.dE
+        kept = (self.beam.id != 0) & (dt >= 0.5e-9) & (dt <= 2e-9) \
+            & (dE >= -1e9) & (dE <= 5e8) \
+            & is_in_separatrix(self.general_params, self.rf_params,
+                               self.beam, dt, dE)
+        self.assertTrue(0 < numpy.count_nonzero(kept) <
+                        self.beam.n_macroparticles_alive)
+
+        self.beam.losses_aperture(0.5e-9, 2e-9, -1e9, 5e8,
+                                  self.general_params, self.rf_params)
+        numpy.testing.assert_array_equal(self.beam.id != 0, kept)
+        self.assertEqual(self.beam.n_macroparticles_alive,
+                         numpy.count_nonzero(kept))
+
+    def _potential_well_hamiltonian(self, rf_params, dt, dE):
+        # Direct evaluation of the Hamiltonian of the total potential of the
+        # RF systems, with the normalisation of potential_well_generation;
+        # without acceleration the potential is periodic in dt
+        voltage = rf_params.voltage[:, 0, numpy.newaxis]
+        omega_rf = rf_params.omega_rf[:, 0, numpy.newaxis]
+        phi_rf = rf_params.phi_rf[:, 0, numpy.newaxis]
+        eom_factor_potential = numpy.sign(rf_params.eta_0[0]) * \
+            rf_params.charge / rf_params.t_rev[0]
+        eom_factor_dE = abs(rf_params.eta_0[0]) / \
+            (2*rf_params.beta[0]**2*rf_params.energy[0])
+
+        def potential(time):
+            return eom_factor_potential * numpy.sum(
+                voltage/omega_rf * numpy.cos(omega_rf*time + phi_rf), axis=0)
+
+        potential_period = potential(numpy.linspace(
+            0, 2*numpy.pi/numpy.min(omega_rf), 100001))
+        hamiltonian = eom_factor_dE*dE**2 + potential(dt)
+
+        return hamiltonian, numpy.max(potential_period), \
+            numpy.min(potential_period)
+
+    def _check_losses_potential_well(self, rf_params):
+
+        full_ring = FullRingAndRF([RingAndRFTracker(rf_params, self.beam)])
+        separatrix = PotentialWellSeparatrix(full_ring)
+        self.beam.losses_aperture(PotentialWellSeparatrix=separatrix)
+
+        hamiltonian, hamiltonian_sep, potential_min = \
+            self._potential_well_hamiltonian(rf_params, self.beam.dt,
+                                             self.beam.dE)
+        # Exact away from the separatrix, where the tabulated potential well
+        # is interpolated
+        away = numpy.abs(hamiltonian - hamiltonian_sep) > \
+            1e-4*(hamiltonian_sep - potential_min)
+        self.assertGreater(numpy.count_nonzero(away),
+                           0.99*self.beam.n_macroparticles)
+        kept = hamiltonian < hamiltonian_sep
+        self.assertGreater(numpy.count_nonzero(kept), 0)
+        self.assertGreater(numpy.count_nonzero(~kept), 0)
+        numpy.testing.assert_array_equal((self.beam.id != 0)[away],
+                                         kept[away])
+        self.assertEqual(self.beam.n_macroparticles_alive,
+                         numpy.count_nonzero(self.beam.id))
+
+        return separatrix, kept, away
+
+    def test_losses_potential_well(self):
+
+        numpy.random.seed(1)
+        self.beam.dt[:] = -5e-9 + 15e-9*numpy.random.rand(
+            self.beam.n_macroparticles)
+        self.beam.dE[:] = 1e9*numpy.random.randn(self.beam.n_macroparticles)
+        kept_single_rf = is_in_separatrix(self.general_params, self.rf_params,
+                                          self.beam, self.beam.dt,
+                                          self.beam.dE)
+
+        separatrix, kept, away = self._check_losses_potential_well(
+            self.rf_params)
+        numpy.testing.assert_array_equal(kept_single_rf[away], kept[away])
+
+        # The table is only recomputed when the RF program changes
+        self.assertFalse(separatrix.update())
+        self.rf_params.voltage[0, 0] = 6e6
+        self.assertTrue(separatrix.update())
+        self.assertFalse(separatrix.update())
+
+    def test_losses_potential_well_double_rf(self):
+
+        # Bunch lengthening mode of a fourth harmonic RF system
+        rf_params = RFStation(self.general_params, [4620, 4*4620],
+                              [7e6, 0.25*7e6], [0., 0.], n_rf=2)
+
+        numpy.random.seed(1)
+        self.beam.dt[:] = -5e-9 + 15e-9*numpy.random.rand(
+            self.beam.n_macroparticles)
+        self.beam.dE[:] = 1e9*numpy.random.randn(self.beam.n_macroparticles)
+
+        self._check_losses_potential_well(rf_params)
+
     def test_addition(self):
         np = numpy
 
@@ -326,6 +506,210 @@ class testBeamClass(unittest.TestCase):
         with self.assertRaises(TypeError, msg='Wrong type should raise exception'):
             self.beam.add_beam(([1], [2]))
 
+    def test_addition_storage(self):
+
+        n_macroparticles = self.beam.n_macroparticles
+        batch = Beam(self.general_params, 1000, 0)
+        batch.id[::2] = 0
+
+        self.beam.reserve(n_macroparticles + 4*batch.n_macroparticles)
+        buffer = self.beam.dt.ctypes.data
+        for k in range(4):
+            self.beam.add_beam(batch)
+        self.assertEqual(self.beam.dt.ctypes.data, buffer)
+        self.assertEqual(self.beam.n_macroparticles,
+                         n_macroparticles + 4*batch.n_macroparticles)
+        self.assertEqual(self.beam.n_macroparticles_alive,
+                         n_macroparticles + 2*batch.n_macroparticles)
+        expected = numpy.arange(n_macroparticles + 1,
+                                self.beam.n_macroparticles + 1)
+        expected[::2] = 0
+        numpy.testing.assert_array_equal(self.beam.id[n_macroparticles:],
+                                         expected)
+
+        # New ids do not reuse the ids of eliminated particles
+        self.beam.id[:10] = 0
+        self.beam.recount_alive()
+        self.beam.eliminate_lost_particles()
+        self.beam.add_particles([[0.], [0.]])
+        self.assertEqual(self.beam.id[-1], n_macroparticles +
+                         4*batch.n_macroparticles + 1)
+        self.assertEqual(len(numpy.unique(self.beam.id[self.beam.id != 0])),
+                         self.beam.n_macroparticles_alive)
+
+    def test_inject(self):
+
+        self.beam.dt[:] = numpy.linspace(1e-9, 2e-9, self.beam.n_macroparticles)
+        self.beam.bunch_id = numpy.zeros(self.beam.n_macroparticles,
+                                         dtype=numpy.int32)
+        profile = Profile(self.beam, CutOptions(cut_left=0, cut_right=5e-9,
+                                                n_slices=50))
+        profile.track()
+        self.assertEqual(numpy.sum(profile.n_macroparticles),
+                         self.beam.n_macroparticles)
+
+        batch = Beam(self.general_params, 1000,
+                     self.beam.ratio * 1000)
+        batch.dt[:] = numpy.linspace(6e-9, 7e-9, batch.n_macroparticles)
+        batch.bunch_id = numpy.zeros(batch.n_macroparticles,
+                                     dtype=numpy.int32)
+        intensity = self.beam.intensity + batch.intensity
+        n_macroparticles = self.beam.n_macroparticles
+
+        self.beam.inject(batch, profile, cut_right=10e-9)
+        self.assertAlmostEqual(self.beam.intensity, intensity)
+        self.assertEqual(profile.cut_right, 10e-9)
+        self.assertEqual(numpy.sum(profile.n_macroparticles),
+                         self.beam.n_macroparticles)
+        numpy.testing.assert_array_equal(
+            self.beam.bunch_id[n_macroparticles:], 1)
+
+        self.beam.statistics_multibunch(2)
+        numpy.testing.assert_array_equal(
+            self.beam.bunch_n_macroparticles_alive,
+            [n_macroparticles, batch.n_macroparticles])
+
+        with self.assertRaises(blExcept.ParticleAdditionError):
+            self.beam.inject(Beam(self.general_params, 10, 1e9))
+
+    def test_alive_counter(self):
+
+        self.assertEqual(self.beam.n_macroparticles_alive, int(2e6))
+
+        self.beam.dt[:] = numpy.linspace(0, 10e-9, self.beam.n_macroparticles)
+        self.beam.losses_longitudinal_cut(0., 5e-9)
+        n_alive = numpy.count_nonzero(self.beam.id)
+        self.assertEqual(self.beam.n_macroparticles_alive, n_alive)
+
+        # Particles already lost are not counted twice
+        self.beam.losses_longitudinal_cut(0., 4e-9)
+        n_alive = numpy.count_nonzero(self.beam.id)
+        self.assertEqual(self.beam.n_macroparticles_alive, n_alive)
+        self.assertEqual(self.beam.n_macroparticles_lost,
+                         self.beam.n_macroparticles - n_alive)
+
+        self.beam.id[:10] = 0
+        self.beam.recount_alive()
+        self.assertEqual(self.beam.n_macroparticles_alive, n_alive - 10)
+
+    def test_eliminate_lost_particles(self):
+
+        n_macroparticles = self.beam.n_macroparticles
+        self.beam.dt[:] = numpy.linspace(0, 10e-9, n_macroparticles)
+        self.beam.dE[:] = numpy.linspace(-1e6, 1e6, n_macroparticles)
+        buffer = self.beam.dt.ctypes.data
+
+        self.beam.losses_longitudinal_cut(1e-9, 10e-9)
+        alive = self.beam.id != 0
+        dt_alive = self.beam.dt[alive]
+        dE_alive = self.beam.dE[alive]
+        id_alive = self.beam.id[alive]
+
+        # Below the threshold: nothing done
+        self.beam.eliminate_lost_particles(min_lost_fraction=0.5)
+        self.assertEqual(self.beam.n_macroparticles, n_macroparticles)
+
+        self.beam.eliminate_lost_particles()
+        self.assertEqual(self.beam.n_macroparticles, len(id_alive))
+        self.assertEqual(self.beam.dt.ctypes.data, buffer)
+        numpy.testing.assert_array_equal(self.beam.dt, dt_alive)
+        numpy.testing.assert_array_equal(self.beam.dE, dE_alive)
+        numpy.testing.assert_array_equal(self.beam.id, id_alive)
+        self.assertEqual(self.beam.n_macroparticles_alive, len(id_alive))
+        self.assertEqual(self.beam.n_macroparticles_lost,
+                         n_macroparticles - len(id_alive))
+
+        self.beam.statistics()
+        self.assertAlmostEqual(self.beam.mean_dt, numpy.mean(dt_alive),
+                               delta=1e-20)
+
+        self.beam.losses_longitudinal_cut(20e-9, 30e-9)
+        with self.assertRaises(RuntimeError):
+            self.beam.eliminate_lost_particles()
+
+    def test_compact_id(self):
+
+        beam = Beam(self.general_params, self.beam.n_macroparticles,
+                    self.beam.intensity, id_dtype=numpy.uint32)
+        self.assertEqual(beam.id.dtype, numpy.uint32)
+        numpy.testing.assert_array_equal(beam.id, self.beam.id)
+
+        for b in (self.beam, beam):
+            b.dt[:] = numpy.linspace(0, 10e-9, b.n_macroparticles)
+            b.dE[:] = numpy.linspace(-1e6, 1e6, b.n_macroparticles)
+            b.losses_longitudinal_cut(1e-9, 9e-9)
+            b.losses_energy_cut(-0.5e6, 1e6)
+            b.statistics()
+            b.sort_by_bin(0, 10e-9, 100)
+            b.statistics_multibunch(2, bucket_size_tau=5e-9)
+        numpy.testing.assert_array_equal(beam.id, self.beam.id)
+        self.assertEqual(beam.n_macroparticles_alive,
+                         self.beam.n_macroparticles_alive)
+        self.assertEqual(beam.mean_dt, self.beam.mean_dt)
+        self.assertEqual(beam.sigma_dE, self.beam.sigma_dE)
+        numpy.testing.assert_array_equal(beam.bunch_mean_dt,
+                                         self.beam.bunch_mean_dt)
+
+        beam.eliminate_lost_particles()
+        self.assertEqual(beam.id.dtype, numpy.uint32)
+        self.assertEqual(beam.n_macroparticles,
+                         self.beam.n_macroparticles_alive)
+
+        beam.add_particles([[1e-9], [0.]])
+        self.assertEqual(beam.id.dtype, numpy.uint32)
+        self.assertEqual(beam.id[-1], beam.n_macroparticles +
+                         beam.n_macroparticles_eliminated)
+
+        with self.assertRaises(TypeError):
+            Beam(self.general_params, 10, 1e9, id_dtype=numpy.int16)
+
+
+
+class testEnsembleBeamClass(unittest.TestCase):
+
+    # Run before every test
+    def setUp(self):
+
+        C = 6911.5038  # Machine circumference [m]
+        p = 450e9  # Synchronous momentum [eV/c]
+        gamma_t = 17.95142852  # Transition gamma
+        alpha = 1./gamma_t**2  # First order mom. comp. factor
+
+        self.general_params = Ring(C, alpha, p, Proton(), 10)
+        self.ensemble = EnsembleBeam(self.general_params, 4, 10000,
+                                     [1e9, 2e9, 3e9, 4e9])
+
+    def test_shapes(self):
+
+        self.assertEqual(self.ensemble.dt.shape, (4, 10000))
+        self.assertEqual(self.ensemble.id.shape, (4, 10000))
+        numpy.testing.assert_array_equal(self.ensemble.ratio,
+                                         [1e5, 2e5, 3e5, 4e5])
+
+    def test_statistics(self):
+
+        beams = []
+        for k in range(self.ensemble.n_ensemble):
+            beam = Beam(self.general_params, 10000, 1e9)
+            beam.dt[:] = (k+1)*numpy.random.randn(10000)
+            beam.dE[:] = k + numpy.random.randn(10000)
+            beam.id[:k] = 0
+            self.ensemble.set_member(k, beam)
+            beam.statistics()
+            beams.append(beam)
+
+        self.ensemble.statistics()
+        numpy.testing.assert_array_equal(self.ensemble.n_macroparticles_lost,
+                                         [0, 1, 2, 3])
+        for k, beam in enumerate(beams):
+            self.assertAlmostEqual(self.ensemble.mean_dt[k], beam.mean_dt)
+            self.assertAlmostEqual(self.ensemble.mean_dE[k], beam.mean_dE)
+            self.assertAlmostEqual(self.ensemble.sigma_dt[k], beam.sigma_dt)
+            self.assertAlmostEqual(self.ensemble.sigma_dE[k], beam.sigma_dE)
+
+        with self.assertRaises(RuntimeError):
+            self.ensemble.set_member(0, Beam(self.general_params, 10, 1e9))
+
 
 if __name__ == '__main__':
 
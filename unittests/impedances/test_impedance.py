@@ -16,8 +16,14 @@ Unittest for impedances.impedance
 import unittest
 import numpy as np
 
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
 from blond.beam.profile import Profile, CutOptions
-from blond.impedances.impedance import InducedVoltageFreq, InducedVoltageTime
+from blond.beam.sparse_slices import SparseSlices
+from blond.utils import bmath as bm
+from blond.impedances.impedance import InducedVoltageFreq, InducedVoltageTime, \
+    TotalInducedVoltage
 from blond.impedances.impedance_sources import Resonators
 
 class TestInducedVoltageFreq(unittest.TestCase):
@@ -120,6 +126,184 @@ class TestInducedVoltageTime(unittest.TestCase):
         np.testing.assert_allclose(test_object.wake_length_input, 11e-9)
 
 
+
+class TestReprocess(unittest.TestCase):
+
+    def setUp(self):
+
+        self.profile = Profile(None, 
+           CutOptions=CutOptions(cut_left=0, cut_right=5e-9, n_slices=16))
+        self.impedance_source = Resonators([4.5e6], [200.222e6], [200])
+
+    def move_cuts(self, cut_left, cut_right, n_slices=16):
+        cut_options = self.profile.cut_options
+        cut_options.cut_left = cut_left
+        cut_options.cut_right = cut_right
+        cut_options.n_slices = n_slices
+        cut_options.set_cuts()
+        self.profile.set_slices_parameters()
+
+    def test_shifted_frame(self):
+        freq_object = InducedVoltageFreq(
+                None, self.profile, [self.impedance_source])
+        time_object = InducedVoltageTime(
+                None, self.profile, [self.impedance_source])
+        total_object = TotalInducedVoltage(
+                None, self.profile, [freq_object, time_object])
+        total_impedance = freq_object.total_impedance
+        total_wake = time_object.total_wake
+
+        # Same slicing in another position: nothing is recomputed
+        self.move_cuts(1.3e-9, 6.3e-9)
+        total_object.reprocess()
+        self.assertIs(freq_object.total_impedance, total_impedance)
+        self.assertIs(time_object.total_wake, total_wake)
+        self.assertIs(total_object.time_array, self.profile.bin_centers)
+
+        # New bin size
+        self.move_cuts(0, 6e-9)
+        total_object.reprocess()
+        self.assertIsNot(freq_object.total_impedance, total_impedance)
+        self.assertIsNot(time_object.total_wake, total_wake)
+
+        # Same as a full reprocessing
+        total_impedance = freq_object.total_impedance.copy()
+        self.move_cuts(2e-9, 8e-9)
+        total_object.reprocess(full=True)
+        np.testing.assert_allclose(freq_object.total_impedance,
+                                   total_impedance)
+
+    def test_multi_turn_wake_memory(self):
+        test_object = InducedVoltageTime(
+                None, self.profile, [self.impedance_source],
+                multi_turn_wake=True, mtw_mode='time')
+        memory = np.arange(16, dtype=float)
+        test_object.mtw_memory = memory.copy()
+
+        # The memory follows the frame, shifted by two bins
+        self.move_cuts(2*5e-9/16, 5e-9 + 2*5e-9/16)
+        test_object.reprocess()
+        np.testing.assert_allclose(test_object.mtw_memory[:14], memory[2:])
+        np.testing.assert_allclose(test_object.mtw_memory[14:], 0,
+                                   atol=1e-12)
+
+
+class TestSparseSlices(unittest.TestCase):
+
+    n_slices = 64
+
+    def setUp(self):
+        ring = Ring(6911.5038, 1/17.95142852**2, 450e9, Proton(), 10)
+        self.rf = RFStation(ring, [4620], [7e6], [0.])
+        self.t_rf = 2*np.pi / self.rf.omega_rf[0, 0]
+        self.filling_pattern = np.zeros(20, dtype=bool)
+        self.filling_pattern[[2, 3, 7, 12]] = True
+
+        # One bunch in the centre of each filled bucket
+        self.beam = Beam(ring, 40000, 1e11)
+        np.random.seed(1)
+        buckets = np.where(self.filling_pattern)[0]
+        self.beam.dt[:] = (np.repeat(buckets, 10000) + 0.5) * self.t_rf \
+            + np.random.randn(40000) * self.t_rf / 12
+
+        # Dense profile from the first to the last filled bucket
+        self.profile = Profile(self.beam, CutOptions(
+            cut_left=2*self.t_rf, cut_right=13*self.t_rf,
+            n_slices=11*self.n_slices))
+        self.profile.track()
+        self.rows = buckets - 2
+
+    def sparse(self, n_coarse_slices):
+        sparse = SparseSlices(self.rf, self.beam, self.n_slices,
+                              self.filling_pattern, tracker='onebyone',
+                              n_coarse_slices=n_coarse_slices)
+        sparse.track()
+        return sparse
+
+    def test_induced_voltage(self):
+        resonators = Resonators([1e6, 3e5], [0.4e9, 1.3e9], [5, 20])
+        dense = InducedVoltageTime(self.beam, self.profile, [resonators])
+        dense.induced_voltage_generation()
+        reference = dense.induced_voltage.reshape(11, -1)[self.rows]
+
+        # Without coarsening, same as the dense profile
+        sparse = self.sparse(None)
+        test_object = InducedVoltageTime(self.beam, sparse, [resonators])
+        test_object.induced_voltage_generation()
+        self.assertEqual(test_object.induced_voltage.shape, (4, 64))
+        np.testing.assert_allclose(test_object.induced_voltage, reference,
+                                   atol=1e-9*np.max(np.abs(reference)))
+
+        # Coarse coupling between bunches for a long-range wake, on the
+        # bunches; frequency resolution finer than the decay of the wake
+        resonators = Resonators([1e6], [0.2e9], [2000])
+        dense = InducedVoltageTime(self.beam, self.profile, [resonators])
+        dense.induced_voltage_generation()
+        reference = dense.induced_voltage.reshape(11, -1)[self.rows]
+        sparse = self.sparse(32)
+        for test_object in [
+                InducedVoltageTime(self.beam, sparse, [resonators]),
+                InducedVoltageFreq(self.beam, sparse, [resonators],
+                                   frequency_resolution=1e4)]:
+            test_object.induced_voltage_generation()
+            np.testing.assert_allclose(test_object.induced_voltage[:, 16:48],
+                                       reference[:, 16:48],
+                                       atol=0.01*np.max(np.abs(reference)))
+
+    def test_induced_voltage_fftw(self):
+        resonators = Resonators([1e6], [0.2e9], [2000])
+        sparse = self.sparse(32)
+        test_objects = [InducedVoltageTime(self.beam, sparse, [resonators]),
+                        InducedVoltageFreq(self.beam, sparse, [resonators],
+                                           frequency_resolution=1e4)]
+        references = []
+        for test_object in test_objects:
+            test_object.induced_voltage_generation()
+            references.append(test_object.induced_voltage.copy())
+
+        # The FFTs of FFTW are 1D only
+        bm.use_fftw()
+        try:
+            for test_object, reference in zip(test_objects, references):
+                try:
+                    test_object.process()
+                    test_object.induced_voltage_generation()
+                except AttributeError:
+                    self.skipTest('Not compiled with FFTW')
+                np.testing.assert_allclose(
+                    test_object.induced_voltage, reference,
+                    atol=1e-9*np.max(np.abs(reference)))
+        finally:
+            bm.update_active_dict(bm._CPU_func_dict)
+
+    def test_track(self):
+        resonators = Resonators([1e6], [0.4e9], [5])
+        sparse = self.sparse(8)
+        total_object = TotalInducedVoltage(
+            self.beam, sparse, [InducedVoltageTime(self.beam, sparse,
+                                                   [resonators])])
+        dE = self.beam.dE.copy()
+        total_object.track()
+
+        # Kick of the voltage of its bucket on each particle
+        voltage = total_object.induced_voltage
+        self.assertEqual(voltage.shape, (4, 64))
+        for i, profile in enumerate(sparse.slices_array):
+            inside = (self.beam.dt > profile.bin_centers[0]) \
+                & (self.beam.dt < profile.bin_centers[-1])
+            np.testing.assert_allclose(
+                self.beam.dE[inside] - dE[inside],
+                self.beam.Particle.charge * np.interp(
+                    self.beam.dt[inside], profile.bin_centers, voltage[i]),
+                rtol=1e-6, atol=1e-9*np.max(np.abs(voltage)))
+
+        with self.assertRaises(RuntimeError):
+            self.sparse(5)
+        with self.assertRaises(RuntimeError):
+            InducedVoltageTime(self.beam, sparse, [resonators],
+                               multi_turn_wake=True)
+
+
 if __name__ == '__main__':
 
     unittest.main()
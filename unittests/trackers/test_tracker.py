@@ -21,11 +21,16 @@ import matplotlib.pyplot as plt
 from blond.utils import bmath as bm
 from blond.input_parameters.ring import Ring
 from blond.input_parameters.rf_parameters import RFStation
-from blond.trackers.tracker import RingAndRFTracker
-from blond.beam.beam import Beam, Proton
+from blond.trackers.tracker import RingAndRFTracker, FullRingAndRF, \
+    EnsembleRingAndRFTracker, ChunkedRingAndRFTracker
+from blond.beam.beam import Beam, Proton, EnsembleBeam, ChunkedBeam
 from blond.beam.distributions import bigaussian
-from blond.beam.profile import CutOptions, FitOptions, Profile
+from blond.beam.profile import CutOptions, FitOptions, Profile, \
+    EnsembleProfile
 from blond.llrf.rf_modulation import PhaseModulation as PMod
+from blond.impedances.impedance import InducedVoltageTime, \
+    TotalInducedVoltage
+from blond.impedances.impedance_sources import Resonators
 import os
 
 
@@ -65,6 +70,42 @@ def orig_rf_volt_comp(tracker):
     return rf_voltage
 
 
+def orig_periodic_track(tracker):
+    """Periodic kick and drift with the index lists, as used before the
+    in-place kernel.
+
+    """
+
+    beam = tracker.beam
+    turn = tracker.counter[0]
+    t_rev = tracker.t_rev[turn + 1]
+
+    indices_right_outside = np.where(beam.dt > t_rev)[0]
+    indices_inside_frame = np.where(beam.dt < t_rev)[0]
+
+    beam.dt[indices_right_outside] -= t_rev
+    insiders_dt = np.ascontiguousarray(beam.dt[indices_inside_frame])
+    insiders_dE = np.ascontiguousarray(beam.dE[indices_inside_frame])
+    tracker.kick(insiders_dt, insiders_dE, turn)
+    tracker.drift(insiders_dt, insiders_dE, turn + 1)
+    beam.dt[indices_inside_frame] = insiders_dt
+    beam.dE[indices_inside_frame] = insiders_dE
+
+    indices_left_outside = np.where(beam.dt < 0)[0]
+    if len(indices_left_outside) > 0:
+        left_outsiders_dt = np.ascontiguousarray(
+            beam.dt[indices_left_outside])
+        left_outsiders_dE = np.ascontiguousarray(
+            beam.dE[indices_left_outside])
+        left_outsiders_dt += t_rev
+        tracker.kick(left_outsiders_dt, left_outsiders_dE, turn)
+        tracker.drift(left_outsiders_dt, left_outsiders_dE, turn + 1)
+        beam.dt[indices_left_outside] = left_outsiders_dt
+        beam.dE[indices_left_outside] = left_outsiders_dE
+
+    tracker.counter[0] += 1
+
+
 class TestRfVoltageCalc(unittest.TestCase):
     # Simulation parameters -------------------------------------------------------
     # Bunch parameters
@@ -125,6 +166,59 @@ class TestRfVoltageCalc(unittest.TestCase):
             self.long_tracker.rf_voltage, orig_rf_voltage, decimal=8)
 
 
+class TestRfVoltageCache(unittest.TestCase):
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_s = 450e9          # Synchronous momentum [eV/c]
+    h = 35640            # Harmonic number
+    V = 6e6              # RF voltage [V]
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Bunch parameters
+    N_b = 1e9            # Intensity
+    N_p = 10000          # Macro-particles
+    tau_0 = 0.4e-9       # Initial bunch length, 4 sigma [s]
+    # Tracking details
+    N_t = 100            # Number of turns to track
+
+    def setUp(self):
+        self.ring = Ring(self.C, self.alpha, self.p_s, Proton(), self.N_t)
+        self.rf = RFStation(self.ring, [self.h, 4*self.h],
+                            [self.V, 0.1*self.V], [0, np.pi], n_rf=2)
+        self.beam = Beam(self.ring, self.N_p, self.N_b)
+        bigaussian(self.ring, self.rf, self.beam, self.tau_0/4, seed=1)
+        self.profile = Profile(self.beam, CutOptions(
+            n_slices=100, cut_left=0, cut_right=self.rf.t_rf[0, 0]))
+        self.long_tracker = RingAndRFTracker(self.rf, self.beam,
+                                             Profile=self.profile)
+
+    def test_unchanged_rf(self):
+        self.long_tracker.rf_voltage_calculation()
+        rf_voltage = self.long_tracker.rf_voltage
+        self.long_tracker.rf_voltage_calculation()
+        self.assertIs(self.long_tracker.rf_voltage, rf_voltage)
+
+        # A change of the profile grid invalidates the waveform
+        self.profile.cut_right *= 0.5
+        self.profile.set_slices_parameters()
+        self.long_tracker.rf_voltage_calculation()
+        np.testing.assert_almost_equal(
+            self.long_tracker.rf_voltage,
+            orig_rf_volt_comp(self.long_tracker), decimal=8)
+
+    def test_phase_and_voltage_change(self):
+        np.random.seed(1)
+        for i in range(self.N_t):
+            self.rf.phi_rf[:, i] += 1e-2*np.random.randn(2)
+            self.rf.voltage[:, i] *= 1 + 1e-3*np.random.randn()
+            self.profile.track()
+            self.long_tracker.rf_voltage_calculation()
+            np.testing.assert_almost_equal(
+                self.long_tracker.rf_voltage,
+                orig_rf_volt_comp(self.long_tracker), decimal=8)
+            self.long_tracker.track()
+
+
 class CavityFB:
     V_corr = 0
     phi_corr = 0
@@ -250,6 +344,642 @@ class TestRfVoltageCalcWCavityFB(unittest.TestCase):
                 """Phi modulation not added correctly in tracker""")
 
 
+
+class TestTrackTurns(unittest.TestCase):
+    # Simulation parameters -------------------------------------------------------
+    # Bunch parameters
+    N_b = 1e9           # Intensity
+    N_p = 10000         # Macro-particles
+    tau_0 = 0.4e-9          # Initial bunch length, 4 sigma [s]
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_i = 450e9         # Synchronous momentum [eV/c]
+    p_f = 450.1e9      # Synchronous momentum, final
+    h = 35640            # Harmonic number
+    V = 6e6                # RF voltage [V]
+    dphi = 0             # Phase modulation/offset
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Tracking details
+    N_t = 200           # Number of turns to track
+
+    def _trackers(self, solver='simple'):
+        ring = Ring(self.C, self.alpha, np.linspace(
+            self.p_i, self.p_f, self.N_t + 1), Proton(), self.N_t)
+        phiMod = PMod(np.linspace(0, 0.2, 10000), 2E3, 0.1, 0, self.h)
+        trackers = []
+        for i in range(2):
+            rf = RFStation(ring, [self.h, 2*self.h],
+                           [self.V * np.linspace(1, 1.1, self.N_t+1),
+                            0.1*self.V * np.ones(self.N_t+1)],
+                           [self.dphi, np.pi], n_rf=2,
+                           phi_modulation=phiMod)
+            beam = Beam(ring, self.N_p, self.N_b)
+            bigaussian(ring, rf, beam, self.tau_0/4, seed=1)
+            trackers.append(RingAndRFTracker(rf, beam, solver=solver))
+        return trackers
+
+    def test_simple_solver(self):
+        reference, tracker = self._trackers('simple')
+        for i in range(self.N_t):
+            reference.track()
+        tracker.track_turns(50)
+        tracker.track_turns(self.N_t - 50)
+
+        np.testing.assert_array_equal(tracker.beam.dt, reference.beam.dt)
+        np.testing.assert_array_equal(tracker.beam.dE, reference.beam.dE)
+        np.testing.assert_array_equal(tracker.phi_rf, reference.phi_rf)
+        np.testing.assert_array_equal(tracker.omega_rf, reference.omega_rf)
+        self.assertEqual(tracker.counter[0], reference.counter[0])
+        self.assertEqual(tracker.beam.energy, reference.beam.energy)
+
+    def test_exact_solver(self):
+        reference, tracker = self._trackers('exact')
+        for i in range(self.N_t):
+            reference.track()
+        tracker.track_turns(self.N_t)
+
+        np.testing.assert_allclose(tracker.beam.dt, reference.beam.dt,
+                                   rtol=1e-6, atol=1e-15)
+        np.testing.assert_allclose(tracker.beam.dE, reference.beam.dE,
+                                   rtol=1e-6, atol=1e2)
+
+    def test_exceptions(self):
+        reference, tracker = self._trackers()
+        with self.assertRaises(RuntimeError):
+            tracker.track_turns(self.N_t + 1)
+        tracker.periodicity = True
+        with self.assertRaises(RuntimeError):
+            tracker.track_turns(1)
+
+
+
+class TestPeriodicity(unittest.TestCase):
+    # Machine and RF parameters
+    C = 6911.56          # Machine circumference [m]
+    p = 25.92e9          # Synchronous momentum [eV/c]
+    h = 4620             # Harmonic number
+    V = 0.9e6            # RF voltage [V]
+    gamma_t = 22.83      # Transition gamma
+    # Tracking details
+    N_t = 20             # Number of turns to track
+    N_p = 20000          # Macro-particles
+
+    def setUp(self):
+        self.ring = Ring(self.C, 1./self.gamma_t**2, self.p, Proton(),
+                         self.N_t)
+
+    def _beam(self):
+        beam = Beam(self.ring, self.N_p, 1e10)
+        np.random.seed(1)
+        # Coasting beam overlapping both edges of the frame
+        beam.dt[:] = np.random.uniform(-0.05, 1.05, self.N_p) * \
+            self.ring.t_rev[0]
+        beam.dE[:] = np.random.normal(0, 1e8, self.N_p)
+        return beam
+
+    def test_periodic_kick_drift(self):
+        for solver in ['simple', 'exact']:
+            reference = RingAndRFTracker(
+                RFStation(self.ring, [self.h], [self.V], [0.]), self._beam(),
+                solver=solver, periodicity=True)
+            tracker = RingAndRFTracker(
+                RFStation(self.ring, [self.h], [self.V], [0.]), self._beam(),
+                solver=solver, periodicity=True)
+            for i in range(self.N_t):
+                orig_periodic_track(reference)
+                tracker.track()
+
+            np.testing.assert_allclose(tracker.beam.dt, reference.beam.dt,
+                                       rtol=1e-12, atol=1e-18)
+            np.testing.assert_allclose(tracker.beam.dE, reference.beam.dE,
+                                       rtol=1e-12, atol=1e-3)
+
+
+
+class TestFusedSlicing(unittest.TestCase):
+    # Simulation parameters -------------------------------------------------------
+    # Bunch parameters
+    N_b = 1e9           # Intensity
+    N_p = 50000         # Macro-particles
+    tau_0 = 0.4e-9          # Initial bunch length, 4 sigma [s]
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_i = 450e9         # Synchronous momentum [eV/c]
+    p_f = 450.1e9      # Synchronous momentum, final
+    h = 35640            # Harmonic number
+    V = 6e6                # RF voltage [V]
+    dphi = 0             # Phase modulation/offset
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Tracking details
+    N_t = 100           # Number of turns to track
+
+    def _tracker(self, solver, fused_slicing):
+        ring = Ring(self.C, self.alpha, np.linspace(
+            self.p_i, self.p_f, self.N_t + 1), Proton(), self.N_t)
+        rf = RFStation(ring, [self.h], self.V * np.ones(self.N_t+1),
+                       [self.dphi])
+        beam = Beam(ring, self.N_p, self.N_b)
+        bigaussian(ring, rf, beam, self.tau_0/4, seed=1)
+        profile = Profile(beam, CutOptions(n_slices=100, cut_left=0,
+                                           cut_right=rf.t_rf[0, 0]),
+                          FitOptions(fit_option='rms'))
+        profile.track()
+        return RingAndRFTracker(rf, beam, solver=solver, interpolation=True,
+                                Profile=profile, fused_slicing=fused_slicing)
+
+    def test_fused_slicing(self):
+        for solver in ['simple', 'exact']:
+            reference = self._tracker(solver, False)
+            tracker = self._tracker(solver, True)
+            for i in range(self.N_t):
+                reference.track()
+                reference.profile.track()
+                tracker.track()
+
+            np.testing.assert_allclose(tracker.beam.dt, reference.beam.dt,
+                                       rtol=1e-12, atol=1e-21)
+            np.testing.assert_allclose(tracker.beam.dE, reference.beam.dE,
+                                       rtol=1e-12, atol=1e-3)
+            np.testing.assert_array_equal(tracker.profile.n_macroparticles,
+                                          reference.profile.n_macroparticles)
+            self.assertEqual(tracker.profile.bunchLength,
+                             reference.profile.bunchLength)
+
+    def test_exceptions(self):
+        tracker = self._tracker('simple', False)
+        with self.assertRaises(RuntimeError):
+            RingAndRFTracker(tracker.rf_params, tracker.beam,
+                             Profile=tracker.profile, fused_slicing=True)
+
+
+class TestBatchedSections(unittest.TestCase):
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_s = 450e9          # Synchronous momentum [eV/c]
+    h = 35640            # Harmonic number
+    V = 6e6              # RF voltage [V]
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Bunch parameters
+    N_b = 1e9            # Intensity
+    N_p = 10000          # Macro-particles
+    tau_0 = 0.4e-9       # Initial bunch length, 4 sigma [s]
+    # Tracking details
+    N_t = 100            # Number of turns to track
+
+    def _full_ring(self, batched, solver='simple'):
+        ring = Ring([0.3*self.C, 0.7*self.C], [[self.alpha], [self.alpha]],
+                    [self.p_s*np.ones(self.N_t+1)]*2, Proton(), self.N_t,
+                    n_sections=2)
+        rf_1 = RFStation(ring, [self.h, 2*self.h],
+                         [0.4*self.V, 0.04*self.V], [0, np.pi], n_rf=2,
+                         section_index=1)
+        rf_2 = RFStation(ring, [self.h], [0.6*self.V], [0], n_rf=1,
+                         section_index=2)
+        beam = Beam(ring, self.N_p, self.N_b)
+        bigaussian(ring, rf_1, beam, self.tau_0/4, seed=1)
+        sections = [RingAndRFTracker(rf_1, beam, solver=solver),
+                    RingAndRFTracker(rf_2, beam, solver=solver)]
+        return FullRingAndRF(sections, batched=batched)
+
+    def _track(self, solver):
+        reference = self._full_ring(False, solver)
+        full_ring = self._full_ring(True, solver)
+        for i in range(self.N_t):
+            reference.track()
+            full_ring.track()
+        for section in full_ring.RingAndRFSection_list:
+            self.assertEqual(section.counter[0], self.N_t)
+        return (full_ring.RingAndRFSection_list[0].beam,
+                reference.RingAndRFSection_list[0].beam)
+
+    def test_simple_solver(self):
+        for solver in ['simple', 'legacy']:
+            beam, reference = self._track(solver)
+            np.testing.assert_array_equal(beam.dt, reference.dt)
+            np.testing.assert_array_equal(beam.dE, reference.dE)
+
+    def test_exact_solver(self):
+        beam, reference = self._track('exact')
+        np.testing.assert_allclose(beam.dt, reference.dt,
+                                   rtol=1e-9, atol=1e-18)
+        np.testing.assert_allclose(beam.dE, reference.dE,
+                                   rtol=1e-6, atol=1e0)
+
+    def test_exceptions(self):
+        full_ring = self._full_ring(False)
+        sections = full_ring.RingAndRFSection_list
+        sections[1].periodicity = True
+        with self.assertRaises(RuntimeError):
+            FullRingAndRF(sections, batched=True)
+        sections[1].periodicity = False
+        sections[1].solver = 'exact'
+        with self.assertRaises(RuntimeError):
+            FullRingAndRF(sections, batched=True)
+
+
+class TestTurnTable(unittest.TestCase):
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_i = 450e9          # Synchronous momentum [eV/c]
+    p_f = 450.1e9        # Synchronous momentum, final
+    h = 35640            # Harmonic number
+    V = 6e6              # RF voltage [V]
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Bunch parameters
+    N_b = 1e9            # Intensity
+    N_p = 10000          # Macro-particles
+    tau_0 = 0.4e-9       # Initial bunch length, 4 sigma [s]
+    # Tracking details
+    N_t = 10             # Number of turns to track
+
+    def setUp(self):
+        self.ring = Ring(self.C, self.alpha, np.linspace(
+            self.p_i, self.p_f, self.N_t + 1), Proton(), self.N_t)
+        self.rf = RFStation(self.ring, [self.h, 2*self.h],
+                            [self.V, 0.1*self.V], [0, np.pi], n_rf=2)
+        self.beam = Beam(self.ring, self.N_p, self.N_b)
+        bigaussian(self.ring, self.rf, self.beam, self.tau_0/4, seed=1)
+
+    def test_turn_table(self):
+        tracker = RingAndRFTracker(self.rf, self.beam)
+        table = tracker.turn_table
+        self.assertEqual(len(table), self.N_t + 1)
+        np.testing.assert_array_equal(table['t_rev'], self.rf.t_rev *
+                                      self.rf.length_ratio)
+        np.testing.assert_array_equal(table['energy'], self.rf.energy)
+        np.testing.assert_array_equal(table['acceleration_kick'][:-1],
+                                      - self.rf.delta_E)
+
+    def test_rebuild_turn_table(self):
+        tracker = RingAndRFTracker(self.rf, self.beam)
+        tracker.acceleration_kick[:] = 1e6
+        tracker.eta_0[:] *= 2
+
+        # The table is a snapshot of the parameters at construction
+        self.assertNotEqual(tracker.turn_table['acceleration_kick'][0], 1e6)
+        tracker.rebuild_turn_table()
+        np.testing.assert_array_equal(
+            tracker.turn_table['acceleration_kick'][:-1], 1e6)
+        np.testing.assert_array_equal(tracker.turn_table['eta_0'],
+                                      self.rf.eta_0)
+
+        dt, dE = self.beam.dt.copy(), self.beam.dE.copy()
+        tracker.kick(self.beam.dt, self.beam.dE, 0)
+        tracker.drift(self.beam.dt, self.beam.dE, 1)
+        bm.kick(dt, dE, self.rf.voltage[:, 0], self.rf.omega_rf[:, 0],
+                self.rf.phi_rf[:, 0], self.rf.Particle.charge, self.rf.n_rf,
+                1e6)
+        bm.drift(dt, dE, tracker.solver, self.rf.t_rev[1],
+                 self.rf.length_ratio, self.rf.alpha_order,
+                 self.rf.eta_0[1], self.rf.eta_1[1], self.rf.eta_2[1],
+                 self.rf.alpha_0[1], self.rf.alpha_1[1], self.rf.alpha_2[1],
+                 self.rf.beta[1], self.rf.energy[1])
+        np.testing.assert_allclose(self.beam.dt, dt, rtol=1e-12)
+        np.testing.assert_allclose(self.beam.dE, dE, rtol=1e-12, atol=1e-6)
+
+    def test_kick_drift(self):
+        for solver in ['simple', 'legacy', 'exact']:
+            tracker = RingAndRFTracker(self.rf, self.beam, solver=solver)
+            dt, dE = self.beam.dt.copy(), self.beam.dE.copy()
+            for turn in range(self.N_t):
+                tracker.kick(self.beam.dt, self.beam.dE, turn)
+                tracker.drift(self.beam.dt, self.beam.dE, turn + 1)
+
+                bm.kick(dt, dE, self.rf.voltage[:, turn],
+                        self.rf.omega_rf[:, turn], self.rf.phi_rf[:, turn],
+                        self.rf.Particle.charge, self.rf.n_rf,
+                        - self.rf.delta_E[turn])
+                bm.drift(dt, dE, tracker.solver, self.rf.t_rev[turn+1],
+                         self.rf.length_ratio, self.rf.alpha_order,
+                         self.rf.eta_0[turn+1], self.rf.eta_1[turn+1],
+                         self.rf.eta_2[turn+1], self.rf.alpha_0[turn+1],
+                         self.rf.alpha_1[turn+1], self.rf.alpha_2[turn+1],
+                         self.rf.beta[turn+1], self.rf.energy[turn+1])
+
+            np.testing.assert_allclose(self.beam.dt, dt, rtol=1e-12)
+            np.testing.assert_allclose(self.beam.dE, dE, rtol=1e-12,
+                                       atol=1e-6)
+
+    def test_mixed_precision(self):
+        reference = RingAndRFTracker(self.rf, self.beam)
+        for turn in range(self.N_t):
+            reference.kick(self.beam.dt, self.beam.dE, turn)
+            reference.drift(self.beam.dt, self.beam.dE, turn + 1)
+
+        bm.use_precision('mixed')
+        try:
+            beam = Beam(self.ring, self.N_p, self.N_b)
+            bigaussian(self.ring, self.rf, beam, self.tau_0/4, seed=1)
+            self.assertEqual(beam.dt.dtype, np.float32)
+            tracker = RingAndRFTracker(self.rf, beam)
+            for turn in range(self.N_t):
+                tracker.kick(beam.dt, beam.dE, turn)
+                tracker.drift(beam.dt, beam.dE, turn + 1)
+        finally:
+            bm.use_precision('double')
+
+        np.testing.assert_allclose(beam.dt, self.beam.dt, rtol=1e-6)
+        np.testing.assert_allclose(beam.dE, self.beam.dE, rtol=1e-5,
+                                   atol=1e2)
+
+    def test_mixed_precision_refused(self):
+        # The paths without mixed precision kernels refuse it explicitly
+        bm.use_precision('mixed')
+        try:
+            beam = Beam(self.ring, self.N_p, self.N_b)
+            bigaussian(self.ring, self.rf, beam, self.tau_0/4, seed=1)
+            profile = Profile(beam, CutOptions(n_slices=100, cut_left=0,
+                                               cut_right=self.rf.t_rf[0, 0]))
+            with self.assertRaises(RuntimeError):
+                RingAndRFTracker(self.rf, beam, periodicity=True)
+            with self.assertRaises(RuntimeError):
+                RingAndRFTracker(self.rf, beam, Profile=profile,
+                                 interpolation=True, fused_slicing=True)
+            with self.assertRaises(RuntimeError):
+                RingAndRFTracker(self.rf, beam).track_turns(5)
+            with self.assertRaises(RuntimeError):
+                FullRingAndRF([RingAndRFTracker(self.rf, beam)],
+                              batched=True)
+            ensemble = EnsembleBeam(self.ring, 2, self.N_p, self.N_b)
+            with self.assertRaises(RuntimeError):
+                EnsembleRingAndRFTracker(self.rf, ensemble)
+            with self.assertRaises(RuntimeError):
+                EnsembleProfile(ensemble, CutOptions(
+                    n_slices=100, cut_left=0, cut_right=self.rf.t_rf[0, 0]))
+            # Also without the assertions of the wrappers (python -O)
+            with self.assertRaises(RuntimeError):
+                bm.kick_drift_periodic(
+                    beam.dt, beam.dE, self.rf.voltage[:, 0],
+                    self.rf.omega_rf[:, 0], self.rf.phi_rf[:, 0], 1.,
+                    self.rf.n_rf, 0., b'simple', self.rf.t_rev[0], 1., 0,
+                    0., 0., 0., 0., 0., 0., 1., 1.)
+        finally:
+            bm.use_precision('double')
+
+    def test_solver_id(self):
+        tracker = RingAndRFTracker(self.rf, self.beam, solver='exact')
+        self.assertEqual(tracker.solver, b'exact')
+        self.assertEqual(tracker.solver_id, 2)
+        tracker.solver = 'simple'.encode(encoding='utf_8')
+        self.assertEqual(tracker.solver_id, 0)
+
+
+class TestMacroStep(unittest.TestCase):
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_s = 450e9          # Synchronous momentum [eV/c]
+    h = 35640            # Harmonic number
+    V = 6e6              # RF voltage [V]
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Bunch parameters
+    N_b = 1e9            # Intensity
+    N_p = 10000          # Macro-particles
+    tau_0 = 0.4e-9       # Initial bunch length, 4 sigma [s]
+    # Tracking details
+    N_t = 1000           # Number of turns to track
+    k = 5                # Turns per macro-step
+
+    def _tracker(self, interpolation=False):
+        ring = Ring(self.C, self.alpha, self.p_s, Proton(), self.N_t)
+        rf = RFStation(ring, [self.h], [self.V], [0])
+        beam = Beam(ring, self.N_p, self.N_b)
+        bigaussian(ring, rf, beam, self.tau_0/4, seed=1)
+        profile = Profile(beam, CutOptions(n_slices=100, cut_left=0,
+                                           cut_right=rf.t_rf[0, 0]))
+        return RingAndRFTracker(rf, beam, Profile=profile,
+                                interpolation=interpolation)
+
+    def test_macro_step(self):
+        for interpolation in [False, True]:
+            reference = self._tracker(interpolation)
+            tracker = self._tracker(interpolation)
+            for i in range(self.N_t):
+                reference.track()
+            for i in range(self.N_t // self.k):
+                tracker.track_macro_step(self.k)
+
+            self.assertEqual(tracker.counter[0], reference.counter[0])
+            self.assertEqual(tracker.beam.energy, reference.beam.energy)
+            self.assertAlmostEqual(np.std(tracker.beam.dt) /
+                                   np.std(reference.beam.dt), 1, delta=0.03)
+            self.assertAlmostEqual(np.std(tracker.beam.dE) /
+                                   np.std(reference.beam.dE), 1, delta=0.03)
+
+    def test_single_turn_step(self):
+        reference = self._tracker()
+        tracker = self._tracker()
+        for i in range(10):
+            reference.track()
+            tracker.track_macro_step(1)
+
+        np.testing.assert_allclose(tracker.beam.dt, reference.beam.dt,
+                                   rtol=1e-12, atol=1e-21)
+        np.testing.assert_allclose(tracker.beam.dE, reference.beam.dE,
+                                   rtol=1e-12, atol=1e-3)
+
+    def test_macro_step_error(self):
+        tracker = self._tracker()
+        error = tracker.macro_step_error(self.k)
+        self.assertAlmostEqual(tracker.macro_step_error(2*self.k) / error, 4)
+        self.assertEqual(tracker.track_macro_step(self.k, tolerance=error),
+                         error)
+        with self.assertRaises(RuntimeError):
+            tracker.track_macro_step(2*self.k, tolerance=error)
+        with self.assertRaises(RuntimeError):
+            tracker.track_macro_step(self.N_t)
+
+    def test_rf_voltage_after_macro_step(self):
+        # Voltage program with a dip inside the macro-step, the same before
+        # and after it
+        ring = Ring(self.C, self.alpha, self.p_s, Proton(), 20)
+        voltage = np.full(21, self.V)
+        voltage[2:8] = 0.5*self.V
+        rf = RFStation(ring, [self.h], [voltage], [0])
+        beam = Beam(ring, self.N_p, self.N_b)
+        bigaussian(ring, rf, beam, self.tau_0/4, seed=1)
+        profile = Profile(beam, CutOptions(n_slices=100, cut_left=0,
+                                           cut_right=rf.t_rf[0, 0]))
+        tracker = RingAndRFTracker(rf, beam, Profile=profile,
+                                   interpolation=True)
+
+        tracker.track()
+        tracker.track_macro_step(10)
+        tracker.track()
+
+        # Waveform of the turn, not the one averaged over the macro-step
+        turn = tracker.counter[0] - 1
+        np.testing.assert_allclose(
+            tracker.rf_voltage,
+            bm.rf_volt_comp(rf.voltage[:, turn], rf.omega_rf[:, turn],
+                            rf.phi_rf[:, turn], profile.bin_centers),
+            rtol=1e-10, atol=1e-6)
+
+
+class TestEnsemble(unittest.TestCase):
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_i = 450e9          # Synchronous momentum [eV/c]
+    p_f = 450.1e9        # Synchronous momentum, final
+    h = 35640            # Harmonic number
+    V = 6e6              # RF voltage [V]
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Bunch parameters
+    N_b = 1e9            # Intensity
+    N_p = 5000           # Macro-particles
+    tau_0 = 0.4e-9       # Initial bunch length, 4 sigma [s]
+    # Tracking details
+    N_t = 100            # Number of turns to track
+    # Ensemble members
+    voltage_factors = [1., 1.1, 0.9]
+    phase_offsets = [0., 0.1, -0.1]
+
+    def _ring(self):
+        return Ring(self.C, self.alpha, np.linspace(
+            self.p_i, self.p_f, self.N_t + 1), Proton(), self.N_t)
+
+    def test_ensemble_tracking(self):
+        ring = self._ring()
+        rf = RFStation(ring, [self.h, 2*self.h], [self.V, 0.1*self.V],
+                       [0, np.pi], n_rf=2)
+        ensemble = EnsembleBeam(ring, 3, self.N_p, self.N_b)
+
+        references = []
+        for k in range(3):
+            ring_k = self._ring()
+            rf_k = RFStation(ring_k, [self.h, 2*self.h],
+                             [self.voltage_factors[k]*self.V,
+                              self.voltage_factors[k]*0.1*self.V],
+                             [self.phase_offsets[k],
+                              np.pi + self.phase_offsets[k]], n_rf=2)
+            beam = Beam(ring_k, self.N_p, self.N_b)
+            bigaussian(ring_k, rf_k, beam, self.tau_0/4, seed=k)
+            ensemble.set_member(k, beam)
+            references.append(RingAndRFTracker(rf_k, beam))
+
+        tracker = EnsembleRingAndRFTracker(
+            rf, ensemble, voltage_factors=self.voltage_factors,
+            phase_offsets=self.phase_offsets)
+        for i in range(self.N_t):
+            tracker.track()
+            for reference in references:
+                reference.track()
+
+        profile = EnsembleProfile(ensemble, CutOptions(
+            cut_left=0, cut_right=rf.t_rf[0, 0], n_slices=64),
+            FitOptions(fit_option='rms'))
+        profile.track()
+        for k, reference in enumerate(references):
+            np.testing.assert_allclose(ensemble.dt[k], reference.beam.dt,
+                                       rtol=1e-12)
+            np.testing.assert_allclose(ensemble.dE[k], reference.beam.dE,
+                                       rtol=1e-9, atol=1e-3)
+            reference_profile = Profile(reference.beam, CutOptions(
+                cut_left=0, cut_right=rf.t_rf[0, 0], n_slices=64),
+                FitOptions(fit_option='rms'))
+            reference_profile.track()
+            np.testing.assert_array_equal(
+                profile.n_macroparticles[k],
+                reference_profile.n_macroparticles)
+            self.assertAlmostEqual(profile.bunchLength[k],
+                                   reference_profile.bunchLength)
+        self.assertEqual(ensemble.energy, references[0].beam.energy)
+
+    def test_exceptions(self):
+        ring = self._ring()
+        rf = RFStation(ring, [self.h], [self.V], [0])
+        ensemble = EnsembleBeam(ring, 3, self.N_p, self.N_b)
+        with self.assertRaises(RuntimeError):
+            EnsembleRingAndRFTracker(rf, ensemble, voltage_factors=[1, 2])
+
+
+class TestChunkedBeam(unittest.TestCase):
+    # Machine and RF parameters
+    C = 26658.883        # Machine circumference [m]
+    p_s = 450e9          # Synchronous momentum [eV/c]
+    h = 35640            # Harmonic number
+    V = 6e6              # RF voltage [V]
+    gamma_t = 55.759505  # Transition gamma
+    alpha = 1./gamma_t/gamma_t        # First order mom. comp. factor
+    # Bunch parameters
+    N_b = 1e11           # Intensity
+    N_p = 5000           # Macro-particles
+    tau_0 = 0.4e-9       # Initial bunch length, 4 sigma [s]
+    # Tracking details
+    N_t = 20             # Number of turns to track
+
+    def _setup(self, chunked):
+        ring = Ring(self.C, self.alpha, self.p_s, Proton(), self.N_t)
+        rf = RFStation(ring, [self.h], [self.V], [0])
+        beam = Beam(ring, self.N_p, self.N_b)
+        bigaussian(ring, rf, beam, self.tau_0/4, seed=1)
+        if chunked:
+            chunked_beam = ChunkedBeam(ring, self.N_p, self.N_b,
+                                       chunk_size=1200)
+            chunked_beam.dt[:] = beam.dt
+            chunked_beam.dE[:] = beam.dE
+            beam = chunked_beam
+        profile = Profile(beam, CutOptions(cut_left=0,
+                                           cut_right=rf.t_rf[0, 0],
+                                           n_slices=64))
+        induced_voltage = TotalInducedVoltage(beam, profile, [
+            InducedVoltageTime(beam, profile, [
+                Resonators(5e5, 1.2e9, 10)])])
+        if chunked:
+            tracker = ChunkedRingAndRFTracker(
+                rf, beam, interpolation=True, Profile=profile,
+                TotalInducedVoltage=induced_voltage)
+        else:
+            tracker = RingAndRFTracker(
+                rf, beam, interpolation=True, Profile=profile,
+                TotalInducedVoltage=induced_voltage)
+        return beam, profile, induced_voltage, tracker
+
+    def test_chunked_tracking(self):
+        beam, profile, induced_voltage, tracker = self._setup(False)
+        chunked_beam, chunked_profile, chunked_induced_voltage, \
+            chunked_tracker = self._setup(True)
+        self.assertEqual(chunked_beam.n_chunks, 5)
+
+        for i in range(self.N_t):
+            for objects in [(profile, induced_voltage, tracker),
+                            (chunked_profile, chunked_induced_voltage,
+                             chunked_tracker)]:
+                for obj in objects:
+                    obj.track()
+
+        np.testing.assert_array_equal(chunked_profile.n_macroparticles,
+                                      profile.n_macroparticles)
+        np.testing.assert_array_equal(chunked_beam.dt, beam.dt)
+        np.testing.assert_array_equal(chunked_beam.dE, beam.dE)
+
+        beam.losses_longitudinal_cut(1.1e-9, 1.4e-9)
+        chunked_beam.losses_longitudinal_cut(1.1e-9, 1.4e-9)
+        np.testing.assert_array_equal(chunked_beam.id, beam.id)
+        self.assertEqual(chunked_beam.n_macroparticles_alive,
+                         beam.n_macroparticles_alive)
+
+        beam.statistics()
+        chunked_beam.statistics()
+        for attribute in ['mean_dt', 'sigma_dt', 'mean_dE', 'sigma_dE']:
+            self.assertAlmostEqual(getattr(chunked_beam, attribute),
+                                   getattr(beam, attribute),
+                                   delta=1e-12*abs(getattr(beam, attribute)))
+
+    def test_exceptions(self):
+        ring = Ring(self.C, self.alpha, self.p_s, Proton(), self.N_t)
+        beam = ChunkedBeam(ring, self.N_p, self.N_b, chunk_size=1200)
+        with self.assertRaises(RuntimeError):
+            beam.add_particles([[0.], [0.]])
+        with self.assertRaises(RuntimeError):
+            beam.sort_by_bin(0, 1e-9, 10)
+
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -665,6 +665,59 @@ class TestSort(unittest.TestCase):
         np.testing.assert_equal(y, y2)
 
 
+class TestMixedPrecision(unittest.TestCase):
+
+    # Run before every test
+    def setUp(self):
+        np.random.seed(0)
+        bm.use_precision('mixed')
+    # Run after every test
+
+    def tearDown(self):
+        bm.use_precision('double')
+
+    def test_types(self):
+        self.assertEqual(bm.precision.coord_t, np.float32)
+        self.assertEqual(bm.precision.real_t, np.float64)
+
+    def test_mean_std(self):
+        a = (1e6 + np.random.randn(100000)).astype(np.float32)
+        self.assertIsInstance(bm.mean(a), float)
+        np.testing.assert_allclose(bm.mean(a), np.mean(a, dtype=np.float64),
+                                   rtol=1e-14)
+        np.testing.assert_allclose(bm.std(a), np.std(a, dtype=np.float64),
+                                   rtol=1e-9)
+
+    def test_slice(self):
+        dt = np.random.randn(100000).astype(np.float32)
+        profile = np.zeros(64, dtype=np.float64)
+        bm.slice(dt, profile, -3., 3.)
+        np.testing.assert_array_equal(
+            profile, np.histogram(dt.astype(np.float64), bins=64,
+                                  range=(-3., 3.))[0])
+
+    def test_kick_drift(self):
+        dt = 2.5e-9*np.random.rand(1000)
+        dE = 1e8*np.random.randn(1000)
+        dt_mixed, dE_mixed = dt.astype(np.float32), dE.astype(np.float32)
+        dt_double = dt_mixed.astype(np.float64)
+        dE_double = dE_mixed.astype(np.float64)
+        args_kick = (np.array([6e6]), np.array([2.5e9]), np.array([0.]),
+                     1., 1, -1e3)
+        args_drift = ('simple'.encode(encoding='utf_8'), 8.9e-5, 1., 0,
+                      3e-4, 0., 0., 0., 0., 0., 0.99999, 450e9)
+
+        bm.kick(dt_mixed, dE_mixed, *args_kick)
+        bm.drift(dt_mixed, dE_mixed, *args_drift)
+
+        bm.use_precision('double')
+        bm.kick(dt_double, dE_double, *args_kick)
+        bm.drift(dt_double, dE_double, *args_drift)
+
+        np.testing.assert_allclose(dt_mixed, dt_double, rtol=1e-6)
+        np.testing.assert_allclose(dE_mixed, dE_double, rtol=1e-6)
+
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -0,0 +1,189 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for utils.checkpoint
+
+:Authors: **BLonD developers**
+"""
+
+import unittest
+import os
+import tempfile
+import warnings
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Electron, Proton
+from blond.beam.distributions import bigaussian
+from blond.beam.profile import Profile, CutOptions, OtherSlicesOptions
+from blond.impedances.impedance import InducedVoltageTime, \
+    TotalInducedVoltage
+from blond.impedances.impedance_sources import Resonators
+from blond.trackers.tracker import RingAndRFTracker
+from blond.llrf.beam_feedback import BeamFeedback
+from blond.llrf.cavity_feedback import SPSCavityFeedback, \
+    CavityFeedbackCommissioning
+from blond.synchrotron_radiation.synchrotron_radiation import \
+    SynchrotronRadiation
+from blond.utils.checkpoint import save_checkpoint, load_checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    n_turns = 20
+    n_macroparticles = 10000
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'checkpoint.h5')
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        os.rmdir(self.directory)
+
+    def build(self, generate):
+        ring = Ring(2*np.pi*1100.009, 1/18.**2, 20e9, Electron(),
+                    self.n_turns)
+        rf = RFStation(ring, [4620], [50e6], [0.])
+        beam = Beam(ring, self.n_macroparticles, 1e11)
+        if generate:
+            bigaussian(ring, rf, beam, 0.2e-9/4, seed=1)
+        profile = Profile(beam, CutOptions(cut_left=0., cut_right=2.5e-9,
+                                           n_slices=64))
+        resonator = Resonators(1e5, 1e9, 5)
+        induced_voltage = TotalInducedVoltage(
+            beam, profile, [InducedVoltageTime(beam, profile, [resonator])])
+        tracker = RingAndRFTracker(rf, beam, Profile=profile,
+                                   TotalInducedVoltage=induced_voltage)
+        sr = SynchrotronRadiation(ring, rf, beam, 3096.2, seed=7)
+        maps = [tracker.track, sr.track, profile.track,
+                induced_voltage.induced_voltage_sum]
+        objects = {'beam': beam, 'profile': profile, 'tracker': tracker,
+                   'induced_voltage': induced_voltage}
+        return maps, objects
+
+    def build_feedbacks(self, generate):
+        ring = Ring(6911.5038, 1/17.95142852**2, 25.92e9, Proton(),
+                    self.n_turns)
+        rf = RFStation(ring, [4620], [4.5e6], [0.])
+        beam = Beam(ring, self.n_macroparticles, 1e11)
+        if generate:
+            bigaussian(ring, rf, beam, 1e-9/4, seed=1)
+        # Sampled slicing, with a generator that is not seeded
+        t_rf = rf.t_rf[0, 0]
+        profile = Profile(beam, CutOptions(cut_left=-1.5*t_rf,
+                                           cut_right=2.5*t_rf, n_slices=256),
+                          OtherSlicesOptions=OtherSlicesOptions(
+                              sample_fraction=0.5))
+        resonator = Resonators(1e5, 0.2e9, 100)
+        induced_voltage = TotalInducedVoltage(
+            beam, profile, [InducedVoltageTime(beam, profile, [resonator],
+                                               multi_turn_wake=True,
+                                               RFParams=rf)])
+        profile.track()
+        phase_loop = BeamFeedback(ring, rf, profile,
+                                  {'machine': 'SPS_RL', 'PL_gain': 1000})
+        cavity_feedback = SPSCavityFeedback(
+            rf, beam, profile, G_llrf=5, G_tx=0.5, a_comb=15/16, turns=5,
+            post_LS2=False,
+            Commissioning=CavityFeedbackCommissioning(open_FF=True))
+        tracker = RingAndRFTracker(rf, beam, Profile=profile,
+                                   BeamFeedback=phase_loop,
+                                   CavityFeedback=cavity_feedback,
+                                   TotalInducedVoltage=induced_voltage,
+                                   interpolation=True)
+        maps = [tracker.track, profile.track,
+                induced_voltage.induced_voltage_sum, cavity_feedback.track]
+        objects = {'beam': beam, 'profile': profile, 'tracker': tracker,
+                   'induced_voltage': induced_voltage}
+        return maps, objects
+
+    def track(self, maps, n_turns):
+        for i in range(n_turns):
+            for m in maps:
+                m()
+
+    def test_restart(self):
+        maps, objects = self.build(generate=True)
+        self.track(maps, 5)
+        save_checkpoint(self.filename, objects)
+        self.track(maps, 5)
+
+        maps_restart, objects_restart = self.build(generate=False)
+        load_checkpoint(self.filename, objects_restart)
+        self.assertEqual(objects_restart['tracker'].rf_params.counter[0], 5)
+        self.track(maps_restart, 5)
+
+        beam = objects['beam']
+        beam_restart = objects_restart['beam']
+        np.testing.assert_array_equal(beam.dt, beam_restart.dt)
+        np.testing.assert_array_equal(beam.dE, beam_restart.dE)
+        np.testing.assert_array_equal(
+            objects['induced_voltage'].induced_voltage,
+            objects_restart['induced_voltage'].induced_voltage)
+        self.assertEqual(objects['tracker'].rf_params.counter[0],
+                         objects_restart['tracker'].rf_params.counter[0])
+
+    def test_restart_feedbacks(self):
+        maps, objects = self.build_feedbacks(generate=True)
+        self.track(maps, 3)
+        with warnings.catch_warnings():
+            # Nothing of the state is left out
+            warnings.filterwarnings('error', 'WARNING in save_checkpoint')
+            save_checkpoint(self.filename, objects)
+        self.track(maps, 3)
+
+        maps_restart, objects_restart = self.build_feedbacks(generate=False)
+        load_checkpoint(self.filename, objects_restart)
+        self.track(maps_restart, 3)
+
+        np.testing.assert_array_equal(objects['beam'].dt,
+                                      objects_restart['beam'].dt)
+        np.testing.assert_array_equal(objects['beam'].dE,
+                                      objects_restart['beam'].dE)
+        np.testing.assert_array_equal(
+            objects['profile'].n_macroparticles,
+            objects_restart['profile'].n_macroparticles)
+        np.testing.assert_array_equal(
+            objects['induced_voltage'].induced_voltage_list[0].mtw_memory,
+            objects_restart['induced_voltage'].induced_voltage_list[0]
+            .mtw_memory)
+        tracker = objects['tracker']
+        tracker_restart = objects_restart['tracker']
+        self.assertEqual(tracker.beamFB.domega_rf,
+                         tracker_restart.beamFB.domega_rf)
+        np.testing.assert_array_equal(tracker.rf_params.phi_rf,
+                                      tracker_restart.rf_params.phi_rf)
+        for otfb, otfb_restart in [
+                (tracker.cavityFB.OTFB_1, tracker_restart.cavityFB.OTFB_1),
+                (tracker.cavityFB.OTFB_2, tracker_restart.cavityFB.OTFB_2)]:
+            np.testing.assert_array_equal(otfb.dV_comb_out_prev,
+                                          otfb_restart.dV_comb_out_prev)
+            np.testing.assert_array_equal(otfb.I_gen_prev,
+                                          otfb_restart.I_gen_prev)
+
+    def test_unsaved_attribute(self):
+        maps, objects = self.build(generate=True)
+        objects['beam'].unsaved = object()
+        with self.assertWarns(UserWarning):
+            save_checkpoint(self.filename, {'beam': objects['beam']})
+
+    def test_missing_object(self):
+        maps, objects = self.build(generate=True)
+        save_checkpoint(self.filename, {'beam': objects['beam']})
+        with self.assertRaises(RuntimeError):
+            load_checkpoint(self.filename, objects)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
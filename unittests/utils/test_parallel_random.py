@@ -0,0 +1,113 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for utils.parallel_random
+
+:Authors: **BLonD developers**
+"""
+
+import unittest
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.distributions import bigaussian
+from blond.beam.coasting_beam import generate_coasting_beam
+from blond.trackers.utilities import is_in_separatrix
+from blond.utils.parallel_random import CounterBasedGenerator
+
+
+class TestCounterBasedGenerator(unittest.TestCase):
+
+    n = 100000
+
+    def test_threads(self):
+        # The draws do not depend on the number of threads
+        out = np.empty(self.n)
+        reference = CounterBasedGenerator(1, n_threads=1,
+                                          block_size=1000).normal(out.copy())
+        for n_threads in [2, 7]:
+            generator = CounterBasedGenerator(1, n_threads=n_threads,
+                                              block_size=1000)
+            np.testing.assert_array_equal(generator.normal(out), reference)
+
+    def test_offset(self):
+        # The parts of the beam of several ranks together give the draws of
+        # the full beam
+        reference = CounterBasedGenerator(2, block_size=1000).uniform(
+            np.empty(self.n), -1., 3.)
+        out = np.empty(self.n)
+        for start, stop in [(0, 12345), (12345, 50000), (50000, self.n)]:
+            generator = CounterBasedGenerator(2, block_size=1000)
+            generator.uniform(out[start:stop], -1., 3., start)
+        np.testing.assert_array_equal(out, reference)
+        self.assertTrue(-1 <= np.min(out) and np.max(out) < 3)
+
+    def test_streams(self):
+        generator = CounterBasedGenerator(3)
+        first = generator.normal(np.empty(1000))
+        second = generator.normal(np.empty(1000))
+        self.assertFalse(np.any(first == second))
+        self.assertEqual(generator.stream, 2)
+
+    def test_distributions(self):
+        generator = CounterBasedGenerator(4, block_size=1000)
+        out = generator.normal(np.empty(self.n, dtype=np.float32), 1., 2.)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertAlmostEqual(np.mean(out), 1., delta=0.03)
+        self.assertAlmostEqual(np.std(out), 2., delta=0.03)
+
+        values = np.linspace(-1, 1, 101)
+        probability = 1 - values**2
+        out = generator.from_table(np.empty(self.n), values, probability)
+        self.assertTrue(-1.01 <= np.min(out) and np.max(out) <= 1.01)
+        # Parabolic distribution: variance 1/5
+        self.assertAlmostEqual(np.var(out), 0.2, delta=0.005)
+
+
+class TestGenerators(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = Ring(6911.5038, 1/17.95142852**2, 450e9, Proton(), 10)
+        self.rf = RFStation(self.ring, [4620], [7e6], [0.])
+
+    def test_bigaussian(self):
+        beams = []
+        for n_threads in [1, 3]:
+            beam = Beam(self.ring, 50000, 1e9)
+            dt = beam.dt
+            bigaussian(self.ring, self.rf, beam, 0.4e-9, reinsertion=True,
+                       generator=CounterBasedGenerator(5, n_threads,
+                                                       block_size=1000))
+            # Coordinates drawn in place
+            self.assertIs(beam.dt, dt)
+            beams.append(beam)
+
+        np.testing.assert_array_equal(beams[0].dt, beams[1].dt)
+        np.testing.assert_array_equal(beams[0].dE, beams[1].dE)
+        self.assertTrue(np.all(is_in_separatrix(self.ring, self.rf, beam,
+                                                beam.dt, beam.dE)))
+        self.assertAlmostEqual(np.std(beam.dt), 0.4e-9, delta=0.02e-9)
+
+    def test_coasting_beam(self):
+        beam = Beam(self.ring, 50000, 1e9)
+        for distribution in ['gaussian', 'parabolic']:
+            generate_coasting_beam(beam, 0, 1e-6, spread=1e6,
+                                   spread_type='dE',
+                                   distribution=distribution,
+                                   generator=CounterBasedGenerator(6))
+            self.assertTrue(0 <= np.min(beam.dt) and np.max(beam.dt) < 1e-6)
+        self.assertTrue(-1e6 <= np.min(beam.dE) and np.max(beam.dE) <= 1e6)
+
+
+if __name__ == '__main__':
+
+    unittest.main()